@@ -1,41 +1,53 @@
 import logging
-import json
-from datetime import datetime, timezone
+import base64
+import hashlib
+import cProfile
+import functools
+import io
+import pstats
+import time
+import re
+from urllib.parse import urlencode
+from datetime import datetime, timedelta, timezone
 # send_from_directory para servir o index.html
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context, g
 from flask_sqlalchemy import SQLAlchemy
-import time 
+from sqlalchemy import event, insert
+from sqlalchemy.orm import joinedload
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.exc import IntegrityError
 import os
-import requests # Para chamar o Coordenador
-
-# --- 1. CONFIGURAÇÃO DE LOGGING ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(levelname)s:%(asctime)s:servico-agendamento:%(message)s',
-    datefmt='%Y-%m-%dT%H:%M:%S', 
-    handlers=[
-        logging.FileHandler('app.log'), # Escreve em app.log
-        logging.StreamHandler()      # Escreve no console
-    ]
+import atexit
+import threading
+from coordenador import ClienteCoordenador, CoordenadorIndisponivel, ErroCoordenador
+from locks import criar_backend_lock, chaves_lock
+from intervalos import ArvoreIntervalos
+from recorrencia import FREQUENCIAS, Recorrencia, mesclar, varrer_conflitos
+from calendario import CalendarioOcupacao
+from cache import CacheRespostas, CacheTTL, EntradaCache
+from idempotencia import ArmazemIdempotencia, RespostaGuardada, impressao_requisicao
+from logs import ARQUIVO_AUDITORIA, configurar_logging, encerrar_logging, estatisticas_logging
+from metricas import RegistroMetricas, PerfilRequisicao, cronometro
+from arquivamento import arquivar, limite_arquivamento
+from auditoria import FILTROS as FILTROS_AUDITORIA, IndiceAuditoria
+from serializacao import (
+    ProvedorJSON, SERIALIZADOR_AGENDAMENTO, SERIALIZADOR_CIENTISTA, SERIALIZADOR_SERIE, SERIALIZADOR_TELESCOPIO,
+    CAMPOS_LINKS_AGENDAMENTO, formatar_utc, ler_campos, ler_links, serializar_json
 )
-# Altera o formato de data do logger para UTC
-logging.Formatter.converter = time.gmtime
 
-# Logger customizado para auditoria
-audit_logger = logging.getLogger('audit')
-audit_logger.setLevel(logging.INFO) 
-audit_handler = logging.FileHandler('audit.log') # Arquivo separado 'audit.log'
-audit_handler.setFormatter(logging.Formatter('%(message)s'))
-audit_logger.addHandler(audit_handler)
-audit_logger.propagate = False # Evita que logs de auditoria apareçam no app.log
+# --- 1. CONFIGURAÇÃO DE LOGGING ---
+# Logs de aplicação (app.log + console) e de auditoria (audit.log) passam por
+# filas em memória e são gravados em lote por threads de fundo (ver logs.py).
+audit_logger = configurar_logging()
 
 def log_audit(event_type, user_details, details, metadata=None):
     """
     Registra um evento de auditoria no formato JSON.
+    A serialização e a escrita em disco acontecem na thread de auditoria.
     """
     try:
         audit_entry = {
-            "timestamp_utc": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+            "timestamp_utc": datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
             "level": "AUDIT",
             "event_type": event_type,
             "service": "servico-agendamento",
@@ -43,28 +55,175 @@ def log_audit(event_type, user_details, details, metadata=None):
             "details": details,
             "metadata": metadata or {}
         }
-        audit_logger.info(json.dumps(audit_entry, ensure_ascii=False))
+        audit_logger.info(audit_entry)
     except Exception as e:
-        logging.error(f"Falha ao escrever log de auditoria: {e}")
+        logging.error("Falha ao escrever log de auditoria: %s", e)
+
+def log_audit_lote(eventos):
+    """
+    Registra vários eventos de auditoria de uma vez (uma linha JSON por evento).
+    'eventos' é uma lista de (event_type, user_details, details).
+    """
+    try:
+        timestamp = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+        audit_logger.info([
+            {
+                "timestamp_utc": timestamp,
+                "level": "AUDIT",
+                "event_type": event_type,
+                "service": "servico-agendamento",
+                "user": user_details,
+                "details": details,
+                "metadata": {}
+            }
+            for event_type, user_details, details in eventos
+        ])
+    except Exception as e:
+        logging.error("Falha ao escrever log de auditoria: %s", e)
 
 # --- 2. CONFIGURAÇÃO DO FLASK E BANCO DE DADOS ---
 app = Flask(__name__)
+# jsonify e request.get_json com orjson, se instalado (ver serializacao.py)
+app.json = ProvedorJSON(app)
 try:
     os.makedirs(app.instance_path, exist_ok=True)
 except OSError as e:
-    logging.error(f"Erro ao criar diretório 'instance': {e}")
+    logging.error("Erro ao criar diretório 'instance': %s", e)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(app.instance_path, 'database.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL', f"sqlite:///{os.path.join(app.instance_path, 'database.db')}"
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
+# SQLite com vários workers/threads: WAL deixa leituras correrem junto com a
+# escrita, busy_timeout faz o escritor esperar em vez de falhar com
+# "database is locked" e synchronous=NORMAL (seguro em WAL) evita um fsync
+# por commit.
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+
+def _configurar_conexao_sqlite(conexao_dbapi, registro_conexao):
+    cursor = conexao_dbapi.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.close()
+
+with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', _configurar_conexao_sqlite)
+
 # --- IMPORTANTE: ADAPTAR AQUI SE ESTIVER NA ETAPA 5 (DOCKER) ---
-# Se estiver rodando sem Docker (Etapa 4), use 127.0.0.1
-URL_COORDENADOR = "http://servico-coordenador:3000"
-# Se estiver rodando COM Docker (Etapa 5), use o nome do serviço
-# URL_COORDENADOR = "http://servico-coordenador:3000" 
+# Se estiver rodando sem Docker (Etapa 4), use COORDENADOR_URL=http://127.0.0.1:3000
+# Se estiver rodando COM Docker (Etapa 5), use o nome do serviço (padrão)
+URL_COORDENADOR = os.environ.get('COORDENADOR_URL', "http://servico-coordenador:3000")
+
+# Cliente compartilhado (pool keep-alive) usado em todos os pedidos de lock
+coordenador = ClienteCoordenador(
+    URL_COORDENADOR,
+    timeout_conexao=float(os.environ.get('COORDENADOR_TIMEOUT_CONEXAO', 1.0)),
+    timeout_leitura=float(os.environ.get('COORDENADOR_TIMEOUT_LEITURA', 2.0)),
+    espera_maxima=float(os.environ.get('COORDENADOR_ESPERA_MAXIMA_MS', 500)) / 1000,
+    tamanho_pool=int(os.environ.get('COORDENADOR_TAMANHO_POOL', 20)),
+)
+
+# Backend de lock: 'coordenador' (padrão, vários nós), 'memoria' (um processo)
+# ou 'sqlite' (vários processos no mesmo host). Todos com TTL (lease).
+LOCK_BACKEND = os.environ.get('LOCK_BACKEND', 'coordenador')
+lock_backend = criar_backend_lock(
+    LOCK_BACKEND,
+    ttl=float(os.environ.get('LOCK_TTL_MS', 30000)) / 1000,
+    espera_maxima=coordenador.espera_maxima,
+    cliente_coordenador=coordenador,
+    caminho_sqlite=os.environ.get('LOCK_SQLITE_CAMINHO', os.path.join(app.instance_path, 'locks.db')),
+)
+# Tamanho da fatia de tempo de cada chave de lock (um lock por fatia coberta)
+LOCK_GRANULARIDADE_MIN = int(os.environ.get('LOCK_GRANULARIDADE_MIN', 15))
+# Duração máxima de um agendamento (MODELOS.md); também limita o número de chaves
+DURACAO_MAXIMA = timedelta(hours=2)
+
+# --- 2.1 MÉTRICAS E PERFIL ---
+# Histogramas e contadores em memória (ver metricas.py), expostos em GET /metrics.
+metricas = RegistroMetricas()
+hist_requisicoes = metricas.histograma(
+    'agendamento_http_requisicao_segundos', 'Duração das requisições HTTP', ('rota', 'metodo', 'status')
+)
+hist_etapas = metricas.histograma(
+    'agendamento_etapa_segundos', 'Duração de cada etapa (lock, conflito, commit, auditoria, unlock)', ('rota', 'etapa')
+)
+conflitos_total = metricas.contador(
+    'agendamento_conflitos_total', 'Agendamentos recusados por lock ocupado, conflito no banco, com série ou dentro do lote', ('rota', 'origem')
+)
+idempotencia_total = metricas.contador(
+    'agendamento_idempotencia_total', 'Requisições com Idempotency-Key por resultado (nova, reproduzida, divergente)', ('rota', 'resultado')
+)
+arquivados_total = metricas.contador(
+    'agendamento_arquivados_total', 'Agendamentos movidos para a tabela de arquivo por este processo', ()
+)
+
+# Com PERFIL_HABILITADO=1, o cabeçalho "X-Perfil: 1" devolve as etapas da
+# requisição em Server-Timing e "X-Perfil: cprofile" grava no app.log as
+# funções mais caras da requisição (cProfile).
+PERFIL_HABILITADO = os.environ.get('PERFIL_HABILITADO') == '1'
+PERFIL_LINHAS_CPROFILE = 25
+
+def _rota_atual():
+    return request.url_rule.rule if request.url_rule else 'nao_encontrada'
+
+def medir_etapa(etapa):
+    """
+    Cronometra uma etapa da requisição atual (histograma por rota e etapa).
+    """
+    return cronometro(hist_etapas, _rota_atual(), etapa, perfil=g.get('perfil'), etapa=etapa)
+
+@app.before_request
+def _iniciar_medicao():
+    g.inicio_requisicao = time.perf_counter()
+    modo_perfil = request.headers.get('X-Perfil') if PERFIL_HABILITADO else None
+    if modo_perfil:
+        g.perfil = PerfilRequisicao()
+    if modo_perfil == 'cprofile':
+        perfilador = cProfile.Profile()
+        try:
+            perfilador.enable()
+            g.perfilador = perfilador
+        except ValueError:
+            # Outro perfilador já está ativo neste processo
+            logging.warning("Perfil cProfile ignorado: já existe um perfilador ativo")
+
+@app.after_request
+def _registrar_medicao(response):
+    inicio = g.get('inicio_requisicao')
+    if inicio is None:
+        return response
+    duracao = time.perf_counter() - inicio
+    hist_requisicoes.observar(duracao, _rota_atual(), request.method, str(response.status_code))
+    perfilador = g.pop('perfilador', None)
+    if perfilador is not None:
+        perfilador.disable()
+        saida = io.StringIO()
+        pstats.Stats(perfilador, stream=saida).sort_stats('cumulative').print_stats(PERFIL_LINHAS_CPROFILE)
+        logging.info("Perfil de %s %s:\n%s", request.method, request.path, saida.getvalue())
+    perfil = g.get('perfil')
+    if perfil is not None:
+        perfil.registrar('total', duracao)
+        response.headers['Server-Timing'] = perfil.server_timing()
+    return response
 
 # --- 3. MODELOS ---
+# Telescópio que recebe os agendamentos sem telescopio_id (e os de bancos
+# anteriores à tabela telescopio); o código dele mantém as chaves de lock antigas
+TELESCOPIO_PADRAO_ID = 1
+TELESCOPIO_PADRAO_CODIGO = "Hubble-Acad"
+
+class Telescopio(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), unique=True, nullable=False)
+    # Prefixo das chaves de lock (ex.: "Hubble-Acad_2025-12-01T03:00:00Z")
+    codigo = db.Column(db.String(50), unique=True, nullable=False)
+    data_cadastro = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
 class Cientista(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
@@ -75,16 +234,640 @@ class Cientista(db.Model):
 
 class Agendamento(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    cientista_id = db.Column(db.Integer, db.ForeignKey('cientista.id'), nullable=False)
+    cientista_id = db.Column(db.Integer, db.ForeignKey('cientista.id'), nullable=False, index=True)
+    telescopio_id = db.Column(
+        db.Integer, db.ForeignKey('telescopio.id'), nullable=False,
+        default=TELESCOPIO_PADRAO_ID, server_default=str(TELESCOPIO_PADRAO_ID)
+    )
     horario_inicio_utc = db.Column(db.DateTime, nullable=False)
     horario_fim_utc = db.Column(db.DateTime, nullable=False)
     status = db.Column(db.String(20), nullable=False, default='confirmado')
     objeto_observacao = db.Column(db.String(100))
     descricao = db.Column(db.String(200))
     data_criacao = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
-    data_atualizacao = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    data_atualizacao = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)
     cientista = db.relationship('Cientista', backref=db.backref('agendamentos', lazy=True))
 
+    # Índices compostos usados pela verificação de conflito e pelas listagens
+    # (o segundo também nas listagens e cargas por telescópio). AUTOINCREMENT:
+    # o SQLite não devolve a um agendamento novo o id de um que foi arquivado
+    # (ver _migrar_autoincremento)
+    __table_args__ = (
+        db.Index('ix_agendamento_status_horario', 'status', 'horario_inicio_utc', 'horario_fim_utc'),
+        db.Index('ix_agendamento_telescopio_status_horario', 'telescopio_id', 'status', 'horario_inicio_utc'),
+        {'sqlite_autoincrement': True},
+    )
+
+class AgendamentoArquivado(db.Model):
+    """
+    Agendamentos terminados antes do horizonte de arquivamento (ver
+    arquivamento.py): mesmas colunas e mesmo id da tabela agendamento.
+    """
+    __tablename__ = 'agendamento_arquivado'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    cientista_id = db.Column(db.Integer, db.ForeignKey('cientista.id'), nullable=False, index=True)
+    telescopio_id = db.Column(db.Integer, db.ForeignKey('telescopio.id'), nullable=False)
+    horario_inicio_utc = db.Column(db.DateTime, nullable=False)
+    horario_fim_utc = db.Column(db.DateTime, nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False)
+    objeto_observacao = db.Column(db.String(100))
+    descricao = db.Column(db.String(200))
+    data_criacao = db.Column(db.DateTime, nullable=False)
+    data_atualizacao = db.Column(db.DateTime, nullable=False)
+    arquivado_em = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_agendamento_arquivado_status_horario', 'status', 'horario_inicio_utc', 'horario_fim_utc'),
+    )
+
+class SerieObservacao(db.Model):
+    """
+    Série recorrente de observações (ver recorrencia.py), guardada numa linha
+    só: a primeira ocorrência e a regra (frequencia, intervalo, ocorrencias).
+    As ocorrências não viram linhas de agendamento.
+    """
+    __tablename__ = 'serie_observacao'
+    id = db.Column(db.Integer, primary_key=True)
+    cientista_id = db.Column(db.Integer, db.ForeignKey('cientista.id'), nullable=False, index=True)
+    telescopio_id = db.Column(db.Integer, db.ForeignKey('telescopio.id'), nullable=False, default=TELESCOPIO_PADRAO_ID)
+    # Primeira ocorrência
+    horario_inicio_utc = db.Column(db.DateTime, nullable=False)
+    horario_fim_utc = db.Column(db.DateTime, nullable=False)
+    frequencia = db.Column(db.String(10), nullable=False)
+    intervalo = db.Column(db.Integer, nullable=False, default=1)
+    ocorrencias = db.Column(db.Integer, nullable=False)
+    # Fim da última ocorrência (calculado na criação, para filtros)
+    horario_fim_serie_utc = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='confirmado')
+    objeto_observacao = db.Column(db.String(100))
+    descricao = db.Column(db.String(200))
+    data_criacao = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    data_atualizacao = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)
+
+    __table_args__ = (
+        db.Index('ix_serie_observacao_telescopio_status', 'telescopio_id', 'status'),
+    )
+
+class ChaveIdempotencia(db.Model):
+    chave = db.Column(db.String(255), primary_key=True)
+    impressao = db.Column(db.String(64), nullable=False)
+    status_http = db.Column(db.Integer, nullable=False)
+    corpo = db.Column(db.Text, nullable=False)
+    criado_em = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), index=True)
+
+def inicializar_schema():
+    """
+    Cria as tabelas e também os índices que faltarem em bancos já existentes
+    (o create_all só cria índices junto com tabelas novas).
+    """
+    db.create_all()
+    _migrar_telescopio_id()
+    _migrar_autoincremento()
+    for tabela in db.metadata.sorted_tables:
+        for indice in tabela.indexes:
+            indice.create(bind=db.engine, checkfirst=True)
+    if db.session.get(Telescopio, TELESCOPIO_PADRAO_ID) is None:
+        db.session.add(Telescopio(id=TELESCOPIO_PADRAO_ID, nome="Hubble Acadêmico", codigo=TELESCOPIO_PADRAO_CODIGO))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Outro worker criou ao mesmo tempo
+            db.session.rollback()
+
+def _migrar_telescopio_id():
+    """
+    Bancos criados antes dos telescópios: acrescenta agendamento.telescopio_id
+    (ALTER TABLE), com os agendamentos existentes no telescópio padrão.
+    """
+    colunas = {coluna["name"] for coluna in db.inspect(db.engine).get_columns('agendamento')}
+    if 'telescopio_id' in colunas:
+        return
+    try:
+        with db.engine.begin() as conexao:
+            conexao.execute(db.text(
+                "ALTER TABLE agendamento ADD COLUMN telescopio_id INTEGER NOT NULL "
+                f"DEFAULT {TELESCOPIO_PADRAO_ID} REFERENCES telescopio(id)"
+            ))
+        logging.info("Migração: coluna agendamento.telescopio_id criada")
+    except Exception as e:
+        # Outro worker pode ter acabado de criar a coluna
+        colunas = {coluna["name"] for coluna in db.inspect(db.engine).get_columns('agendamento')}
+        if 'telescopio_id' not in colunas:
+            raise
+        logging.info("Migração de telescopio_id já feita por outro processo (%s)", e)
+
+def _migrar_autoincremento():
+    """
+    Bancos criados sem AUTOINCREMENT na tabela agendamento: sem ele, o SQLite
+    reaproveita o maior id depois que esse agendamento vai para o arquivo, e
+    o mesmo id passa a valer para dois agendamentos. Não existe ALTER TABLE
+    para isso, então a tabela é recriada (com os mesmos ids) e a sequência
+    começa acima do maior id já usado, na tabela quente ou no arquivo.
+    """
+    if db.engine.dialect.name != 'sqlite' or _tem_autoincremento(db.session.connection()):
+        return
+    tabela = Agendamento.__table__
+    colunas = ", ".join(coluna.name for coluna in tabela.columns)
+    db.session.rollback()
+    with db.engine.connect() as conexao:
+        dbapi = conexao.connection.driver_connection
+        isolamento = dbapi.isolation_level
+        # isolation_level=None: BEGIN IMMEDIATE manual, com o DDL dentro da transação
+        dbapi.isolation_level = None
+        try:
+            dbapi.execute("BEGIN IMMEDIATE")
+            try:
+                # Outro worker pode ter migrado enquanto este esperava o lock de escrita
+                if not _tem_autoincremento(conexao):
+                    dbapi.execute("ALTER TABLE agendamento RENAME TO agendamento_migracao")
+                    indices = dbapi.execute(
+                        "SELECT name FROM sqlite_master WHERE type = 'index' "
+                        "AND tbl_name = 'agendamento_migracao' AND sql IS NOT NULL"
+                    ).fetchall()
+                    for (nome,) in indices:
+                        dbapi.execute(f'DROP INDEX "{nome}"')
+                    dbapi.execute(str(CreateTable(tabela).compile(db.engine)))
+                    for indice in tabela.indexes:
+                        dbapi.execute(str(CreateIndex(indice).compile(db.engine)))
+                    dbapi.execute(f"INSERT INTO agendamento ({colunas}) SELECT {colunas} FROM agendamento_migracao")
+                    dbapi.execute("DROP TABLE agendamento_migracao")
+                    maior_id = dbapi.execute(
+                        "SELECT MAX(COALESCE((SELECT MAX(id) FROM agendamento), 0), "
+                        "COALESCE((SELECT MAX(id) FROM agendamento_arquivado), 0))"
+                    ).fetchone()[0]
+                    dbapi.execute("DELETE FROM sqlite_sequence WHERE name = 'agendamento'")
+                    dbapi.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('agendamento', ?)", (maior_id,))
+                    logging.info("Migração: tabela agendamento recriada com AUTOINCREMENT (sequência em %s)", maior_id)
+                dbapi.execute("COMMIT")
+            except Exception:
+                dbapi.execute("ROLLBACK")
+                raise
+        finally:
+            dbapi.isolation_level = isolamento
+
+def _tem_autoincremento(conexao):
+    sql = conexao.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'agendamento'"
+    ).scalar()
+    return 'AUTOINCREMENT' in (sql or '').upper()
+
+# --- 3.1 ÍNDICE DE CONFLITOS EM MEMÓRIA ---
+# Árvore de intervalos com os agendamentos confirmados. Responde a verificação
+# de conflito sem consultar o SQLite; é carregada uma vez e atualizada a cada
+# criação e cancelamento. O calendário por dia (ver calendario.py) é mantido
+# junto e responde GET /disponibilidade.
+#
+# Há uma árvore e um calendário por telescópio: agendamentos de instrumentos
+# diferentes nunca são comparados entre si (nem disputam as mesmas chaves de
+# lock).
+#
+# Com vários processos (workers do gunicorn) cada um tem o seu índice; antes
+# de cada verificação o índice aplica o que os outros gravaram no banco desde
+# a última vez: agendamentos com id maior que o último visto e cancelamentos
+# recentes (data_atualizacao). Como a verificação roda depois de adquirir o
+# lock, todo agendamento que disputa as mesmas fatias já está no banco.
+indices_confirmados = {}  # telescopio_id -> ArvoreIntervalos
+calendarios_confirmados = {}  # telescopio_id -> CalendarioOcupacao
+_confirmados_indexados = {}  # id -> (telescopio_id, inicio, fim)
+_indice_carregado = False
+_indice_lock = threading.RLock()
+_ultimo_id_visto = 0
+_ultima_sincronizacao = None
+# Folga para cancelamentos gravados com data_atualizacao anterior ao commit
+# (ex.: esperando o busy_timeout do SQLite)
+MARGEM_SINCRONIZACAO = timedelta(milliseconds=SQLITE_BUSY_TIMEOUT_MS) + timedelta(seconds=30)
+# Versão da agenda vista por este processo: muda a cada agendamento indexado
+# ou desindexado (criação, lote, cancelamento e o que a sincronização trouxer
+# de outros processos). Invalida o cache do GET /agendamentos.
+_versao_agenda = 0
+_agenda_modificada_em = datetime.now(timezone.utc)
+# Maior horario_fim_utc da tabela de arquivo (None se ela estiver vazia): o
+# que termina antes disso pode estar arquivado. Atualizada junto com o índice.
+_fronteira_arquivo = None
+# Séries recorrentes confirmadas: por telescópio, uma árvore com o período
+# total de cada série (início da primeira ocorrência, fim da última). As
+# ocorrências são calculadas só dentro da janela consultada (recorrencia.py).
+series_confirmadas = {}  # telescopio_id -> ArvoreIntervalos
+_series_indexadas = {}  # serie_id -> (telescopio_id, Recorrencia)
+_ultima_serie_vista = 0
+# Leituras (GET /agendamentos, GET /disponibilidade) só sincronizam o índice
+# quando o banco mudou desde a última vez: um marcador barato, lido sem o
+# _indice_lock, evita que elas fiquem em fila atrás umas das outras e dos
+# escritores. Um cancelamento gravado com data_atualizacao anterior à de
+# outro já visto não muda o marcador; por isso, passado este intervalo, a
+# leitura sincroniza de qualquer forma.
+INTERVALO_SINCRONIZACAO_LEITURA = float(os.environ.get('INDICE_SINCRONIZACAO_LEITURA_S', 1.0))
+_marcador_leitura = None
+_sincronizado_em = 0.0  # time.monotonic() da última sincronização
+
+def _utc_naive(dt):
+    """
+    Normaliza um datetime para UTC sem tzinfo (o formato que o SQLite devolve).
+    """
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def indice_do_telescopio(telescopio_id):
+    arvore = indices_confirmados.get(telescopio_id)
+    if arvore is None:
+        with _indice_lock:
+            arvore = indices_confirmados.setdefault(telescopio_id, ArvoreIntervalos())
+    return arvore
+
+def calendario_do_telescopio(telescopio_id):
+    calendario = calendarios_confirmados.get(telescopio_id)
+    if calendario is None:
+        with _indice_lock:
+            calendario = calendarios_confirmados.setdefault(telescopio_id, CalendarioOcupacao())
+    return calendario
+
+def series_do_telescopio(telescopio_id):
+    arvore = series_confirmadas.get(telescopio_id)
+    if arvore is None:
+        with _indice_lock:
+            arvore = series_confirmadas.setdefault(telescopio_id, ArvoreIntervalos())
+    return arvore
+
+def garantir_indice_conflitos():
+    """
+    Carrega os agendamentos confirmados na árvore de intervalos na primeira
+    chamada do processo; nas seguintes, aplica as mudanças feitas por outros
+    processos.
+    """
+    global _indice_carregado, _ultimo_id_visto, _ultima_sincronizacao, _fronteira_arquivo, _ultima_serie_vista
+    global _sincronizado_em
+    with _indice_lock:
+        agora = _utc_naive(datetime.now(timezone.utc))
+        inicio_sincronizacao = time.monotonic()
+        if _indice_carregado:
+            _sincronizar_indice()
+            _ultima_sincronizacao = agora
+            _sincronizado_em = inicio_sincronizacao
+            return
+        indices_confirmados.clear()
+        calendarios_confirmados.clear()
+        _confirmados_indexados.clear()
+        _ultimo_id_visto = db.session.query(db.func.max(Agendamento.id)).scalar() or 0
+        _fronteira_arquivo = db.session.query(db.func.max(AgendamentoArquivado.horario_fim_utc)).scalar()
+        linhas = db.session.query(
+            Agendamento.id, Agendamento.horario_inicio_utc, Agendamento.horario_fim_utc, Agendamento.telescopio_id
+        ).filter(
+            Agendamento.status == 'confirmado', Agendamento.id <= _ultimo_id_visto
+        ).yield_per(5000)
+        for ag_id, inicio, fim, telescopio_id in linhas:
+            indexar_confirmado(_utc_naive(inicio), _utc_naive(fim), ag_id, telescopio_id)
+        series_confirmadas.clear()
+        _series_indexadas.clear()
+        _ultima_serie_vista = db.session.query(db.func.max(SerieObservacao.id)).scalar() or 0
+        for serie in SerieObservacao.query.filter(
+            SerieObservacao.status == 'confirmado', SerieObservacao.id <= _ultima_serie_vista
+        ):
+            indexar_serie(serie.id, serie.telescopio_id, recorrencia_da_serie(serie))
+        _indice_carregado = True
+        _ultima_sincronizacao = agora
+        _sincronizado_em = inicio_sincronizacao
+        logging.info(
+            "Índice de conflitos carregado com %s agendamentos confirmados e %s séries em %s telescópios",
+            len(_confirmados_indexados), len(_series_indexadas), len(indices_confirmados)
+        )
+
+def marcador_banco():
+    """
+    Valores que mudam quando outro processo cria, cancela ou arquiva
+    agendamentos e séries. Uma consulta só; cada MAX sai do índice da coluna.
+    """
+    return tuple(db.session.execute(db.select(
+        db.select(db.func.max(Agendamento.id)).scalar_subquery(),
+        db.select(db.func.max(Agendamento.data_atualizacao)).scalar_subquery(),
+        db.select(db.func.max(SerieObservacao.id)).scalar_subquery(),
+        db.select(db.func.max(SerieObservacao.data_atualizacao)).scalar_subquery(),
+        db.select(db.func.max(AgendamentoArquivado.horario_fim_utc)).scalar_subquery(),
+    )).one())
+
+def garantir_indice_leitura():
+    """
+    garantir_indice_conflitos() para as rotas de leitura: sem mudança no
+    banco (e dentro de INTERVALO_SINCRONIZACAO_LEITURA) não toma o
+    _indice_lock. As verificações de conflito continuam sincronizando sempre.
+    """
+    global _marcador_leitura
+    # Lido antes da sincronização: o índice fica pelo menos tão novo quanto ele
+    marcador = marcador_banco()
+    if (_indice_carregado and marcador == _marcador_leitura
+            and time.monotonic() - _sincronizado_em < INTERVALO_SINCRONIZACAO_LEITURA):
+        return
+    garantir_indice_conflitos()
+    _marcador_leitura = marcador
+
+def _sincronizar_indice():
+    """
+    Aplica ao índice os agendamentos novos, os cancelamentos e os
+    arquivamentos gravados por outros processos. As consultas usam índices
+    (id, data_atualizacao e horario_fim_utc do arquivo).
+    """
+    global _ultimo_id_visto, _ultima_serie_vista
+    novos = db.session.query(
+        Agendamento.id, Agendamento.horario_inicio_utc, Agendamento.horario_fim_utc,
+        Agendamento.status, Agendamento.telescopio_id
+    ).filter(Agendamento.id > _ultimo_id_visto).order_by(Agendamento.id).all()
+    for ag_id, inicio, fim, status, telescopio_id in novos:
+        if status == 'confirmado':
+            indexar_confirmado(_utc_naive(inicio), _utc_naive(fim), ag_id, telescopio_id)
+        _ultimo_id_visto = ag_id
+    if novos:
+        # Linhas novas que já chegam canceladas não passam pelo índice, mas
+        # aparecem nas listagens (?status=cancelado): a versão muda igual
+        _registrar_mudanca_agenda()
+    cancelados = db.session.query(Agendamento.id).filter(
+        Agendamento.data_atualizacao >= _ultima_sincronizacao - MARGEM_SINCRONIZACAO,
+        Agendamento.status != 'confirmado'
+    ).all()
+    for (ag_id,) in cancelados:
+        desindexar_confirmado(ag_id)
+    series_novas = SerieObservacao.query.filter(
+        SerieObservacao.id > _ultima_serie_vista
+    ).order_by(SerieObservacao.id).all()
+    for serie in series_novas:
+        if serie.status == 'confirmado':
+            indexar_serie(serie.id, serie.telescopio_id, recorrencia_da_serie(serie))
+        _ultima_serie_vista = serie.id
+    if series_novas:
+        _registrar_mudanca_agenda()
+    series_canceladas = db.session.query(SerieObservacao.id).filter(
+        SerieObservacao.data_atualizacao >= _ultima_sincronizacao - MARGEM_SINCRONIZACAO,
+        SerieObservacao.status != 'confirmado'
+    ).all()
+    for (serie_id,) in series_canceladas:
+        desindexar_serie(serie_id)
+    # Arquivamentos: só a fronteira (MAX pelo índice), não as linhas movidas
+    fronteira = db.session.query(db.func.max(AgendamentoArquivado.horario_fim_utc)).scalar()
+    if fronteira is not None and (_fronteira_arquivo is None or fronteira > _fronteira_arquivo):
+        ids = [ag_id for ag_id, (_, _, fim) in _confirmados_indexados.items() if fim <= fronteira]
+        _registrar_arquivamento(ids, fronteira)
+
+def _registrar_arquivamento(ids, fronteira):
+    """
+    Tira do índice os agendamentos arquivados, avança a fronteira do arquivo
+    e muda a versão da agenda (as listagens em cache podem ter incluído
+    cancelados que foram arquivados).
+
+    Os outros processos tiram do índice tudo o que termina até a fronteira,
+    arquivado ou ainda não: um agendamento novo que se sobreponha a eles
+    começaria antes da fronteira e é recusado de qualquer forma.
+    """
+    global _fronteira_arquivo
+    with _indice_lock:
+        for ag_id in ids:
+            desindexar_confirmado(ag_id)
+        if _fronteira_arquivo is None or fronteira > _fronteira_arquivo:
+            _fronteira_arquivo = fronteira
+        _registrar_mudanca_agenda()
+
+def _periodo_arquivado(inicio):
+    fronteira = fronteira_arquivo()
+    return fronteira is not None and _utc_naive(inicio) < fronteira
+
+def fronteira_arquivo():
+    """
+    Agendamentos que terminam antes deste instante podem estar no arquivo
+    (None: nada arquivado). Vale depois de garantir_indice_conflitos().
+    """
+    return _fronteira_arquivo
+
+def _registrar_mudanca_agenda():
+    global _versao_agenda, _agenda_modificada_em
+    _versao_agenda += 1
+    _agenda_modificada_em = datetime.now(timezone.utc)
+
+def versao_agenda():
+    """
+    (versão, data da última mudança) da agenda neste processo.
+    """
+    with _indice_lock:
+        return _versao_agenda, _agenda_modificada_em
+
+def indexar_confirmado(inicio, fim, ag_id, telescopio_id):
+    """
+    Registra um agendamento confirmado na árvore de conflitos e no calendário
+    do telescópio (sem efeito se ele já estiver lá).
+    """
+    with _indice_lock:
+        if ag_id in _confirmados_indexados:
+            return
+        _confirmados_indexados[ag_id] = (telescopio_id, inicio, fim)
+        indice_do_telescopio(telescopio_id).inserir(inicio, fim, ag_id)
+        calendario_do_telescopio(telescopio_id).adicionar(inicio, fim, ag_id)
+        _registrar_mudanca_agenda()
+
+def desindexar_confirmado(ag_id):
+    """
+    Retira um agendamento (cancelado) da árvore de conflitos e do calendário.
+    """
+    with _indice_lock:
+        indexado = _confirmados_indexados.pop(ag_id, None)
+        if indexado is None:
+            return
+        telescopio_id, inicio, fim = indexado
+        indice_do_telescopio(telescopio_id).remover(inicio, ag_id)
+        calendario_do_telescopio(telescopio_id).remover(inicio, fim, ag_id)
+        _registrar_mudanca_agenda()
+
+def recorrencia_da_serie(serie):
+    return Recorrencia.por_regra(
+        _utc_naive(serie.horario_inicio_utc), _utc_naive(serie.horario_fim_utc),
+        serie.frequencia, serie.intervalo, serie.ocorrencias
+    )
+
+def indexar_serie(serie_id, telescopio_id, recorrencia):
+    """
+    Registra uma série confirmada na árvore de séries do telescópio (sem
+    efeito se ela já estiver lá).
+    """
+    with _indice_lock:
+        if serie_id in _series_indexadas:
+            return
+        _series_indexadas[serie_id] = (telescopio_id, recorrencia)
+        series_do_telescopio(telescopio_id).inserir(recorrencia.inicio, recorrencia.fim_total, serie_id)
+
+def desindexar_serie(serie_id):
+    with _indice_lock:
+        indexada = _series_indexadas.pop(serie_id, None)
+        if indexada is None:
+            return
+        telescopio_id, recorrencia = indexada
+        series_do_telescopio(telescopio_id).remover(recorrencia.inicio, serie_id)
+
+def ocorrencias_das_series(telescopio_id, inicio, fim):
+    """
+    Ocorrências (inicio, fim, serie_id) das séries do telescópio que se
+    sobrepõem a [inicio, fim), em ordem de início. Só as séries cujo
+    período total toca a janela são expandidas, e só dentro dela.
+    """
+    with _indice_lock:
+        series = [
+            (serie_id, _series_indexadas[serie_id][1])
+            for _, _, serie_id in series_do_telescopio(telescopio_id).sobrepostos(inicio, fim)
+        ]
+    return mesclar(*[
+        ((ini, fi, serie_id) for _, ini, fi in recorrencia.na_janela(inicio, fim))
+        for serie_id, recorrencia in series
+    ])
+
+def conflito_com_series(telescopio_id, inicio, fim):
+    """
+    Primeira ocorrência de série (inicio, fim, serie_id) que se sobrepõe a
+    [inicio, fim), ou None.
+    """
+    return next(ocorrencias_das_series(telescopio_id, inicio, fim), None)
+
+# --- 3.2 IDEMPOTÊNCIA ---
+# Respostas de sucesso de POST /agendamentos e do cancelamento ficam guardadas
+# pela Idempotency-Key: em memória (ver idempotencia.py) e na tabela
+# chave_idempotencia, que vale para todos os workers. A repetição devolve a
+# resposta original sem lock nem verificação de conflito. Falhas não são
+# guardadas: não mudaram nada e podem ser tentadas de novo.
+IDEMPOTENCIA_TTL = int(os.environ.get('IDEMPOTENCIA_TTL_S', 24 * 3600))
+armazem_idempotencia = ArmazemIdempotencia(
+    capacidade=int(os.environ.get('IDEMPOTENCIA_MAX_CHAVES', 10000)), ttl=IDEMPOTENCIA_TTL
+)
+TAMANHO_MAXIMO_CHAVE = 255
+INTERVALO_LIMPEZA_IDEMPOTENCIA = 60  # segundos entre remoções das chaves vencidas no banco
+_ultima_limpeza_idempotencia = 0.0
+
+def _buscar_idempotencia(chave):
+    """
+    Resposta guardada para a chave (memória e depois banco), ou None.
+    """
+    guardada = armazem_idempotencia.obter(chave)
+    if guardada is not None:
+        return guardada
+    linha = db.session.get(ChaveIdempotencia, chave)
+    if linha is None:
+        return None
+    criada_em = linha.criado_em.replace(tzinfo=timezone.utc).timestamp()
+    if time.time() - criada_em > IDEMPOTENCIA_TTL:
+        return None
+    guardada = RespostaGuardada(linha.impressao, linha.status_http, linha.corpo.encode('utf-8'), criada_em)
+    armazem_idempotencia.guardar(chave, guardada)
+    return guardada
+
+def _guardar_idempotencia(chave, impressao, resposta):
+    global _ultima_limpeza_idempotencia
+    agora = time.time()
+    corpo = resposta.get_data()
+    try:
+        db.session.add(ChaveIdempotencia(
+            chave=chave, impressao=impressao, status_http=resposta.status_code,
+            corpo=corpo.decode('utf-8'), criado_em=datetime.fromtimestamp(agora, timezone.utc)
+        ))
+        if agora - _ultima_limpeza_idempotencia > INTERVALO_LIMPEZA_IDEMPOTENCIA:
+            _ultima_limpeza_idempotencia = agora
+            ChaveIdempotencia.query.filter(
+                ChaveIdempotencia.criado_em < datetime.fromtimestamp(agora - IDEMPOTENCIA_TTL, timezone.utc)
+            ).delete(synchronize_session=False)
+        db.session.commit()
+    except IntegrityError:
+        # Outra requisição com a mesma chave gravou primeiro
+        db.session.rollback()
+        return
+    except Exception as e:
+        db.session.rollback()
+        logging.error("Falha ao guardar a Idempotency-Key %s: %s", chave, e)
+        return
+    armazem_idempotencia.guardar(chave, RespostaGuardada(impressao, resposta.status_code, corpo, agora))
+
+def idempotente(view):
+    """
+    Aplica o cabeçalho Idempotency-Key a uma rota de escrita.
+    """
+    @functools.wraps(view)
+    def envolvida(*args, **kwargs):
+        chave = request.headers.get('Idempotency-Key')
+        if chave is None:
+            return view(*args, **kwargs)
+        if not 0 < len(chave) <= TAMANHO_MAXIMO_CHAVE:
+            return jsonify({"error": "Dados inválidos", "details": f"Idempotency-Key deve ter de 1 a {TAMANHO_MAXIMO_CHAVE} caracteres"}), 400
+        rota = _rota_atual()
+        impressao = impressao_requisicao(request.method, request.path, request.get_data())
+        guardada = _buscar_idempotencia(chave)
+        if guardada is None:
+            resposta = app.make_response(view(*args, **kwargs))
+            if 200 <= resposta.status_code < 300:
+                _guardar_idempotencia(chave, impressao, resposta)
+                idempotencia_total.incrementar(rota, 'nova')
+                return resposta
+            # Uma tentativa simultânea com a mesma chave pode ter vencido (e
+            # causado este 409/400): nesse caso vale a resposta dela
+            guardada = _buscar_idempotencia(chave)
+            if guardada is None:
+                return resposta
+        if guardada.impressao != impressao:
+            idempotencia_total.incrementar(rota, 'divergente')
+            return jsonify({"error": "Idempotency-Key já usada com outra requisição"}), 422
+        idempotencia_total.incrementar(rota, 'reproduzida')
+        logging.info("Idempotency-Key %s repetida: devolvendo a resposta original", chave)
+        resposta = Response(guardada.corpo, status=guardada.status, mimetype='application/json')
+        resposta.headers['Idempotent-Replayed'] = 'true'
+        return resposta
+    return envolvida
+
+# --- 3.3 CACHE DE CIENTISTAS E TELESCÓPIOS ---
+# Dados do cientista usados na auditoria (id, nome, email), lidos do banco só
+# na primeira vez. Hoje cientistas só são criados (/setup, que limpa o cache);
+# o TTL limita por quanto tempo uma alteração feita por outro processo fica
+# invisível aqui. Cientistas inexistentes não entram no cache.
+cache_cientistas = CacheTTL(
+    capacidade=int(os.environ.get('CACHE_CIENTISTAS_MAX', 1024)),
+    ttl=float(os.environ.get('CACHE_CIENTISTAS_TTL_S', 300))
+)
+
+def _detalhes_cientista(cientista):
+    return {"cientista_id": cientista.id, "cientista_nome": cientista.nome, "cientista_email": cientista.email}
+
+def detalhes_cientista(cientista_id):
+    """
+    user_details do cientista para a auditoria, ou None se ele não existir.
+    """
+    detalhes = cache_cientistas.obter(cientista_id)
+    if detalhes is None:
+        cientista = db.session.get(Cientista, cientista_id)
+        if cientista is None:
+            return None
+        detalhes = _detalhes_cientista(cientista)
+        cache_cientistas.guardar(cientista_id, detalhes)
+    return detalhes
+
+# Telescópios (id, nome, código do lock), pelo mesmo caminho dos cientistas
+cache_telescopios = CacheTTL(capacidade=256, ttl=cache_cientistas.ttl)
+
+def dados_telescopio(telescopio_id):
+    """
+    {"id", "nome", "codigo"} do telescópio, ou None se ele não existir.
+    """
+    dados = cache_telescopios.obter(telescopio_id)
+    if dados is None:
+        telescopio = db.session.get(Telescopio, telescopio_id)
+        if telescopio is None:
+            return None
+        dados = {"id": telescopio.id, "nome": telescopio.nome, "codigo": telescopio.codigo}
+        cache_telescopios.guardar(telescopio_id, dados)
+    return dados
+
+def _ler_telescopio_id(valor):
+    """
+    telescopio_id de um corpo JSON ou da query string (padrão: o telescópio
+    padrão). Levanta ParametroInvalido se não for inteiro.
+    """
+    if valor is None or valor == '':
+        return TELESCOPIO_PADRAO_ID
+    if isinstance(valor, bool):
+        raise ParametroInvalido("O campo 'telescopio_id' deve ser um inteiro")
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ParametroInvalido("O campo 'telescopio_id' deve ser um inteiro")
+
 # --- 4. ROTAS DA API ---
 
 @app.route('/')
@@ -93,8 +876,8 @@ def index():
 
 @app.route('/time', methods=['GET'])
 def get_time():
-    logging.info(f"Requisição recebida em GET /time do IP {request.remote_addr}")
-    server_time = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+    logging.info("Requisição recebida em GET /time do IP %s", request.remote_addr)
+    server_time = formatar_utc(datetime.now(timezone.utc))
     return jsonify({
         "server_time_utc": server_time,
         "_links": {
@@ -104,70 +887,314 @@ def get_time():
         }
     })
 
+# Paginação do GET /agendamentos
+LIMITE_PADRAO_PAGINA = 100
+LIMITE_MAXIMO_PAGINA = 1000
+TAMANHO_LOTE_STREAMING = 500
+# Páginas JSON já serializadas, por query string e versão da agenda
+cache_agendamentos = CacheRespostas(int(os.environ.get('CACHE_AGENDAMENTOS_MAX_BYTES', 16 * 1024 * 1024)))
+
+class ParametroInvalido(ValueError):
+    pass
+
+def _parse_horario(valor, campo):
+    try:
+        return datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        raise ParametroInvalido(f"O campo '{campo}' deve ser um horário ISO 8601")
+
+def _codificar_cursor(inicio, ag_id):
+    bruto = f"{inicio.isoformat()}|{ag_id}".encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip('=')
+
+def _decodificar_cursor(cursor):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        inicio_str, id_str = bruto.rsplit('|', 1)
+        return datetime.fromisoformat(inicio_str), int(id_str)
+    except (ValueError, UnicodeDecodeError):
+        raise ParametroInvalido("Cursor de paginação inválido")
+
+def _filtros_listagem(args):
+    """
+    Lê e valida os filtros de GET /agendamentos a partir da query string.
+    """
+    filtros = {"status": args.get('status', 'confirmado')}
+    if args.get('inicio'):
+        filtros["inicio"] = _utc_naive(_parse_horario(args['inicio'], 'inicio'))
+    if args.get('fim'):
+        filtros["fim"] = _utc_naive(_parse_horario(args['fim'], 'fim'))
+    if args.get('cientista_id'):
+        try:
+            filtros["cientista_id"] = int(args['cientista_id'])
+        except ValueError:
+            raise ParametroInvalido("O campo 'cientista_id' deve ser um inteiro")
+    if args.get('telescopio_id'):
+        try:
+            filtros["telescopio_id"] = int(args['telescopio_id'])
+        except ValueError:
+            raise ParametroInvalido("O campo 'telescopio_id' deve ser um inteiro")
+    if args.get('objeto_observacao'):
+        filtros["objeto_observacao"] = args['objeto_observacao']
+    return filtros
+
+def _colunas_listagem(campos, links):
+    """
+    Colunas a consultar: os campos pedidos, as do cursor e as dos _links.
+    """
+    nomes = list(campos or SERIALIZADOR_AGENDAMENTO.padrao)
+    for nome in ('id', 'horario_inicio_utc') + (CAMPOS_LINKS_AGENDAMENTO if links else ()):
+        if nome not in nomes:
+            nomes.append(nome)
+    return nomes
+
+def _inclui_arquivo(filtros):
+    """
+    Se a listagem precisa ler também agendamento_arquivado: só quando o
+    período pedido começa antes da fronteira do arquivo.
+    """
+    fronteira = fronteira_arquivo()
+    return fronteira is not None and "inicio" in filtros and filtros["inicio"] < fronteira
+
+def _filtrar_listagem(modelo, nomes, filtros, cursor):
+    consulta = db.session.query(
+        *[getattr(modelo, nome) for nome in nomes]
+    ).filter(modelo.status == filtros["status"])
+    # O intervalo de tempo seleciona agendamentos que se sobrepõem a [inicio, fim)
+    if "inicio" in filtros:
+        consulta = consulta.filter(modelo.horario_fim_utc > filtros["inicio"])
+    if "fim" in filtros:
+        consulta = consulta.filter(modelo.horario_inicio_utc < filtros["fim"])
+    if "cientista_id" in filtros:
+        consulta = consulta.filter(modelo.cientista_id == filtros["cientista_id"])
+    if "telescopio_id" in filtros:
+        consulta = consulta.filter(modelo.telescopio_id == filtros["telescopio_id"])
+    if "objeto_observacao" in filtros:
+        consulta = consulta.filter(modelo.objeto_observacao == filtros["objeto_observacao"])
+    if cursor:
+        cursor_inicio, cursor_id = cursor
+        consulta = consulta.filter(
+            (modelo.horario_inicio_utc > cursor_inicio) |
+            ((modelo.horario_inicio_utc == cursor_inicio) & (modelo.id > cursor_id))
+        )
+    return consulta
+
+def _consulta_listagem(filtros, cursor=None, nomes=None):
+    """
+    Monta a consulta (só as colunas usadas na resposta, sem carregar objetos
+    ORM) ordenada por (horario_inicio_utc, id) a partir do cursor. Períodos
+    históricos leem as duas tabelas (UNION ALL); os ids não se repetem entre
+    elas (a tabela agendamento usa AUTOINCREMENT, então o id de um
+    agendamento arquivado não é dado a outro), e o cursor continua valendo.
+    """
+    nomes = nomes or _colunas_listagem(None, True)
+    consulta = _filtrar_listagem(Agendamento, nomes, filtros, cursor)
+    if _inclui_arquivo(filtros):
+        consulta = consulta.union_all(_filtrar_listagem(AgendamentoArquivado, nomes, filtros, cursor))
+    return consulta.order_by(Agendamento.horario_inicio_utc, Agendamento.id)
+
+def _url_com_parametros(args, caminho='/agendamentos', **novos):
+    parametros = dict(args.items())
+    parametros.update(novos)
+    query = urlencode(parametros)
+    return f"{caminho}?{query}" if query else caminho
+
+def _stream_ndjson(filtros, cursor, campos, links):
+    """
+    Gera uma linha JSON por agendamento, lendo o banco em lotes por keyset
+    para manter o uso de memória constante em exportações grandes.
+    """
+    serializar = SERIALIZADOR_AGENDAMENTO.compilar(campos, links)
+    nomes = _colunas_listagem(campos, links)
+    while True:
+        lote = _consulta_listagem(filtros, cursor, nomes).limit(TAMANHO_LOTE_STREAMING).all()
+        yield b"".join(serializar_json(serializar(linha)) + b"\n" for linha in lote)
+        if len(lote) < TAMANHO_LOTE_STREAMING:
+            return
+        cursor = (lote[-1].horario_inicio_utc, lote[-1].id)
+
 @app.route('/agendamentos', methods=['GET'])
 def get_agendamentos():
     logging.info("Requisição recebida para GET /agendamentos")
-    agendamentos_db = Agendamento.query.filter_by(status='confirmado').all()
-    agendamentos_json = []
-    for ag in agendamentos_db:
-        ag_data = {
-            "id": ag.id,
-            "cientista_id": ag.cientista_id,
-            "horario_inicio_utc": ag.horario_inicio_utc.isoformat().replace('+00:00', 'Z'),
-            "status": ag.status,
-            "objeto_observacao": ag.objeto_observacao,
-            "_links": {
-                "self": {"href": f"/agendamentos/{ag.id}"},
-                "cientista": {"href": f"/cientistas/{ag.cientista_id}"},
-                "cancelar": {
-                    "href": f"/agendamentos/{ag.id}/cancelar",
-                    "method": "POST",
-                    "description": "Cancelar este agendamento"
-                }
-            }
+    try:
+        filtros = _filtros_listagem(request.args)
+        cursor = _decodificar_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        limite = request.args.get('limite', LIMITE_PADRAO_PAGINA)
+        if not str(limite).isdigit() or int(limite) < 1:
+            raise ParametroInvalido("O campo 'limite' deve ser um inteiro positivo")
+        limite = min(int(limite), LIMITE_MAXIMO_PAGINA)
+        # Campos de cada item (?fields=) e _links por item (?links=false)
+        campos = ler_campos(request.args.get('fields'))
+        if campos:
+            campos = SERIALIZADOR_AGENDAMENTO.canonicos(campos)
+        links = ler_links(request.args.get('links'))
+    except ValueError as e:
+        return jsonify({"error": "Dados inválidos", "details": str(e)}), 400
+
+    if request.args.get('formato') == 'ndjson':
+        # Carrega a fronteira do arquivo (períodos históricos)
+        garantir_indice_leitura()
+        return Response(
+            stream_with_context(_stream_ndjson(filtros, cursor, campos, links)),
+            mimetype='application/x-ndjson'
+        )
+
+    # O índice aplica antes as mudanças de outros processos, para que a
+    # versão lida aqui cubra tudo o que já está no banco. A versão é lida
+    # antes da consulta: uma página nunca fica marcada com versão mais nova
+    # que o seu conteúdo.
+    garantir_indice_leitura()
+    versao, modificada_em = versao_agenda()
+    chave = request.query_string
+    entrada = cache_agendamentos.obter(chave, versao)
+    if entrada is None:
+        corpo = _pagina_listagem(filtros, cursor, limite, campos, links)
+        # ETag pelo conteúdo: vale entre workers, que têm versões próprias
+        entrada = EntradaCache(versao, corpo, hashlib.sha1(corpo).hexdigest(), modificada_em)
+        cache_agendamentos.guardar(chave, entrada)
+
+    resposta = Response(entrada.corpo, mimetype='application/json')
+    resposta.set_etag(entrada.etag)
+    resposta.last_modified = entrada.ultima_modificacao
+    # O navegador guarda a página mas revalida sempre (If-None-Match -> 304)
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta.make_conditional(request)
+
+def _pagina_listagem(filtros, cursor, limite, campos, links):
+    """
+    Corpo JSON (bytes) de uma página do GET /agendamentos.
+    """
+    serializar = SERIALIZADOR_AGENDAMENTO.compilar(campos, links)
+    # Busca um item a mais para saber se existe próxima página
+    linhas = _consulta_listagem(filtros, cursor, _colunas_listagem(campos, links)).limit(limite + 1).all()
+    tem_proxima = len(linhas) > limite
+    linhas = linhas[:limite]
+    agendamentos_json = [serializar(linha) for linha in linhas]
+
+    links_pagina = {
+        "self": {"href": _url_com_parametros(request.args)},
+        "criar": {"href": "/agendamentos", "method": "POST", "description": "Criar novo agendamento"}
+    }
+    proximo_cursor = None
+    if tem_proxima:
+        proximo_cursor = _codificar_cursor(linhas[-1].horario_inicio_utc, linhas[-1].id)
+        links_pagina["next"] = {
+            "href": _url_com_parametros(request.args, cursor=proximo_cursor),
+            "method": "GET",
+            "description": "Próxima página"
         }
-        agendamentos_json.append(ag_data)
-    return jsonify({"total": len(agendamentos_json), "agendamentos": agendamentos_json})
+
+    filtros_aplicados = {k: request.args[k] for k in ('status', 'inicio', 'fim', 'cientista_id', 'telescopio_id', 'objeto_observacao') if k in request.args}
+    return serializar_json({
+        "total": len(agendamentos_json),
+        "filtros_aplicados": filtros_aplicados,
+        "inclui_arquivados": _inclui_arquivo(filtros),
+        "agendamentos": agendamentos_json,
+        "proximo_cursor": proximo_cursor,
+        "_links": links_pagina
+    })
+
+def _serializador_da_requisicao(serializador, campos_padrao=None):
+    """
+    Serializador compilado para ?fields= e ?links= da requisição atual.
+    """
+    return serializador.compilar(
+        ler_campos(request.args.get('fields')) or campos_padrao, ler_links(request.args.get('links'))
+    )
+
+@app.route('/agendamentos/<int:id>', methods=['GET'])
+def get_agendamento(id):
+    try:
+        serializar = _serializador_da_requisicao(SERIALIZADOR_AGENDAMENTO, SERIALIZADOR_AGENDAMENTO.campos)
+    except ValueError as e:
+        return jsonify({"error": "Dados inválidos", "details": str(e)}), 400
+    # Os antigos podem ter sido arquivados
+    agendamento = db.session.get(Agendamento, id) or db.session.get(AgendamentoArquivado, id)
+    if not agendamento:
+        return jsonify({"error": "Agendamento não encontrado"}), 404
+    return jsonify(serializar(agendamento))
+
+@app.route('/cientistas/<int:id>', methods=['GET'])
+def get_cientista(id):
+    try:
+        serializar = _serializador_da_requisicao(SERIALIZADOR_CIENTISTA)
+    except ValueError as e:
+        return jsonify({"error": "Dados inválidos", "details": str(e)}), 400
+    cientista = db.session.get(Cientista, id)
+    if not cientista:
+        return jsonify({"error": "Cientista não encontrado"}), 404
+    return jsonify(serializar(cientista))
 
 @app.route('/agendamentos/<int:id>/cancelar', methods=['POST'])
+@idempotente
 def cancelar_agendamento(id):
-    logging.info(f"Requisição recebida para POST /agendamentos/{id}/cancelar")
-    agendamento = db.session.get(Agendamento, id)
+    logging.info("Requisição recebida para POST /agendamentos/%s/cancelar", id)
+    # O cientista vem na mesma consulta (JOIN), para a auditoria
+    agendamento = db.session.query(Agendamento).options(
+        joinedload(Agendamento.cientista)
+    ).filter(Agendamento.id == id).first()
     if not agendamento:
+        if db.session.get(AgendamentoArquivado, id):
+            return jsonify({"error": "Não é possível cancelar um agendamento arquivado"}), 400
         return jsonify({"error": "Agendamento não encontrado"}), 404
     if agendamento.status != 'confirmado':
         return jsonify({"error": "Não é possível cancelar um agendamento que não está 'confirmado'"}), 400
 
-    agendamento.status = 'cancelado'
-    agendamento.data_atualizacao = datetime.now(timezone.utc)
-    db.session.commit()
-    
-    try:
-        cientista = agendamento.cientista
-        user_details = {"cientista_id": cientista.id, "cientista_nome": cientista.nome, "cientista_email": cientista.email}
-    except Exception:
-        user_details = {"cientista_id": agendamento.cientista_id}
-
-    log_audit(
-        event_type="AGENDAMENTO_CANCELADO", user_details=user_details,
-        details={
-            "agendamento_id": agendamento.id,
-            "horario_inicio_utc": agendamento.horario_inicio_utc.isoformat().replace('+00:00', 'Z'),
-            "status_anterior": "confirmado", "status_novo": "cancelado"
-        }
-    )
+    # Lidos antes do commit, que expira o objeto (evita recarregá-lo depois)
+    cientista_id = agendamento.cientista_id
+    horario_inicio_utc = agendamento.horario_inicio_utc
+    if agendamento.cientista is not None:
+        user_details = _detalhes_cientista(agendamento.cientista)
+        cache_cientistas.guardar(cientista_id, user_details)
+    else:
+        user_details = {"cientista_id": cientista_id}
+
+    garantir_indice_conflitos()
+    with medir_etapa('commit'):
+        # UPDATE condicional: de dois cancelamentos simultâneos só um muda a linha
+        alterados = Agendamento.query.filter_by(id=id, status='confirmado').update(
+            {"status": "cancelado", "data_atualizacao": datetime.now(timezone.utc)}, synchronize_session=False
+        )
+        db.session.commit()
+        if not alterados:
+            return jsonify({"error": "Não é possível cancelar um agendamento que não está 'confirmado'"}), 400
+        desindexar_confirmado(id)
+
+    with medir_etapa('auditoria'):
+        log_audit(
+            event_type="AGENDAMENTO_CANCELADO", user_details=user_details,
+            details={
+                "agendamento_id": id,
+                "horario_inicio_utc": formatar_utc(horario_inicio_utc),
+                "status_anterior": "confirmado", "status_novo": "cancelado"
+            }
+        )
     
     response_body = {
-        "id": agendamento.id, "status": agendamento.status,
+        "id": id, "status": "cancelado",
         "_links": {
-            "self": {"href": f"/agendamentos/{agendamento.id}"},
-            "cientista": {"href": f"/cientistas/{agendamento.cientista_id}"},
+            "self": {"href": f"/agendamentos/{id}"},
+            "cientista": {"href": f"/cientistas/{cientista_id}"},
             "criar_novo": {"href": "/agendamentos", "method": "POST"}
         }
     }
     return jsonify(response_body), 200
 
+def _validar_intervalo(inicio, fim):
+    """
+    Retorna a mensagem de erro se o intervalo violar as regras de duração, ou None.
+    """
+    if _utc_naive(fim) <= _utc_naive(inicio):
+        return "horario_fim_utc deve ser posterior a horario_inicio_utc"
+    if _utc_naive(fim) - _utc_naive(inicio) > DURACAO_MAXIMA:
+        return "A duração máxima do agendamento é de 2 horas"
+    return None
+
+CAMPOS_CRIACAO = ('id', 'cientista_id', 'telescopio_id', 'horario_inicio_utc', 'horario_fim_utc', 'status')
+_serializar_criado = SERIALIZADOR_AGENDAMENTO.compilar(CAMPOS_CRIACAO)
+
 @app.route('/agendamentos', methods=['POST'])
+@idempotente
 def criar_agendamento():
     logging.info("Requisição recebida para POST /agendamentos")
     data = request.get_json()
@@ -179,145 +1206,1084 @@ def criar_agendamento():
         horario_fim_str = data['horario_fim_utc']
         horario_inicio_utc = datetime.fromisoformat(horario_inicio_str.replace('Z', '+00:00'))
         horario_fim_utc = datetime.fromisoformat(horario_fim_str.replace('Z', '+00:00'))
+        erro_intervalo = _validar_intervalo(horario_inicio_utc, horario_fim_utc)
+        if erro_intervalo:
+            return jsonify({"error": "Dados inválidos", "details": erro_intervalo}), 400
+        try:
+            telescopio_id = _ler_telescopio_id(data.get('telescopio_id'))
+        except ParametroInvalido as e:
+            return jsonify({"error": "Dados inválidos", "details": str(e)}), 400
+        telescopio = dados_telescopio(telescopio_id)
+        if not telescopio:
+            return jsonify({"error": "Telescópio não encontrado"}), 404
         
-        cientista = db.session.get(Cientista, cientista_id)
-        if not cientista:
-            logging.warning(f"Cientista ID {cientista_id} não encontrado")
+        # Do cache de cientistas: sem consulta ao banco na maioria das vezes
+        detalhes = detalhes_cientista(cientista_id)
+        if not detalhes:
+            logging.warning("Cientista ID %s não encontrado", cientista_id)
             return jsonify({"error": "Cientista não encontrado"}), 404
+        user_details = detalhes
         
-        user_details = {"cientista_id": cientista.id, "cientista_nome": cientista.nome, "cientista_email": cientista.email}
-        
-        resource_id = f"Hubble-Acad_{horario_inicio_str}"
-        lock_adquirido = False
+        # Um lock por fatia de tempo coberta pelo intervalo, adquiridos de uma
+        # vez; as chaves levam o código do telescópio
+        recursos = chaves_lock(horario_inicio_utc, horario_fim_utc, LOCK_GRANULARIDADE_MIN, telescopio["codigo"])
+        resource_id = ", ".join(recursos)
+        lock_token = None
         
         try:
-            logging.info(f"Tentando adquirir lock para o recurso {resource_id}")
+            logging.info("Tentando adquirir lock para o recurso %s", resource_id)
             try:
-                lock_response = requests.post(f"{URL_COORDENADOR}/lock", json={"resource_id": resource_id}, timeout=5)
-            except requests.exceptions.ConnectionError:
-                logging.error(f"Falha ao conectar no Serviço Coordenador em {URL_COORDENADOR}")
+                with medir_etapa('lock'):
+                    lock_token = lock_backend.adquirir(recursos)
+            except CoordenadorIndisponivel:
+                logging.error("Falha ao conectar no Serviço Coordenador em %s", URL_COORDENADOR)
                 return jsonify({"error": "Serviço de coordenação indisponível"}), 503
+            except ErroCoordenador as e:
+                logging.error("Erro inesperado do Serviço Coordenador: %s", e.status_code)
+                return jsonify({"error": "Erro interno no serviço de coordenação"}), 500
 
-            if lock_response.status_code == 200:
-                logging.info(f"Lock adquirido com sucesso para {resource_id}")
-                lock_adquirido = True
+            if lock_token:
+                logging.info("Lock adquirido com sucesso para %s", resource_id)
                 
-                logging.info(f"Iniciando verificação de conflito no BD para {horario_inicio_utc}")
-                conflito = Agendamento.query.filter(
-                    (Agendamento.horario_inicio_utc < horario_fim_utc) &
-                    (Agendamento.horario_fim_utc > horario_inicio_utc) &
-                    (Agendamento.status == 'confirmado')
-                ).first()
+                logging.info("Iniciando verificação de conflito no BD para %s", horario_inicio_utc)
+                with medir_etapa('conflito'):
+                    garantir_indice_conflitos()
+                    # Antes da fronteira os agendamentos podem estar no arquivo,
+                    # fora do índice: não dá para garantir que não há conflito
+                    if _periodo_arquivado(horario_inicio_utc):
+                        return jsonify({"error": "Dados inválidos", "details": "Este período já foi arquivado"}), 400
+                    conflito = indice_do_telescopio(telescopio_id).primeiro_conflito(
+                        _utc_naive(horario_inicio_utc), _utc_naive(horario_fim_utc)
+                    )
+                    conflito_serie = None if conflito else conflito_com_series(
+                        telescopio_id, _utc_naive(horario_inicio_utc), _utc_naive(horario_fim_utc)
+                    )
 
                 if conflito:
-                    logging.warning(f"Conflito detectado no BD: Agendamento {conflito.id}")
+                    logging.warning("Conflito detectado no BD: Agendamento %s", conflito[2])
+                    conflitos_total.incrementar('/agendamentos', 'banco')
+                    return jsonify({"error": "Horário não disponível"}), 409
+                if conflito_serie:
+                    logging.warning("Conflito detectado com a série %s (ocorrência de %s)", conflito_serie[2], conflito_serie[0])
+                    conflitos_total.incrementar('/agendamentos', 'serie')
                     return jsonify({"error": "Horário não disponível"}), 409
 
                 logging.info("Salvando novo agendamento no BD")
-                novo_agendamento = Agendamento(
-                    cientista_id=cientista_id, horario_inicio_utc=horario_inicio_utc, horario_fim_utc=horario_fim_utc,
-                    objeto_observacao=data.get('objeto_observacao'), descricao=data.get('descricao'), status='confirmado'
-                )
-                db.session.add(novo_agendamento)
-                db.session.commit() 
+                with medir_etapa('commit'):
+                    # Gravado em UTC sem tzinfo: o SQLite guardaria a hora local do offset
+                    novo_agendamento = Agendamento(
+                        cientista_id=cientista_id, telescopio_id=telescopio_id,
+                        horario_inicio_utc=_utc_naive(horario_inicio_utc), horario_fim_utc=_utc_naive(horario_fim_utc),
+                        objeto_observacao=data.get('objeto_observacao'), descricao=data.get('descricao'), status='confirmado'
+                    )
+                    db.session.add(novo_agendamento)
+                    db.session.flush()
+                    # Serializado antes do commit, que expiraria o objeto (e
+                    # o releria do banco)
+                    novo_id = novo_agendamento.id
+                    response_body = _serializar_criado(novo_agendamento)
+                    db.session.commit()
+                    indexar_confirmado(
+                        _utc_naive(horario_inicio_utc), _utc_naive(horario_fim_utc), novo_id, telescopio_id
+                    )
 
-                log_audit(
-                    event_type="AGENDAMENTO_CRIADO", user_details=user_details,
-                    details={"agendamento_id": novo_agendamento.id, "horario_inicio_utc": horario_inicio_str, "horario_fim_utc": horario_fim_str, "status": novo_agendamento.status}
-                )
+                with medir_etapa('auditoria'):
+                    log_audit(
+                        event_type="AGENDAMENTO_CRIADO", user_details=user_details,
+                        details={"agendamento_id": novo_id, "telescopio_id": telescopio_id, "horario_inicio_utc": horario_inicio_str, "horario_fim_utc": horario_fim_str, "status": "confirmado"}
+                    )
                 
-                logging.info(f"Agendamento {novo_agendamento.id} criado com sucesso")
-
-                response_body = {
-                    "id": novo_agendamento.id, "cientista_id": novo_agendamento.cientista_id,
-                    "horario_inicio_utc": novo_agendamento.horario_inicio_utc.isoformat().replace('+00:00', 'Z'),
-                    "horario_fim_utc": novo_agendamento.horario_fim_utc.isoformat().replace('+00:00', 'Z'),
-                    "status": novo_agendamento.status,
-                    "_links": {
-                        "self": {"href": f"/agendamentos/{novo_agendamento.id}"},
-                        "cientista": {"href": f"/cientistas/{novo_agendamento.cientista_id}"},
-                        "cancelar": {"href": f"/agendamentos/{novo_agendamento.id}/cancelar", "method": "POST"},
-                    }
-                }
+                logging.info("Agendamento %s criado com sucesso", novo_id)
                 return jsonify(response_body), 201
             
-            elif lock_response.status_code == 409:
-                logging.warning(f"Falha ao adquirir lock para {resource_id}, recurso ocupado")
+            else:
+                logging.warning("Falha ao adquirir lock para %s, recurso ocupado", resource_id)
+                conflitos_total.incrementar('/agendamentos', 'lock')
                 log_audit(
                     event_type="AGENDAMENTO_TENTATIVA_FALHA", user_details=user_details,
                     details={"horario_inicio_utc": horario_inicio_str, "horario_fim_utc": horario_fim_str, "motivo_falha": "Recurso em uso - lock não adquirido"}
                 )
                 return jsonify({"error": "Recurso em uso"}), 409
-            else:
-                logging.error(f"Erro inesperado do Serviço Coordenador: {lock_response.status_code}")
-                return jsonify({"error": "Erro interno no serviço de coordenação"}), 500
         finally:
-            if lock_adquirido:
-                logging.info(f"Liberando lock para o recurso {resource_id}")
+            if lock_token:
+                logging.info("Liberando lock para o recurso %s", resource_id)
                 try:
-                    requests.post(f"{URL_COORDENADOR}/unlock", json={"resource_id": resource_id}, timeout=2)
+                    with medir_etapa('unlock'):
+                        liberado = lock_backend.liberar(recursos, lock_token)
+                    if not liberado:
+                        logging.warning("Lock para %s já tinha expirado antes da liberação", resource_id)
                 except Exception as e:
-                    logging.error(f"Falha CRÍTICA ao liberar o lock para {resource_id}: {e}")
+                    logging.error("Falha CRÍTICA ao liberar o lock para %s: %s", resource_id, e)
                     
     except Exception as e:
-        logging.error(f"Erro inesperado em POST /agendamentos: {e}")
+        logging.error("Erro inesperado em POST /agendamentos: %s", e)
+        db.session.rollback()
+        return jsonify({"error": "Erro interno do servidor"}), 500
+
+# --- 4.1 CRIAÇÃO EM LOTE ---
+TAMANHO_MAXIMO_LOTE = int(os.environ.get('TAMANHO_MAXIMO_LOTE', 5000))
+MODOS_LOTE = ('tudo_ou_nada', 'parcial')
+
+def _validar_item_lote(indice, item):
+    """
+    Valida um item do lote. Retorna o item normalizado ou levanta ParametroInvalido.
+    """
+    if not isinstance(item, dict):
+        raise ParametroInvalido("Cada agendamento deve ser um objeto JSON")
+    for campo in ('cientista_id', 'horario_inicio_utc', 'horario_fim_utc'):
+        if item.get(campo) is None:
+            raise ParametroInvalido(f"O campo '{campo}' é obrigatório")
+    if not isinstance(item['cientista_id'], int):
+        raise ParametroInvalido("O campo 'cientista_id' deve ser um inteiro")
+    telescopio_id = _ler_telescopio_id(item.get('telescopio_id'))
+    inicio = _parse_horario(item['horario_inicio_utc'], 'horario_inicio_utc')
+    fim = _parse_horario(item['horario_fim_utc'], 'horario_fim_utc')
+    erro_intervalo = _validar_intervalo(inicio, fim)
+    if erro_intervalo:
+        raise ParametroInvalido(erro_intervalo)
+    return {
+        "indice": indice,
+        "cientista_id": item['cientista_id'],
+        "telescopio_id": telescopio_id,
+        "inicio": _utc_naive(inicio),
+        "fim": _utc_naive(fim),
+        "horario_inicio_str": item['horario_inicio_utc'],
+        "horario_fim_str": item['horario_fim_utc'],
+        "objeto_observacao": item.get('objeto_observacao'),
+        "descricao": item.get('descricao'),
+    }
+
+@app.route('/agendamentos/lote', methods=['POST'])
+def criar_agendamentos_lote():
+    """
+    Cria vários agendamentos numa única requisição: valida tudo, verifica
+    conflitos com o banco e dentro do próprio lote, adquire todos os locks de
+    uma vez e insere com um único commit.
+    """
+    logging.info("Requisição recebida para POST /agendamentos/lote")
+    data = request.get_json(silent=True) or {}
+    itens = data.get('agendamentos')
+    modo = data.get('modo', 'tudo_ou_nada')
+    if not isinstance(itens, list) or not itens:
+        return jsonify({"error": "Dados inválidos", "details": "O campo 'agendamentos' deve ser uma lista não vazia"}), 400
+    if len(itens) > TAMANHO_MAXIMO_LOTE:
+        return jsonify({"error": "Dados inválidos", "details": f"O lote aceita no máximo {TAMANHO_MAXIMO_LOTE} agendamentos"}), 400
+    if modo not in MODOS_LOTE:
+        return jsonify({"error": "Dados inválidos", "details": f"O campo 'modo' deve ser um de {', '.join(MODOS_LOTE)}"}), 400
+
+    resultados = [None] * len(itens)
+    candidatos = []
+    for indice, item in enumerate(itens):
+        try:
+            candidatos.append(_validar_item_lote(indice, item))
+        except ParametroInvalido as e:
+            resultados[indice] = {"indice": indice, "status": "invalido", "error": str(e)}
+
+    # Todos os cientistas do lote numa única consulta IN
+    ids_cientistas = {c["cientista_id"] for c in candidatos}
+    cientistas = {
+        c.id: c for c in Cientista.query.filter(Cientista.id.in_(ids_cientistas)).all()
+    } if ids_cientistas else {}
+    telescopios = {}
+    for telescopio_id in {c["telescopio_id"] for c in candidatos}:
+        dados = dados_telescopio(telescopio_id)
+        if dados:
+            telescopios[telescopio_id] = dados
+    validos = []
+    for candidato in candidatos:
+        if candidato["cientista_id"] not in cientistas:
+            resultados[candidato["indice"]] = {"indice": candidato["indice"], "status": "invalido", "error": "Cientista não encontrado"}
+        elif candidato["telescopio_id"] not in telescopios:
+            resultados[candidato["indice"]] = {"indice": candidato["indice"], "status": "invalido", "error": "Telescópio não encontrado"}
+        else:
+            validos.append(candidato)
+
+    def _user_details(cientista_id):
+        c = cientistas.get(cientista_id)
+        if not c:
+            return {"cientista_id": cientista_id}
+        return {"cientista_id": c.id, "cientista_nome": c.nome, "cientista_email": c.email}
+
+    def _responder():
+        criados = sum(1 for r in resultados if r["status"] == "criado")
+        falhas = []
+        for r in resultados:
+            if r["status"] == "criado":
+                continue
+            item = itens[r["indice"]] if isinstance(itens[r["indice"]], dict) else {}
+            falhas.append(("AGENDAMENTO_TENTATIVA_FALHA", _user_details(item.get('cientista_id')), {
+                "horario_inicio_utc": item.get('horario_inicio_utc'), "horario_fim_utc": item.get('horario_fim_utc'),
+                "motivo_falha": r["error"], "indice_lote": r["indice"]
+            }))
+        if falhas:
+            log_audit_lote(falhas)
+        if criados == len(resultados):
+            status_http = 201
+        elif criados:
+            status_http = 207
+        elif any(r["status"] in ("conflito", "recurso_em_uso") for r in resultados):
+            status_http = 409
+        else:
+            status_http = 400
+        return jsonify({
+            "modo": modo,
+            "total": len(resultados),
+            "criados": criados,
+            "rejeitados": len(resultados) - criados,
+            "resultados": resultados,
+            "_links": {
+                "self": {"href": "/agendamentos/lote"},
+                "agendamentos": {"href": "/agendamentos", "method": "GET"}
+            }
+        }), status_http
+
+    def _descartar_validos(status, error):
+        for c in validos:
+            if resultados[c["indice"]] is None:
+                resultados[c["indice"]] = {"indice": c["indice"], "status": status, "error": error}
+
+    if modo == 'tudo_ou_nada' and len(validos) < len(itens):
+        _descartar_validos("nao_processado", "Lote rejeitado: há itens inválidos")
+        return _responder()
+    if not validos:
+        return _responder()
+
+    # Locks de todas as fatias cobertas pelo lote, numa única aquisição
+    recursos = sorted({
+        chave for c in validos
+        for chave in chaves_lock(c["inicio"], c["fim"], LOCK_GRANULARIDADE_MIN, telescopios[c["telescopio_id"]]["codigo"])
+    })
+    logging.info("Tentando adquirir %s locks para o lote de %s agendamentos", len(recursos), len(validos))
+    try:
+        with medir_etapa('lock'):
+            lock_token = lock_backend.adquirir(recursos)
+    except CoordenadorIndisponivel:
+        logging.error("Falha ao conectar no Serviço Coordenador em %s", URL_COORDENADOR)
+        return jsonify({"error": "Serviço de coordenação indisponível"}), 503
+    except ErroCoordenador as e:
+        logging.error("Erro inesperado do Serviço Coordenador: %s", e.status_code)
+        return jsonify({"error": "Erro interno no serviço de coordenação"}), 500
+    if not lock_token:
+        logging.warning("Falha ao adquirir locks para o lote, recurso ocupado")
+        conflitos_total.incrementar('/agendamentos/lote', 'lock', valor=len(validos))
+        _descartar_validos("recurso_em_uso", "Recurso em uso - lock não adquirido")
+        return _responder()
+
+    try:
+        # Varredura por telescópio em ordem de início: primeiro o banco (árvore
+        # de intervalos), depois os conflitos dentro do próprio lote (o item
+        # que começa antes vence)
+        aceitos = []
+        conflitos_banco = conflitos_serie = conflitos_lote = 0
+        telescopio_atual, fim_maximo, dono_fim_maximo = None, None, None
+        with medir_etapa('conflito'):
+            garantir_indice_conflitos()
+            for c in sorted(validos, key=lambda c: (c["telescopio_id"], c["inicio"], c["indice"])):
+                if c["telescopio_id"] != telescopio_atual:
+                    telescopio_atual, fim_maximo, dono_fim_maximo = c["telescopio_id"], None, None
+                    arvore = indice_do_telescopio(telescopio_atual)
+                conflito = arvore.primeiro_conflito(c["inicio"], c["fim"])
+                conflito_serie = None if conflito else conflito_com_series(telescopio_atual, c["inicio"], c["fim"])
+                if _periodo_arquivado(c["inicio"]):
+                    resultados[c["indice"]] = {"indice": c["indice"], "status": "conflito", "error": "Este período já foi arquivado"}
+                    conflitos_banco += 1
+                elif conflito:
+                    resultados[c["indice"]] = {"indice": c["indice"], "status": "conflito", "error": "Horário não disponível",
+                                               "agendamento_conflitante_id": conflito[2]}
+                    conflitos_banco += 1
+                elif conflito_serie:
+                    resultados[c["indice"]] = {"indice": c["indice"], "status": "conflito", "error": "Horário não disponível",
+                                               "serie_conflitante_id": conflito_serie[2]}
+                    conflitos_serie += 1
+                elif fim_maximo is not None and c["inicio"] < fim_maximo:
+                    resultados[c["indice"]] = {"indice": c["indice"], "status": "conflito", "error": "Conflito com outro item do lote",
+                                               "indice_conflitante": dono_fim_maximo}
+                    conflitos_lote += 1
+                else:
+                    aceitos.append(c)
+                    if fim_maximo is None or c["fim"] > fim_maximo:
+                        fim_maximo, dono_fim_maximo = c["fim"], c["indice"]
+        if conflitos_banco:
+            conflitos_total.incrementar('/agendamentos/lote', 'banco', valor=conflitos_banco)
+        if conflitos_serie:
+            conflitos_total.incrementar('/agendamentos/lote', 'serie', valor=conflitos_serie)
+        if conflitos_lote:
+            conflitos_total.incrementar('/agendamentos/lote', 'lote', valor=conflitos_lote)
+
+        if modo == 'tudo_ou_nada' and len(aceitos) < len(validos):
+            aceitos = []
+            _descartar_validos("nao_processado", "Lote rejeitado: há itens em conflito")
+            return _responder()
+
+        logging.info("Salvando %s agendamentos do lote no BD", len(aceitos))
+        novos = [
+            Agendamento(
+                cientista_id=c["cientista_id"], telescopio_id=c["telescopio_id"],
+                horario_inicio_utc=c["inicio"], horario_fim_utc=c["fim"],
+                objeto_observacao=c["objeto_observacao"], descricao=c["descricao"], status='confirmado'
+            )
+            for c in aceitos
+        ]
+        with medir_etapa('commit'):
+            db.session.add_all(novos)
+            db.session.commit()
+
+        eventos = []
+        for c, novo in zip(aceitos, novos):
+            indexar_confirmado(c["inicio"], c["fim"], novo.id, c["telescopio_id"])
+            resultados[c["indice"]] = {
+                "indice": c["indice"], "status": "criado", "id": novo.id,
+                "_links": {"self": {"href": f"/agendamentos/{novo.id}"},
+                           "cancelar": {"href": f"/agendamentos/{novo.id}/cancelar", "method": "POST"}}
+            }
+            eventos.append((
+                "AGENDAMENTO_CRIADO", _user_details(c["cientista_id"]),
+                {"agendamento_id": novo.id, "telescopio_id": c["telescopio_id"], "horario_inicio_utc": c["horario_inicio_str"],
+                 "horario_fim_utc": c["horario_fim_str"], "status": "confirmado"}
+            ))
+        if eventos:
+            with medir_etapa('auditoria'):
+                log_audit_lote(eventos)
+        logging.info("Lote concluído: %s agendamentos criados", len(novos))
+        return _responder()
+    except Exception as e:
+        logging.error("Erro inesperado em POST /agendamentos/lote: %s", e)
+        db.session.rollback()
+        return jsonify({"error": "Erro interno do servidor"}), 500
+    finally:
+        logging.info("Liberando %s locks do lote", len(recursos))
+        try:
+            with medir_etapa('unlock'):
+                liberado = lock_backend.liberar(recursos, lock_token)
+            if not liberado:
+                logging.warning("Parte dos locks do lote já tinha expirado antes da liberação")
+        except Exception as e:
+            logging.error("Falha CRÍTICA ao liberar os locks do lote: %s", e)
+
+# --- 4.2 DISPONIBILIDADE ---
+# Janelas livres e mapa de ocupação calculados a partir do calendário em
+# memória, sem varrer a tabela de agendamentos.
+DURACAO_MINIMA_PADRAO_MIN = 5
+PERIODO_MAXIMO_DISPONIBILIDADE = timedelta(days=31)
+
+def _parse_mes(valor):
+    try:
+        ano, mes = (int(parte) for parte in valor.split('-'))
+        return datetime(ano, mes, 1)
+    except (AttributeError, ValueError):
+        raise ParametroInvalido("O campo 'mes' deve estar no formato YYYY-MM")
+
+@app.route('/disponibilidade', methods=['GET'])
+def get_disponibilidade():
+    """
+    Janelas livres em [inicio, fim) com pelo menos 'duracao' minutos, ou, com
+    modo=heatmap, os minutos ocupados por hora em cada dia de um mês.
+    """
+    logging.info("Requisição recebida para GET /disponibilidade")
+    try:
+        telescopio_id = _ler_telescopio_id(request.args.get('telescopio_id'))
+        if request.args.get('modo') == 'heatmap':
+            if not request.args.get('mes'):
+                raise ParametroInvalido("O campo 'mes' é obrigatório no modo heatmap")
+            inicio = _parse_mes(request.args['mes'])
+            fim = (inicio + timedelta(days=32)).replace(day=1)
+        else:
+            for campo in ('inicio', 'fim'):
+                if not request.args.get(campo):
+                    raise ParametroInvalido(f"O campo '{campo}' é obrigatório")
+            inicio = _utc_naive(_parse_horario(request.args['inicio'], 'inicio'))
+            fim = _utc_naive(_parse_horario(request.args['fim'], 'fim'))
+            duracao = request.args.get('duracao', DURACAO_MINIMA_PADRAO_MIN)
+            if not str(duracao).isdigit() or int(duracao) < 1:
+                raise ParametroInvalido("O campo 'duracao' deve ser um inteiro positivo (minutos)")
+            duracao = int(duracao)
+            if fim <= inicio:
+                raise ParametroInvalido("fim deve ser posterior a inicio")
+            if fim - inicio > PERIODO_MAXIMO_DISPONIBILIDADE:
+                raise ParametroInvalido("O período consultado é de no máximo 31 dias")
+    except ValueError as e:
+        return jsonify({"error": "Dados inválidos", "details": str(e)}), 400
+
+    if not dados_telescopio(telescopio_id):
+        return jsonify({"error": "Telescópio não encontrado"}), 404
+
+    garantir_indice_leitura()
+    calendario = calendario_do_telescopio(telescopio_id)
+    # Ocorrências de séries no período, calculadas só para esta janela
+    ocorrencias = list(ocorrencias_das_series(telescopio_id, inicio, fim))
+    links = {
+        "self": {"href": f"/disponibilidade?{urlencode(dict(request.args.items()))}"},
+        "criar_agendamento": {"href": "/agendamentos", "method": "POST"}
+    }
+
+    if request.args.get('modo') == 'heatmap':
+        ocupacao = calendario.ocupacao_por_hora(inicio, fim, ocorrencias)
+        return jsonify({
+            "telescopio_id": telescopio_id,
+            "mes": request.args['mes'],
+            "unidade": "minutos_ocupados_por_hora",
+            "dias": {data.isoformat(): horas for data, horas in ocupacao.items()},
+            "_links": links
+        })
+
+    janelas = calendario.janelas_livres(inicio, fim, timedelta(minutes=duracao), ocorrencias)
+    return jsonify({
+        "telescopio_id": telescopio_id,
+        "inicio": formatar_utc(inicio),
+        "fim": formatar_utc(fim),
+        "duracao_minima_minutos": duracao,
+        "total": len(janelas),
+        "janelas_livres": [
+            {
+                "inicio": formatar_utc(ini),
+                "fim": formatar_utc(fi),
+                "duracao_minutos": int((fi - ini).total_seconds() // 60)
+            }
+            for ini, fi in janelas
+        ],
+        "_links": links
+    })
+
+# --- 4.3 TELESCÓPIOS ---
+# Cada telescópio tem a sua agenda: conflitos, chaves de lock (prefixadas pelo
+# código) e disponibilidade são independentes entre instrumentos.
+CODIGO_TELESCOPIO_VALIDO = re.compile(r'^[A-Za-z0-9-]{1,50}$')
+
+@app.route('/telescopios', methods=['GET'])
+def listar_telescopios():
+    try:
+        serializar = _serializador_da_requisicao(SERIALIZADOR_TELESCOPIO)
+    except ValueError as e:
+        return jsonify({"error": "Dados inválidos", "details": str(e)}), 400
+    telescopios = Telescopio.query.order_by(Telescopio.id).all()
+    return jsonify({
+        "total": len(telescopios),
+        "telescopios": [serializar(t) for t in telescopios],
+        "_links": {"self": {"href": "/telescopios"}, "criar": {"href": "/telescopios", "method": "POST"}}
+    })
+
+@app.route('/telescopios/<int:id>', methods=['GET'])
+def get_telescopio(id):
+    try:
+        serializar = _serializador_da_requisicao(SERIALIZADOR_TELESCOPIO)
+    except ValueError as e:
+        return jsonify({"error": "Dados inválidos", "details": str(e)}), 400
+    telescopio = db.session.get(Telescopio, id)
+    if not telescopio:
+        return jsonify({"error": "Telescópio não encontrado"}), 404
+    return jsonify(serializar(telescopio))
+
+@app.route('/telescopios', methods=['POST'])
+def criar_telescopio():
+    logging.info("Requisição recebida para POST /telescopios")
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Dados inválidos", "details": "O corpo deve ser um objeto JSON"}), 400
+    nome = data.get('nome')
+    codigo = data.get('codigo')
+    if not isinstance(nome, str) or not nome.strip() or len(nome) > 100:
+        return jsonify({"error": "Dados inválidos", "details": "O campo 'nome' é obrigatório (até 100 caracteres)"}), 400
+    if not isinstance(codigo, str) or not CODIGO_TELESCOPIO_VALIDO.match(codigo):
+        return jsonify({
+            "error": "Dados inválidos",
+            "details": "O campo 'codigo' é obrigatório: letras, números e '-' (até 50 caracteres)"
+        }), 400
+    telescopio = Telescopio(nome=nome.strip(), codigo=codigo)
+    db.session.add(telescopio)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Já existe um telescópio com este nome ou código"}), 409
+    logging.info("Telescópio %s (%s) cadastrado com ID %s", telescopio.nome, telescopio.codigo, telescopio.id)
+    return jsonify(SERIALIZADOR_TELESCOPIO.compilar()(telescopio)), 201
+
+# --- 4.4 AUDITORIA ---
+# Consulta ao audit.log (e rotacionados) pelo índice de posições em
+# <LOG_ARQUIVO_AUDITORIA>.indice, atualizado a cada consulta só com o que foi
+# escrito desde a anterior.
+indice_auditoria = IndiceAuditoria(ARQUIVO_AUDITORIA)
+FILTROS_INTEIROS_AUDITORIA = ('cientista_id', 'agendamento_id', 'telescopio_id')
+
+@app.route('/auditoria', methods=['GET'])
+def get_auditoria():
+    """
+    Eventos de auditoria filtrados por event_type, cientista_id,
+    agendamento_id, telescopio_id, horario_inicio_utc (slot) e pelo
+    intervalo desde <= timestamp_utc < ate, em ordem de gravação.
+    """
+    logging.info("Requisição recebida para GET /auditoria")
+    try:
+        filtros = {}
+        for campo in FILTROS_AUDITORIA:
+            valor = request.args.get(campo)
+            if not valor:
+                continue
+            if campo in FILTROS_INTEIROS_AUDITORIA:
+                if not valor.isdigit():
+                    raise ParametroInvalido(f"O campo '{campo}' deve ser um inteiro")
+                valor = int(valor)
+            elif campo == 'horario_inicio_utc':
+                _parse_horario(valor, campo)
+            filtros[campo] = valor
+        for campo in ('desde', 'ate'):
+            if request.args.get(campo):
+                _parse_horario(request.args[campo], campo)
+        cursor = request.args.get('cursor')
+        if cursor is not None and not cursor.isdigit():
+            raise ParametroInvalido("Cursor de paginação inválido")
+        limite = request.args.get('limite', LIMITE_PADRAO_PAGINA)
+        if not str(limite).isdigit() or int(limite) < 1:
+            raise ParametroInvalido("O campo 'limite' deve ser um inteiro positivo")
+        limite = min(int(limite), LIMITE_MAXIMO_PAGINA)
+    except ValueError as e:
+        return jsonify({"error": "Dados inválidos", "details": str(e)}), 400
+
+    with medir_etapa('indexacao'):
+        indice_auditoria.atualizar()
+    # Um item a mais para saber se existe próxima página
+    with medir_etapa('consulta'):
+        encontrados = indice_auditoria.consultar(
+            filtros, request.args.get('desde'), request.args.get('ate'),
+            depois_de=int(cursor) if cursor else None, limite=limite + 1
+        )
+    tem_proxima = len(encontrados) > limite
+    encontrados = encontrados[:limite]
+    links = {"self": {"href": _url_com_parametros(request.args, '/auditoria')}}
+    proximo_cursor = None
+    if tem_proxima:
+        proximo_cursor = str(encontrados[-1][0])
+        links["next"] = {"href": _url_com_parametros(request.args, '/auditoria', cursor=proximo_cursor), "method": "GET"}
+    return Response(serializar_json({
+        "total": len(encontrados),
+        "eventos": [evento for _, evento in encontrados],
+        "proximo_cursor": proximo_cursor,
+        "_links": links
+    }), mimetype='application/json')
+
+# --- 4.5 SÉRIES DE OBSERVAÇÃO ---
+# Uma reserva recorrente ("toda noite 03:00-03:30 UTC por 30 noites") é uma
+# linha em serie_observacao, não uma por noite. A criação trava as fatias de
+# todas as ocorrências numa única aquisição, verifica a série inteira numa
+# varredura ordenada contra os agendamentos e as outras séries do telescópio
+# e grava numa única transação: a série entra inteira ou é recusada.
+SERIE_MAXIMO_OCORRENCIAS = int(os.environ.get('SERIE_MAXIMO_OCORRENCIAS', 366))
+
+def _inteiro_positivo(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool) and valor >= 1
+
+def _validar_serie(data):
+    """
+    Valida o corpo de POST /series. Retorna os campos normalizados ou levanta ParametroInvalido.
+    """
+    if not isinstance(data, dict):
+        raise ParametroInvalido("O corpo deve ser um objeto JSON")
+    for campo in ('cientista_id', 'horario_inicio_utc', 'horario_fim_utc', 'frequencia', 'ocorrencias'):
+        if data.get(campo) is None:
+            raise ParametroInvalido(f"O campo '{campo}' é obrigatório")
+    if not isinstance(data['cientista_id'], int):
+        raise ParametroInvalido("O campo 'cientista_id' deve ser um inteiro")
+    telescopio_id = _ler_telescopio_id(data.get('telescopio_id'))
+    inicio = _parse_horario(data['horario_inicio_utc'], 'horario_inicio_utc')
+    fim = _parse_horario(data['horario_fim_utc'], 'horario_fim_utc')
+    erro_intervalo = _validar_intervalo(inicio, fim)
+    if erro_intervalo:
+        raise ParametroInvalido(erro_intervalo)
+    if data['frequencia'] not in FREQUENCIAS:
+        raise ParametroInvalido(f"O campo 'frequencia' deve ser um de {', '.join(FREQUENCIAS)}")
+    intervalo = data.get('intervalo', 1)
+    if not _inteiro_positivo(intervalo):
+        raise ParametroInvalido("O campo 'intervalo' deve ser um inteiro positivo")
+    if not _inteiro_positivo(data['ocorrencias']) or data['ocorrencias'] > SERIE_MAXIMO_OCORRENCIAS:
+        raise ParametroInvalido(f"O campo 'ocorrencias' deve ser um inteiro de 1 a {SERIE_MAXIMO_OCORRENCIAS}")
+    return {
+        "cientista_id": data['cientista_id'],
+        "telescopio_id": telescopio_id,
+        # A duração máxima (2 h) é menor que o menor período (1 dia): as
+        # ocorrências de uma série nunca se sobrepõem
+        "recorrencia": Recorrencia.por_regra(
+            _utc_naive(inicio), _utc_naive(fim), data['frequencia'], intervalo, data['ocorrencias']
+        ),
+        "frequencia": data['frequencia'],
+        "intervalo": intervalo,
+        "horario_inicio_str": data['horario_inicio_utc'],
+        "horario_fim_str": data['horario_fim_utc'],
+        "objeto_observacao": data.get('objeto_observacao'),
+        "descricao": data.get('descricao'),
+    }
+
+def _conflitos_da_serie(telescopio_id, recorrencia):
+    """
+    Ocorrências da série que se sobrepõem à agenda do telescópio. Uma só
+    varredura: as ocorrências (em ordem) contra a união ordenada dos
+    agendamentos e das ocorrências de outras séries no período da série.
+    """
+    ocupados = mesclar(
+        ((ini, fi, "agendamento_conflitante_id", ag_id)
+         for ini, fi, ag_id in indice_do_telescopio(telescopio_id).sobrepostos(recorrencia.inicio, recorrencia.fim_total)),
+        ((ini, fi, "serie_conflitante_id", serie_id)
+         for ini, fi, serie_id in ocorrencias_das_series(telescopio_id, recorrencia.inicio, recorrencia.fim_total)),
+    )
+    novas = ((ini, fi, k) for k, ini, fi in recorrencia.na_janela())
+    return [
+        {"indice": k, "horario_inicio_utc": formatar_utc(ini), "horario_fim_utc": formatar_utc(fi), campo: conflitante_id}
+        for (ini, fi, k), (_, _, campo, conflitante_id) in varrer_conflitos(novas, ocupados)
+    ]
+
+@app.route('/series', methods=['POST'])
+@idempotente
+def criar_serie():
+    """
+    Cria uma série recorrente: todas as ocorrências ou nenhuma.
+    """
+    logging.info("Requisição recebida para POST /series")
+    try:
+        serie = _validar_serie(request.get_json(silent=True))
+    except ParametroInvalido as e:
+        return jsonify({"error": "Dados inválidos", "details": str(e)}), 400
+    telescopio_id = serie["telescopio_id"]
+    recorrencia = serie["recorrencia"]
+    telescopio = dados_telescopio(telescopio_id)
+    if not telescopio:
+        return jsonify({"error": "Telescópio não encontrado"}), 404
+    user_details = detalhes_cientista(serie["cientista_id"])
+    if not user_details:
+        logging.warning("Cientista ID %s não encontrado", serie["cientista_id"])
+        return jsonify({"error": "Cientista não encontrado"}), 404
+
+    # Locks das fatias de todas as ocorrências, numa única aquisição
+    recursos = sorted({
+        chave for _, ini, fi in recorrencia.na_janela()
+        for chave in chaves_lock(ini, fi, LOCK_GRANULARIDADE_MIN, telescopio["codigo"])
+    })
+    logging.info("Tentando adquirir %s locks para a série de %s ocorrências", len(recursos), recorrencia.ocorrencias)
+    try:
+        with medir_etapa('lock'):
+            lock_token = lock_backend.adquirir(recursos)
+    except CoordenadorIndisponivel:
+        logging.error("Falha ao conectar no Serviço Coordenador em %s", URL_COORDENADOR)
+        return jsonify({"error": "Serviço de coordenação indisponível"}), 503
+    except ErroCoordenador as e:
+        logging.error("Erro inesperado do Serviço Coordenador: %s", e.status_code)
+        return jsonify({"error": "Erro interno no serviço de coordenação"}), 500
+    if not lock_token:
+        logging.warning("Falha ao adquirir locks para a série, recurso ocupado")
+        conflitos_total.incrementar('/series', 'lock')
+        log_audit(
+            event_type="AGENDAMENTO_TENTATIVA_FALHA", user_details=user_details,
+            details={"horario_inicio_utc": serie["horario_inicio_str"], "horario_fim_utc": serie["horario_fim_str"],
+                     "ocorrencias": recorrencia.ocorrencias, "motivo_falha": "Recurso em uso - lock não adquirido"}
+        )
+        return jsonify({"error": "Recurso em uso"}), 409
+
+    try:
+        with medir_etapa('conflito'):
+            garantir_indice_conflitos()
+            if _periodo_arquivado(recorrencia.inicio):
+                return jsonify({"error": "Dados inválidos", "details": "Este período já foi arquivado"}), 400
+            conflitos = _conflitos_da_serie(telescopio_id, recorrencia)
+        if conflitos:
+            logging.warning("Série recusada: %s de %s ocorrências em conflito", len(conflitos), recorrencia.ocorrencias)
+            conflitos_total.incrementar('/series', 'banco')
+            return jsonify({"error": "Horário não disponível", "conflitos": conflitos}), 409
+
+        with medir_etapa('commit'):
+            nova = SerieObservacao(
+                cientista_id=serie["cientista_id"], telescopio_id=telescopio_id,
+                horario_inicio_utc=recorrencia.inicio, horario_fim_utc=recorrencia.inicio + recorrencia.duracao,
+                frequencia=serie["frequencia"], intervalo=serie["intervalo"], ocorrencias=recorrencia.ocorrencias,
+                horario_fim_serie_utc=recorrencia.fim_total, objeto_observacao=serie["objeto_observacao"],
+                descricao=serie["descricao"], status='confirmado'
+            )
+            db.session.add(nova)
+            db.session.flush()
+            # Serializada antes do commit, que expiraria o objeto
+            serie_id = nova.id
+            response_body = SERIALIZADOR_SERIE.compilar()(nova)
+            db.session.commit()
+            indexar_serie(serie_id, telescopio_id, recorrencia)
+
+        with medir_etapa('auditoria'):
+            log_audit(
+                event_type="SERIE_CRIADA", user_details=user_details,
+                details={"serie_id": serie_id, "telescopio_id": telescopio_id,
+                         "horario_inicio_utc": serie["horario_inicio_str"], "horario_fim_utc": serie["horario_fim_str"],
+                         "frequencia": serie["frequencia"], "intervalo": serie["intervalo"],
+                         "ocorrencias": recorrencia.ocorrencias, "status": "confirmado"}
+            )
+        logging.info("Série %s criada com %s ocorrências", serie_id, recorrencia.ocorrencias)
+        return jsonify(response_body), 201
+    except Exception as e:
+        logging.error("Erro inesperado em POST /series: %s", e)
         db.session.rollback()
         return jsonify({"error": "Erro interno do servidor"}), 500
+    finally:
+        try:
+            with medir_etapa('unlock'):
+                liberado = lock_backend.liberar(recursos, lock_token)
+            if not liberado:
+                logging.warning("Parte dos locks da série já tinha expirado antes da liberação")
+        except Exception as e:
+            logging.error("Falha CRÍTICA ao liberar os locks da série: %s", e)
+
+@app.route('/series', methods=['GET'])
+def listar_series():
+    """
+    Séries filtradas por cientista_id, telescopio_id, status (padrão:
+    confirmado) e pelo período [inicio, fim) em que têm ocorrências, em
+    ordem de id.
+    """
+    try:
+        serializar = _serializador_da_requisicao(SERIALIZADOR_SERIE)
+        consulta = SerieObservacao.query.filter(SerieObservacao.status == request.args.get('status', 'confirmado'))
+        for campo in ('cientista_id', 'telescopio_id'):
+            if request.args.get(campo):
+                if not request.args[campo].isdigit():
+                    raise ParametroInvalido(f"O campo '{campo}' deve ser um inteiro")
+                consulta = consulta.filter(getattr(SerieObservacao, campo) == int(request.args[campo]))
+        if request.args.get('inicio'):
+            inicio = _utc_naive(_parse_horario(request.args['inicio'], 'inicio'))
+            consulta = consulta.filter(SerieObservacao.horario_fim_serie_utc > inicio)
+        if request.args.get('fim'):
+            fim = _utc_naive(_parse_horario(request.args['fim'], 'fim'))
+            consulta = consulta.filter(SerieObservacao.horario_inicio_utc < fim)
+        cursor = request.args.get('cursor')
+        if cursor is not None:
+            if not cursor.isdigit():
+                raise ParametroInvalido("Cursor de paginação inválido")
+            consulta = consulta.filter(SerieObservacao.id > int(cursor))
+        limite = request.args.get('limite', LIMITE_PADRAO_PAGINA)
+        if not str(limite).isdigit() or int(limite) < 1:
+            raise ParametroInvalido("O campo 'limite' deve ser um inteiro positivo")
+        limite = min(int(limite), LIMITE_MAXIMO_PAGINA)
+    except ValueError as e:
+        return jsonify({"error": "Dados inválidos", "details": str(e)}), 400
+
+    series = consulta.order_by(SerieObservacao.id).limit(limite + 1).all()
+    tem_proxima = len(series) > limite
+    series = series[:limite]
+    links = {
+        "self": {"href": _url_com_parametros(request.args, '/series')},
+        "criar": {"href": "/series", "method": "POST"}
+    }
+    proximo_cursor = None
+    if tem_proxima:
+        proximo_cursor = str(series[-1].id)
+        links["next"] = {"href": _url_com_parametros(request.args, '/series', cursor=proximo_cursor), "method": "GET"}
+    return jsonify({
+        "total": len(series),
+        "series": [serializar(serie) for serie in series],
+        "proximo_cursor": proximo_cursor,
+        "_links": links
+    })
+
+@app.route('/series/<int:id>', methods=['GET'])
+def get_serie(id):
+    try:
+        serializar = _serializador_da_requisicao(SERIALIZADOR_SERIE)
+    except ValueError as e:
+        return jsonify({"error": "Dados inválidos", "details": str(e)}), 400
+    serie = db.session.get(SerieObservacao, id)
+    if not serie:
+        return jsonify({"error": "Série não encontrada"}), 404
+    return jsonify(serializar(serie))
+
+@app.route('/series/<int:id>/ocorrencias', methods=['GET'])
+def get_ocorrencias_serie(id):
+    """
+    Ocorrências da série dentro de [inicio, fim) (sem janela, todas),
+    calculadas na hora a partir da regra.
+    """
+    try:
+        inicio = _utc_naive(_parse_horario(request.args['inicio'], 'inicio')) if request.args.get('inicio') else None
+        fim = _utc_naive(_parse_horario(request.args['fim'], 'fim')) if request.args.get('fim') else None
+    except ValueError as e:
+        return jsonify({"error": "Dados inválidos", "details": str(e)}), 400
+    serie = db.session.get(SerieObservacao, id)
+    if not serie:
+        return jsonify({"error": "Série não encontrada"}), 404
+    ocorrencias = [
+        {"indice": k, "horario_inicio_utc": formatar_utc(ini), "horario_fim_utc": formatar_utc(fi)}
+        for k, ini, fi in recorrencia_da_serie(serie).na_janela(inicio, fim)
+    ]
+    return jsonify({
+        "serie_id": id,
+        "status": serie.status,
+        "total": len(ocorrencias),
+        "ocorrencias": ocorrencias,
+        "_links": {
+            "self": {"href": _url_com_parametros(request.args, f'/series/{id}/ocorrencias')},
+            "serie": {"href": f"/series/{id}"}
+        }
+    })
+
+@app.route('/series/<int:id>/cancelar', methods=['POST'])
+@idempotente
+def cancelar_serie(id):
+    logging.info("Requisição recebida para POST /series/%s/cancelar", id)
+    serie = db.session.get(SerieObservacao, id)
+    if not serie:
+        return jsonify({"error": "Série não encontrada"}), 404
+    if serie.status != 'confirmado':
+        return jsonify({"error": "Não é possível cancelar uma série que não está com status 'confirmado'"}), 400
+    cientista_id = serie.cientista_id
+    horario_inicio_utc = serie.horario_inicio_utc
+    user_details = detalhes_cientista(cientista_id) or {"cientista_id": cientista_id}
+
+    garantir_indice_conflitos()
+    with medir_etapa('commit'):
+        # UPDATE condicional: de dois cancelamentos simultâneos só um muda a linha
+        alterados = SerieObservacao.query.filter_by(id=id, status='confirmado').update(
+            {"status": "cancelado", "data_atualizacao": datetime.now(timezone.utc)}, synchronize_session=False
+        )
+        db.session.commit()
+        if not alterados:
+            return jsonify({"error": "Não é possível cancelar uma série que não está com status 'confirmado'"}), 400
+        desindexar_serie(id)
+
+    with medir_etapa('auditoria'):
+        log_audit(
+            event_type="SERIE_CANCELADA", user_details=user_details,
+            details={
+                "serie_id": id,
+                "horario_inicio_utc": formatar_utc(horario_inicio_utc),
+                "status_anterior": "confirmado", "status_novo": "cancelado"
+            }
+        )
+    return jsonify({
+        "id": id, "status": "cancelado",
+        "_links": {
+            "self": {"href": f"/series/{id}"},
+            "cientista": {"href": f"/cientistas/{cientista_id}"},
+            "criar_nova": {"href": "/series", "method": "POST"}
+        }
+    }), 200
+
+@app.route('/metricas/locks', methods=['GET'])
+def get_metricas_locks():
+    """
+    Tempo de aquisição/liberação de locks e contadores de recurso ocupado.
+    """
+    return jsonify(lock_backend.metricas())
+
+@app.route('/metricas/cache', methods=['GET'])
+def get_metricas_cache():
+    """
+    Acertos, faltas e descartes do cache do GET /agendamentos (deste processo).
+    """
+    estado = cache_agendamentos.estatisticas()
+    estado["versao_agenda"] = versao_agenda()[0]
+    estado["cientistas"] = cache_cientistas.estatisticas()
+    estado["telescopios"] = cache_telescopios.estatisticas()
+    return jsonify(estado)
+
+def _coletar_estado():
+    """
+    Valores mantidos fora do registro de métricas (backend de lock, índice,
+    filas de log), lidos na hora da exportação.
+    """
+    estado = lock_backend.metricas()
+    rotulo_backend = {"backend": LOCK_BACKEND}
+    valores = [
+        ('agendamento_locks_em_posse', 'Locks adquiridos e ainda não liberados', 'gauge', rotulo_backend, estado["locks_em_posse"]),
+        ('agendamento_locks_negados_total', 'Aquisições de lock negadas', 'counter', rotulo_backend, estado["locks_negados"]),
+        ('agendamento_locks_expirados_total', 'Locks vencidos (TTL) encontrados pelo backend', 'counter', rotulo_backend, estado["locks_expirados"]),
+    ]
+    valores += [
+        ('agendamento_indice_confirmados', 'Agendamentos confirmados no índice de conflitos em memória', 'gauge', {"telescopio": str(tid)}, len(arvore))
+        for tid, arvore in sorted(indices_confirmados.items())
+    ]
+    valores += [
+        ('agendamento_series_confirmadas', 'Séries recorrentes confirmadas no índice em memória', 'gauge', {"telescopio": str(tid)}, len(arvore))
+        for tid, arvore in sorted(series_confirmadas.items())
+    ]
+    cache = cache_agendamentos.estatisticas()
+    valores += [
+        ('agendamento_cache_consultas_total', 'Consultas ao cache do GET /agendamentos', 'counter', {"resultado": "acerto"}, cache["acertos"]),
+        ('agendamento_cache_consultas_total', 'Consultas ao cache do GET /agendamentos', 'counter', {"resultado": "falta"}, cache["faltas"]),
+        ('agendamento_cache_descartes_total', 'Páginas descartadas do cache por falta de espaço', 'counter', {}, cache["descartes"]),
+        ('agendamento_cache_bytes', 'Bytes ocupados pelas páginas em cache', 'gauge', {}, cache["bytes"]),
+        ('agendamento_cache_entradas', 'Páginas em cache', 'gauge', {}, cache["entradas"]),
+    ]
+    cientistas = cache_cientistas.estatisticas()
+    valores += [
+        ('agendamento_cache_cientistas_consultas_total', 'Consultas ao cache de cientistas', 'counter', {"resultado": "acerto"}, cientistas["acertos"]),
+        ('agendamento_cache_cientistas_consultas_total', 'Consultas ao cache de cientistas', 'counter', {"resultado": "falta"}, cientistas["faltas"]),
+    ]
+    valores.append(('agendamento_idempotencia_chaves', 'Idempotency-Keys guardadas na memória do processo', 'gauge', {}, armazem_idempotencia.estatisticas()["chaves"]))
+    filas = estatisticas_logging()
+    for fila, info in filas.items():
+        valores.append(('agendamento_log_fila', 'Registros esperando gravação em disco', 'gauge', {"fila": fila}, info["fila"]))
+    for fila, info in filas.items():
+        valores.append(('agendamento_log_descartados_total', 'Registros de log descartados por fila cheia', 'counter', {"fila": fila}, info["descartados"]))
+    return valores
+
+metricas.adicionar_coletor(_coletar_estado)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Métricas deste processo no formato texto do Prometheus.
+    """
+    return Response(metricas.exportar_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 # --- 5. ROTA /setup (ATUALIZADA PARA 10 CIENTISTAS) ---
+# Lista de 10 nomes de cientistas
+NOMES_CIENTISTAS = [
+    "Joao Silva", "Paulo Santos", "Ana Oliveira", "Beatriz Costa", "Carlos Pereira",
+    "Daniela Ferreira", "Eduardo Almeida", "Fernanda Lima", "Gustavo Martins", "Helena Rocha"
+]
+QUANTIDADE_MAXIMA_SETUP = 100000
+# Valores por consulta IN (SQLites antigos aceitam no máximo 999 parâmetros)
+TAMANHO_CONSULTA_IN = 900
+
+def _cientistas_de_teste(quantidade):
+    """
+    Cientistas de teste: os 10 nomes fixos e, além deles, "Cientista N".
+    """
+    for numero in range(1, quantidade + 1):
+        if numero <= len(NOMES_CIENTISTAS):
+            nome_completo = NOMES_CIENTISTAS[numero - 1]
+            # Cria um email simples (ex: joao@email.com)
+            email = f"{nome_completo.split(' ')[0].lower()}@email.com"
+        else:
+            nome_completo = f"Cientista {numero}"
+            email = f"cientista{numero}@email.com"
+        yield {"nome": nome_completo, "email": email, "instituicao": "Instituto de Teste", "pais": "Brasil"}
+
 @app.route('/setup', methods=['POST'])
 def setup_database():
     """
     Cria 10 cientistas de teste (Joao, Paulo, etc.) se eles não existirem.
     IDs serão 1, 2, 3...
+    O corpo opcional {"quantidade": N} cria N cientistas (para testes de carga).
     """
-    
-    # Lista de 10 nomes de cientistas
-    NOMES_CIENTISTAS = [
-        "Joao Silva", "Paulo Santos", "Ana Oliveira", "Beatriz Costa", "Carlos Pereira",
-        "Daniela Ferreira", "Eduardo Almeida", "Fernanda Lima", "Gustavo Martins", "Helena Rocha"
-    ]
+    data = request.get_json(silent=True) or {}
+    quantidade = data.get('quantidade', len(NOMES_CIENTISTAS))
+    if not isinstance(quantidade, int) or isinstance(quantidade, bool) or not 1 <= quantidade <= QUANTIDADE_MAXIMA_SETUP:
+        return jsonify({"error": "Dados inválidos", "details": f"O campo 'quantidade' deve ser um inteiro entre 1 e {QUANTIDADE_MAXIMA_SETUP}"}), 400
     
     try:
-        # Garante que as tabelas estão criadas
-        db.create_all() 
+        # Garante que as tabelas e os índices estão criados
+        inicializar_schema()
         
-        cientistas_criados = []
-        for nome_completo in NOMES_CIENTISTAS:
-            # Cria um email simples (ex: joao@email.com)
-            email = f"{nome_completo.split(' ')[0].lower()}@email.com"
-            
-            # Verifica se o cientista já existe
-            cientista = Cientista.query.filter_by(email=email).first()
-            
-            if not cientista:
-                # Cria o novo cientista
-                novo_cientista = Cientista(
-                    nome=nome_completo,
-                    email=email,
-                    instituicao="Instituto de Teste",
-                    pais="Brasil"
-                )
-                db.session.add(novo_cientista)
-                cientistas_criados.append(nome_completo)
+        cientistas = list(_cientistas_de_teste(quantidade))
+        # Verifica quais cientistas já existem: uma consulta IN por bloco de emails
+        emails = [c["email"] for c in cientistas]
+        existentes = set()
+        for inicio in range(0, len(emails), TAMANHO_CONSULTA_IN):
+            bloco = emails[inicio:inicio + TAMANHO_CONSULTA_IN]
+            existentes.update(
+                email for (email,) in db.session.query(Cientista.email).filter(Cientista.email.in_(bloco))
+            )
+        novos = [c for c in cientistas if c["email"] not in existentes]
         
-        # Salva todos os novos cientistas no banco
-        if cientistas_criados:
+        # Salva todos os novos cientistas no banco com um único INSERT (executemany)
+        if novos:
+            db.session.execute(insert(Cientista), novos)
             db.session.commit()
-            logging.info(f"Setup: Criados {len(cientistas_criados)} novos cientistas.")
+            cache_cientistas.invalidar()
+            logging.info("Setup: Criados %s novos cientistas.", len(novos))
         
         # Mensagem de sucesso atualizada
         return jsonify({
-            "message": f"Banco de dados inicializado. {len(cientistas_criados)} novos cientistas criados.",
-            "cientistas_na_base": len(NOMES_CIENTISTAS)
+            "message": f"Banco de dados inicializado. {len(novos)} novos cientistas criados.",
+            "cientistas_na_base": quantidade
         }), 200
         
     except Exception as e:
         db.session.rollback()
-        logging.error(f"Falha no setup: {e}")
+        logging.error("Falha no setup: %s", e)
         return jsonify({"error": f"Falha no setup: {e}"}), 500
 
+# --- 5.1 ARQUIVAMENTO ---
+# Move para agendamento_arquivado os agendamentos terminados antes do
+# horizonte, em lotes curtos (ver arquivamento.py). Rodar por cron com
+# "python arquivamento.py" ou POST /arquivamento.
+ARQUIVAMENTO_HORIZONTE_DIAS = int(os.environ.get('ARQUIVAMENTO_HORIZONTE_DIAS', 90))
+ARQUIVAMENTO_TAMANHO_LOTE = int(os.environ.get('ARQUIVAMENTO_TAMANHO_LOTE', 500))
+ARQUIVAMENTO_PAUSA_MS = float(os.environ.get('ARQUIVAMENTO_PAUSA_MS', 50))
+# Um arquivamento por vez neste processo
+_arquivamento_lock = threading.Lock()
+
+def executar_arquivamento(horizonte_dias=None, tamanho_lote=None, pausa_ms=None):
+    """
+    Arquiva os agendamentos terminados há mais de 'horizonte_dias' dias.
+    Retorna {"arquivados", "lotes", "segundos", "limite"}; levanta
+    RuntimeError se outro arquivamento deste processo estiver rodando.
+    """
+    horizonte_dias = ARQUIVAMENTO_HORIZONTE_DIAS if horizonte_dias is None else horizonte_dias
+    limite = limite_arquivamento(horizonte_dias)
+    if not _arquivamento_lock.acquire(blocking=False):
+        raise RuntimeError("Já existe um arquivamento em andamento")
+    try:
+        garantir_indice_conflitos()
+
+        def ao_mover(movidos):
+            _registrar_arquivamento((ag_id for ag_id, _ in movidos), max(fim for _, fim in movidos))
+            arquivados_total.incrementar(valor=len(movidos))
+
+        resultado = arquivar(
+            db.engine, Agendamento.__table__, AgendamentoArquivado.__table__, limite,
+            tamanho_lote=tamanho_lote or ARQUIVAMENTO_TAMANHO_LOTE,
+            pausa=(ARQUIVAMENTO_PAUSA_MS if pausa_ms is None else pausa_ms) / 1000,
+            ao_mover=ao_mover
+        )
+    finally:
+        _arquivamento_lock.release()
+    resultado["limite"] = formatar_utc(limite)
+    logging.info(
+        "Arquivamento: %s agendamentos terminados antes de %s, em %s lotes (%s s)",
+        resultado["arquivados"], resultado["limite"], resultado["lotes"], resultado["segundos"]
+    )
+    return resultado
+
+@app.route('/arquivamento', methods=['POST'])
+def post_arquivamento():
+    """
+    Roda o arquivamento agora. Corpo opcional: {"horizonte_dias": N}.
+    """
+    data = request.get_json(silent=True) or {}
+    horizonte_dias = data.get('horizonte_dias', ARQUIVAMENTO_HORIZONTE_DIAS)
+    if not isinstance(horizonte_dias, int) or isinstance(horizonte_dias, bool) or horizonte_dias < 0:
+        return jsonify({"error": "Dados inválidos", "details": "O campo 'horizonte_dias' deve ser um inteiro não negativo"}), 400
+    try:
+        resultado = executar_arquivamento(horizonte_dias)
+    except RuntimeError as e:
+        return jsonify({"error": "Recurso em uso", "details": str(e)}), 409
+    return jsonify(resultado), 200
+
+# --- 6. DESLIGAMENTO ---
+_encerrado = False
+
+def encerrar_servico():
+    """
+    Desligamento do processo (fim do worker do gunicorn ou atexit): libera os
+    locks que ainda estiverem em posse, fecha o pool de conexões com o
+    coordenador e o banco e grava os logs pendentes. Pode ser chamada mais de
+    uma vez.
+    """
+    global _encerrado
+    if _encerrado:
+        return
+    _encerrado = True
+    pendentes = lock_backend.liberar_todos()
+    if pendentes:
+        logging.warning("Desligamento: %s locks ainda em posse foram liberados", pendentes)
+    coordenador.fechar()
+    with app.app_context():
+        db.engine.dispose()
+    encerrar_logging()
+
+atexit.register(encerrar_servico)
+
 if __name__ == '__main__':
+    # Servidor de desenvolvimento. Em produção use o gunicorn (gunicorn.conf.py).
     with app.app_context():
-        db.create_all() 
-    app.run(debug=True, port=5000)
\ No newline at end of file
+        inicializar_schema()
+    app.run(
+        debug=os.environ.get('FLASK_DEBUG') == '1',
+        host=os.environ.get('FLASK_HOST', '127.0.0.1'),
+        port=int(os.environ.get('PORT', 5000)),
+        threaded=True
+    )
\ No newline at end of file
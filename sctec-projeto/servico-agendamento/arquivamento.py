@@ -0,0 +1,93 @@
+# Arquivamento de agendamentos antigos (partição quente/fria).
+#
+# A tabela agendamento guarda só a agenda "quente": a verificação de conflito,
+# o índice em memória e o GET /agendamentos trabalham sobre ela. Agendamentos
+# que terminaram antes do horizonte (ARQUIVAMENTO_HORIZONTE_DIAS atrás),
+# concluídos ou cancelados, vão para a tabela agendamento_arquivado, com as
+# mesmas colunas e o mesmo id, mais a data do arquivamento.
+#
+# A mudança é feita em lotes: cada lote é uma transação curta (INSERT ...
+# SELECT no arquivo + DELETE dos mesmos ids na tabela quente) e entre um lote
+# e outro há uma pausa, para que criações e cancelamentos não fiquem
+# esperando o arquivamento inteiro pelo lock de escrita do SQLite.
+#
+# Uso:
+#   python arquivamento.py                       # horizonte do ambiente (90 dias)
+#   python arquivamento.py --horizonte-dias 30 --tamanho-lote 1000 --pausa-ms 20
+# O serviço também expõe o mesmo job em POST /arquivamento.
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, literal, select
+
+
+def limite_arquivamento(horizonte_dias, agora=None):
+    """
+    Instante (UTC, sem tzinfo) antes do qual um agendamento terminado é arquivado.
+    """
+    agora = agora or datetime.now(timezone.utc)
+    return agora.astimezone(timezone.utc).replace(tzinfo=None) - timedelta(days=horizonte_dias)
+
+
+def arquivar(engine, quente, arquivo, limite, tamanho_lote=500, pausa=0.05, ao_mover=None):
+    """
+    Move de 'quente' para 'arquivo' (tabelas do SQLAlchemy) as linhas com
+    horario_fim_utc < limite, 'tamanho_lote' por transação. 'ao_mover' recebe
+    as linhas (id, horario_fim_utc) de cada lote já gravado.
+    Retorna {"arquivados", "lotes", "segundos"}.
+    """
+    colunas = [coluna.name for coluna in quente.columns]
+    inicio = time.perf_counter()
+    arquivados = lotes = 0
+    while True:
+        with engine.begin() as conexao:
+            ids = conexao.execute(
+                select(quente.c.id).where(quente.c.horario_fim_utc < limite).order_by(quente.c.id).limit(tamanho_lote)
+            ).scalars().all()
+            if not ids:
+                break
+            agora = datetime.now(timezone.utc).replace(tzinfo=None)
+            # O INSERT abre a transação de escrita e relê as linhas: se outro
+            # processo arquivou alguma delas nesse meio tempo, ela já não está
+            # na tabela quente e não é copiada de novo
+            conexao.execute(insert(arquivo).from_select(
+                colunas + ['arquivado_em'],
+                select(*[quente.c[nome] for nome in colunas], literal(agora)).where(quente.c.id.in_(ids))
+            ))
+            movidos = conexao.execute(
+                select(quente.c.id, quente.c.horario_fim_utc).where(quente.c.id.in_(ids))
+            ).all()
+            conexao.execute(delete(quente).where(quente.c.id.in_(ids)))
+        arquivados += len(movidos)
+        lotes += 1
+        if ao_mover and movidos:
+            ao_mover(movidos)
+        if len(ids) < tamanho_lote:
+            break
+        if pausa:
+            time.sleep(pausa)
+    return {"arquivados": arquivados, "lotes": lotes, "segundos": round(time.perf_counter() - inicio, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arquiva agendamentos terminados antes do horizonte")
+    parser.add_argument('--horizonte-dias', type=int, default=None, help="Padrão: ARQUIVAMENTO_HORIZONTE_DIAS")
+    parser.add_argument('--tamanho-lote', type=int, default=None, help="Linhas por transação")
+    parser.add_argument('--pausa-ms', type=float, default=None, help="Pausa entre lotes")
+    args = parser.parse_args()
+
+    # Importado aqui: o app lê a configuração (DATABASE_URL etc.) do ambiente
+    from app import app, executar_arquivamento
+    with app.app_context():
+        resultado = executar_arquivamento(args.horizonte_dias, args.tamanho_lote, args.pausa_ms)
+    print(
+        f"{resultado['arquivados']} agendamentos arquivados em {resultado['lotes']} lotes "
+        f"({resultado['segundos']} s), terminados antes de {resultado['limite']}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
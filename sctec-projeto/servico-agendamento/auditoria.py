@@ -0,0 +1,364 @@
+# Consulta indexada do log de auditoria (audit.log, uma linha JSON por evento).
+#
+# O log não é relido a cada consulta. Um índice ao lado dele (arquivo SQLite
+# "audit.log.indice") guarda, para cada evento, em que arquivo e em que
+# posição (bytes) está a linha, junto com os campos usados nas buscas:
+# event_type, cientista_id, agendamento_id, telescopio_id, horario_inicio_utc
+# (o slot, normalizado em UTC) e timestamp_utc. A consulta filtra pelo índice
+# e lê só as linhas encontradas, por mmap.
+#
+# O índice é incremental: para cada arquivo (identificado pelo inode, que não
+# muda na rotação audit.log -> audit.log.1) ele sabe até que byte já indexou
+# e, a cada atualização, lê só o que foi escrito depois, até a última linha
+# completa. Arquivos apagados pela rotação saem do índice; como o sistema pode
+# reaproveitar o inode de um arquivo apagado no novo audit.log, cada arquivo
+# também é reconhecido pela sua primeira linha.
+#
+# Uso:
+#   python auditoria.py indexar
+#   python auditoria.py consultar --event-type AGENDAMENTO_TENTATIVA_FALHA --horario-inicio 2025-12-01T03:00:00Z
+#   python auditoria.py consultar --desde 2025-10-26T18:00:00Z --ate 2025-10-26T18:05:00Z --limite 50
+# O serviço expõe a mesma consulta em GET /auditoria.
+import argparse
+import json
+import mmap
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timezone
+
+try:
+    import orjson
+    _ler_json = orjson.loads
+except ImportError:
+    _ler_json = json.loads
+
+# Linhas indexadas por transação (cada uma segura o lock de escrita do índice)
+LINHAS_POR_TRANSACAO = 10000
+FILTROS = ('event_type', 'cientista_id', 'agendamento_id', 'telescopio_id', 'horario_inicio_utc')
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS arquivo (
+    inode INTEGER PRIMARY KEY,
+    assinatura BLOB NOT NULL,
+    indexado_ate INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS evento (
+    id INTEGER PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    posicao INTEGER NOT NULL,
+    tamanho INTEGER NOT NULL,
+    timestamp_utc TEXT NOT NULL,
+    event_type TEXT,
+    cientista_id INTEGER,
+    agendamento_id INTEGER,
+    telescopio_id INTEGER,
+    horario_inicio_utc TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_evento_event_type ON evento (event_type);
+CREATE INDEX IF NOT EXISTS ix_evento_cientista ON evento (cientista_id);
+CREATE INDEX IF NOT EXISTS ix_evento_agendamento ON evento (agendamento_id);
+CREATE INDEX IF NOT EXISTS ix_evento_telescopio ON evento (telescopio_id);
+CREATE INDEX IF NOT EXISTS ix_evento_horario_inicio ON evento (horario_inicio_utc);
+CREATE INDEX IF NOT EXISTS ix_evento_timestamp ON evento (timestamp_utc);
+CREATE INDEX IF NOT EXISTS ix_evento_inode ON evento (inode);
+"""
+
+
+def normalizar_instante(valor):
+    """
+    Instante ISO 8601 (com Z ou offset) no formato do log:
+    AAAA-MM-DDTHH:MM:SS.mmmZ em UTC. Levanta ValueError se for inválido.
+    """
+    dt = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.isoformat(timespec='milliseconds') + 'Z'
+
+
+def _normalizar_slot(valor):
+    try:
+        return normalizar_instante(valor) if isinstance(valor, str) else None
+    except ValueError:
+        return None
+
+
+def _inteiro(valor):
+    return valor if isinstance(valor, int) and not isinstance(valor, bool) else None
+
+
+def ler_linhas(caminho, inicio=0):
+    """
+    Gera (posicao, linha) das linhas completas do arquivo a partir do byte
+    'inicio', lendo por mmap. Uma última linha sem '\\n' (ainda sendo
+    escrita) fica para a próxima leitura.
+    """
+    with open(caminho, 'rb') as arquivo:
+        if os.fstat(arquivo.fileno()).st_size <= inicio:
+            return
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            posicao = inicio
+            while True:
+                quebra = mapa.find(b'\n', posicao)
+                if quebra == -1:
+                    return
+                yield posicao, mapa[posicao:quebra]
+                posicao = quebra + 1
+
+
+def _primeira_linha(caminho):
+    """
+    Primeira linha completa do arquivo (b'' se ainda não há nenhuma).
+    """
+    for _, linha in ler_linhas(caminho):
+        return linha
+    return b''
+
+
+def _campos_indexados(evento):
+    detalhes = evento.get('details') if isinstance(evento.get('details'), dict) else {}
+    usuario = evento.get('user') if isinstance(evento.get('user'), dict) else {}
+    return (
+        str(evento.get('timestamp_utc', '')),
+        evento.get('event_type'),
+        _inteiro(usuario.get('cientista_id', detalhes.get('cientista_id'))),
+        _inteiro(detalhes.get('agendamento_id')),
+        _inteiro(detalhes.get('telescopio_id')),
+        _normalizar_slot(detalhes.get('horario_inicio_utc')),
+    )
+
+
+class IndiceAuditoria:
+    """
+    Índice de posições do audit.log e dos arquivos rotacionados
+    (audit.log.1, .2, ...). Seguro entre threads e entre processos: a
+    indexação de cada trecho é uma transação BEGIN IMMEDIATE no SQLite.
+    """
+
+    def __init__(self, caminho_log, caminho_indice=None):
+        self.caminho_log = caminho_log
+        self.caminho_indice = caminho_indice or caminho_log + '.indice'
+        self._local = threading.local()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho_indice, timeout=30, isolation_level=None, check_same_thread=False)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.executescript(_ESQUEMA)
+            self._local.conexao = conexao
+        return conexao
+
+    def arquivos(self):
+        """
+        {inode: caminho} do log atual e dos rotacionados, do mais antigo
+        para o mais novo.
+        """
+        diretorio = os.path.dirname(os.path.abspath(self.caminho_log))
+        nome = os.path.basename(self.caminho_log)
+        padrao = re.compile(re.escape(nome) + r'\.(\d+)$')
+        rotacionados = sorted(
+            ((int(m.group(1)), os.path.join(diretorio, entrada))
+             for entrada in os.listdir(diretorio) for m in [padrao.match(entrada)] if m),
+            reverse=True
+        )
+        arquivos = {}
+        for caminho in [c for _, c in rotacionados] + [os.path.join(diretorio, nome)]:
+            try:
+                arquivos[os.stat(caminho).st_ino] = caminho
+            except FileNotFoundError:
+                continue  # rotacionado entre o listdir e o stat
+        return arquivos
+
+    def atualizar(self):
+        """
+        Indexa o que foi escrito desde a última atualização. Retorna o número
+        de eventos novos.
+        """
+        conexao = self._conexao()
+        arquivos = self.arquivos()
+        novos = 0
+        for inode, caminho in arquivos.items():
+            novos += self._indexar_arquivo(conexao, inode, caminho)
+        # Arquivos que a rotação já apagou
+        conhecidos = [inode for (inode,) in conexao.execute("SELECT inode FROM arquivo")]
+        removidos = [inode for inode in conhecidos if inode not in arquivos]
+        if removidos:
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                for inode in removidos:
+                    conexao.execute("DELETE FROM evento WHERE inode = ?", (inode,))
+                    conexao.execute("DELETE FROM arquivo WHERE inode = ?", (inode,))
+                conexao.execute("COMMIT")
+            except BaseException:
+                conexao.execute("ROLLBACK")
+                raise
+        return novos
+
+    def _indexar_arquivo(self, conexao, inode, caminho):
+        try:
+            assinatura = _primeira_linha(caminho)
+        except FileNotFoundError:
+            return 0
+        if not assinatura:
+            return 0  # nenhuma linha completa ainda
+        novos = 0
+        while True:
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                # Relido dentro da transação: outro processo pode ter avançado
+                linha = conexao.execute(
+                    "SELECT assinatura, indexado_ate FROM arquivo WHERE inode = ?", (inode,)
+                ).fetchone()
+                inicio = linha[1] if linha else 0
+                if linha and linha[0] != assinatura:
+                    # Inode reaproveitado por outro arquivo: recomeça do zero
+                    conexao.execute("DELETE FROM evento WHERE inode = ?", (inode,))
+                    inicio = 0
+                registros = []
+                fim = inicio
+                try:
+                    for posicao, texto in ler_linhas(caminho, inicio):
+                        fim = posicao + len(texto) + 1
+                        try:
+                            evento = _ler_json(texto)
+                        except ValueError:
+                            continue  # linha que não é JSON: só avança a posição
+                        if isinstance(evento, dict):
+                            registros.append((inode, posicao, len(texto)) + _campos_indexados(evento))
+                        if len(registros) >= LINHAS_POR_TRANSACAO:
+                            break
+                except FileNotFoundError:
+                    pass
+                if fim == inicio:
+                    conexao.execute("COMMIT")
+                    return novos
+                conexao.executemany(
+                    "INSERT INTO evento (inode, posicao, tamanho, timestamp_utc, event_type, cientista_id,"
+                    " agendamento_id, telescopio_id, horario_inicio_utc) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    registros
+                )
+                conexao.execute(
+                    "INSERT INTO arquivo (inode, assinatura, indexado_ate) VALUES (?, ?, ?)"
+                    " ON CONFLICT(inode) DO UPDATE SET assinatura = excluded.assinatura,"
+                    " indexado_ate = excluded.indexado_ate",
+                    (inode, assinatura, fim)
+                )
+                conexao.execute("COMMIT")
+            except BaseException:
+                conexao.execute("ROLLBACK")
+                raise
+            novos += len(registros)
+
+    def consultar(self, filtros=None, desde=None, ate=None, depois_de=None, limite=100):
+        """
+        Eventos que atendem a todos os filtros (campos de FILTROS, por
+        igualdade) e a desde <= timestamp_utc < ate, em ordem de gravação.
+        Retorna uma lista de (id, evento); 'depois_de' é o id do último
+        evento da página anterior.
+        """
+        condicoes, parametros = [], []
+        for campo, valor in (filtros or {}).items():
+            if campo not in FILTROS:
+                raise ValueError(f"Filtro desconhecido: {campo}")
+            if campo == 'horario_inicio_utc':
+                valor = normalizar_instante(valor)
+            condicoes.append(f"{campo} = ?")
+            parametros.append(valor)
+        if desde:
+            condicoes.append("timestamp_utc >= ?")
+            parametros.append(normalizar_instante(desde))
+        if ate:
+            condicoes.append("timestamp_utc < ?")
+            parametros.append(normalizar_instante(ate))
+        if depois_de:
+            condicoes.append("id > ?")
+            parametros.append(depois_de)
+        sql = "SELECT id, inode, posicao, tamanho FROM evento"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        sql += " ORDER BY id LIMIT ?"
+        linhas = self._conexao().execute(sql, parametros + [limite]).fetchall()
+        return self._ler_eventos(linhas)
+
+    def _ler_eventos(self, linhas):
+        """
+        Lê as linhas encontradas, abrindo cada arquivo uma vez (mmap).
+        """
+        arquivos = self.arquivos()
+        por_inode = {}
+        for id_evento, inode, posicao, tamanho in linhas:
+            por_inode.setdefault(inode, []).append((id_evento, posicao, tamanho))
+        eventos = {}
+        for inode, itens in por_inode.items():
+            caminho = arquivos.get(inode)
+            if caminho is None:
+                continue
+            try:
+                with open(caminho, 'rb') as arquivo:
+                    if os.fstat(arquivo.fileno()).st_ino != inode:
+                        continue  # rotacionado entre o stat e o open
+                    with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                        for id_evento, posicao, tamanho in itens:
+                            try:
+                                eventos[id_evento] = _ler_json(mapa[posicao:posicao + tamanho])
+                            except ValueError:
+                                continue  # arquivo trocado depois da última atualização
+            except FileNotFoundError:
+                continue
+        return [(id_evento, eventos[id_evento]) for id_evento, _, _, _ in linhas if id_evento in eventos]
+
+    def estatisticas(self):
+        conexao = self._conexao()
+        return {
+            "eventos_indexados": conexao.execute("SELECT COUNT(*) FROM evento").fetchone()[0],
+            "arquivos": conexao.execute("SELECT COUNT(*) FROM arquivo").fetchone()[0],
+            "bytes_indexados": conexao.execute("SELECT COALESCE(SUM(indexado_ate), 0) FROM arquivo").fetchone()[0],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta indexada do log de auditoria")
+    parser.add_argument('--arquivo', default=os.environ.get('LOG_ARQUIVO_AUDITORIA', 'audit.log'), help="Log de auditoria")
+    parser.add_argument('--indice', default=None, help="Arquivo do índice (padrão: <arquivo>.indice)")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    comandos.add_parser('indexar', help="Atualiza o índice")
+    consulta = comandos.add_parser('consultar', help="Imprime os eventos encontrados (JSON por linha)")
+    consulta.add_argument('--event-type')
+    consulta.add_argument('--cientista-id', type=int)
+    consulta.add_argument('--agendamento-id', type=int)
+    consulta.add_argument('--telescopio-id', type=int)
+    consulta.add_argument('--horario-inicio', help="Slot (horario_inicio_utc do evento)")
+    consulta.add_argument('--desde', help="timestamp_utc >= (ISO 8601)")
+    consulta.add_argument('--ate', help="timestamp_utc < (ISO 8601)")
+    consulta.add_argument('--limite', type=int, default=1000)
+    args = parser.parse_args()
+
+    indice = IndiceAuditoria(args.arquivo, args.indice)
+    novos = indice.atualizar()
+    if args.comando == 'indexar':
+        print(f"{novos} eventos novos indexados; {indice.estatisticas()}")
+        return 0
+
+    filtros = {
+        campo: valor for campo, valor in (
+            ('event_type', args.event_type), ('cientista_id', args.cientista_id),
+            ('agendamento_id', args.agendamento_id), ('telescopio_id', args.telescopio_id),
+            ('horario_inicio_utc', args.horario_inicio),
+        ) if valor is not None
+    }
+    try:
+        eventos = indice.consultar(filtros, args.desde, args.ate, limite=args.limite)
+    except ValueError as e:
+        print(f"Parâmetro inválido: {e}", file=sys.stderr)
+        return 2
+    for _, evento in eventos:
+        print(json.dumps(evento, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
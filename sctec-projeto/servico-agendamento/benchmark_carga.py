@@ -0,0 +1,445 @@
+# Benchmark de carga do Serviço de Agendamento.
+#
+# Cenários:
+#   mesmo_horario      - várias requisições disputando o mesmo horário (lock + 409)
+#   horarios_disjuntos - cada requisição num horário diferente (vazão de escrita)
+#   misto              - 80% leituras (listagem, disponibilidade), 20% criações
+#   cancelamentos      - rajada de cancelamentos (cada agendamento recebe dois)
+#   historico_grande   - criações com um histórico grande já gravado; metade
+#                        conflita com ele
+#   telescopios        - como mesmo_horario, mas cada grupo se espalha por
+#                        --telescopios instrumentos (só disputam lock as
+#                        requisições do mesmo telescópio)
+#
+# Alvos:
+#   --url http://127.0.0.1:5000  serviço rodando (Docker, gunicorn, flask run)
+#   --em-processo                app importado aqui e chamado pelo test client
+#                                do Flask, com LOCK_BACKEND=memoria no lugar
+#                                do coordenador e um banco temporário; não
+#                                precisa de Docker nem do Node.js
+#
+# Exemplos:
+#   python benchmark_carga.py --em-processo --saida atual.json
+#   python benchmark_carga.py --url http://127.0.0.1:5000 --modo aberto --taxa 200
+#   python benchmark_carga.py --em-processo --baseline atual.json --tolerancia 15
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+CENARIOS = ('mesmo_horario', 'horarios_disjuntos', 'misto', 'cancelamentos', 'historico_grande', 'telescopios')
+NUMERO_DE_CIENTISTAS = 10  # criados pelo POST /setup
+DURACAO_SLOT = timedelta(minutes=30)
+TAMANHO_LOTE_PREPARACAO = 1000
+# Cada cenário usa o seu trecho da agenda, longe dos outros
+DIAS_POR_CENARIO = 3000
+
+
+# --- ALVOS ---
+
+class AlvoHTTP:
+    """
+    Serviço remoto via requests. Com pool, cada thread reusa a sua conexão
+    keep-alive; sem pool, cada requisição abre uma conexão nova.
+    """
+
+    def __init__(self, url, usar_pool=True):
+        import requests
+        self._requests = requests
+        self.url = url.rstrip('/')
+        self.usar_pool = usar_pool
+        self._local = threading.local()
+        self.descricao = self.url
+
+    def _sessao(self):
+        sessao = getattr(self._local, 'sessao', None)
+        if sessao is None:
+            sessao = self._local.sessao = self._requests.Session()
+        return sessao
+
+    def requisicao(self, metodo, caminho, corpo=None):
+        if self.usar_pool:
+            resposta = self._sessao().request(metodo, self.url + caminho, json=corpo, timeout=30)
+        else:
+            resposta = self._requests.request(
+                metodo, self.url + caminho, json=corpo, timeout=30, headers={"Connection": "close"}
+            )
+        return resposta.status_code, resposta.json() if resposta.headers.get('Content-Type', '').startswith('application/json') else None
+
+
+class AlvoEmProcesso:
+    """
+    App importado neste processo e chamado pelo test client do Flask (um
+    cliente por thread). O lock usa o backend 'memoria'.
+    """
+
+    def __init__(self):
+        pasta = tempfile.mkdtemp(prefix='benchmark_carga_')
+        os.environ['LOCK_BACKEND'] = 'memoria'
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(pasta, 'database.db')}"
+        os.environ['LOCK_SQLITE_CAMINHO'] = os.path.join(pasta, 'locks.db')
+        os.environ['LOG_ARQUIVO_APP'] = os.path.join(pasta, 'app.log')
+        os.environ['LOG_ARQUIVO_AUDITORIA'] = os.path.join(pasta, 'audit.log')
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import logging
+        import app as modulo_app
+        # Logs de aplicação só a partir de ERROR, para não misturar o console
+        # com o relatório (os 409 geram WARNING); a auditoria é gravada em 'pasta'
+        logging.getLogger().setLevel(logging.ERROR)
+        self.app = modulo_app.app
+        with self.app.app_context():
+            modulo_app.inicializar_schema()
+        self._local = threading.local()
+        self.descricao = f"em_processo ({pasta})"
+
+    def requisicao(self, metodo, caminho, corpo=None):
+        cliente = getattr(self._local, 'cliente', None)
+        if cliente is None:
+            cliente = self._local.cliente = self.app.test_client()
+        resposta = cliente.open(caminho, method=metodo, json=corpo)
+        return resposta.status_code, resposta.get_json(silent=True)
+
+
+# --- CENÁRIOS ---
+
+def _iso(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _payload_slot(base, k):
+    inicio = base + k * DURACAO_SLOT
+    return {
+        "cientista_id": k % NUMERO_DE_CIENTISTAS + 1,
+        "horario_inicio_utc": _iso(inicio),
+        "horario_fim_utc": _iso(inicio + DURACAO_SLOT),
+        "objeto_observacao": "benchmark_carga",
+    }
+
+
+def _criar_em_lote(alvo, base, slots):
+    """
+    Grava os slots pelo POST /agendamentos/lote e retorna os ids criados.
+    """
+    ids = []
+    slots = list(slots)
+    for i in range(0, len(slots), TAMANHO_LOTE_PREPARACAO):
+        itens = [_payload_slot(base, k) for k in slots[i:i + TAMANHO_LOTE_PREPARACAO]]
+        status, corpo = alvo.requisicao('POST', '/agendamentos/lote', {"modo": "parcial", "agendamentos": itens})
+        if status not in (201, 207):
+            raise RuntimeError(f"Preparação falhou: POST /agendamentos/lote respondeu {status}")
+        ids.extend(r["id"] for r in corpo["resultados"] if r["status"] == "criado")
+    return ids
+
+
+def _garantir_telescopios(alvo, quantidade):
+    """
+    Cadastra (se preciso) os telescópios Bench-1..Bench-N e retorna os ids.
+    """
+    for n in range(1, quantidade + 1):
+        status, _ = alvo.requisicao('POST', '/telescopios', {"nome": f"Benchmark {n}", "codigo": f"Bench-{n}"})
+        if status not in (201, 409):
+            raise RuntimeError(f"Preparação falhou: POST /telescopios respondeu {status}")
+    status, corpo = alvo.requisicao('GET', '/telescopios?links=false')
+    if status != 200:
+        raise RuntimeError(f"Preparação falhou: GET /telescopios respondeu {status}")
+    por_codigo = {t["codigo"]: t["id"] for t in corpo["telescopios"]}
+    return [por_codigo[f"Bench-{n}"] for n in range(1, quantidade + 1)]
+
+
+class Cenario(ABC):
+    def __init__(self, base, args):
+        self.base = base
+        self.args = args
+
+    def preparar(self, alvo):
+        pass
+
+    @abstractmethod
+    def operacao(self, i):
+        """
+        Retorna (metodo, caminho, corpo) da i-ésima requisição.
+        """
+
+
+class MesmoHorario(Cenario):
+    # Grupos de 'concorrencia' requisições seguidas disputam o mesmo slot
+    def operacao(self, i):
+        return 'POST', '/agendamentos', _payload_slot(self.base, i // self.args.concorrencia)
+
+
+class HorariosDisjuntos(Cenario):
+    def operacao(self, i):
+        return 'POST', '/agendamentos', _payload_slot(self.base, i)
+
+
+class Misto(Cenario):
+    def preparar(self, alvo):
+        _criar_em_lote(alvo, self.base, range(0, 2 * self.args.requisicoes, 2))
+
+    def operacao(self, i):
+        if i % 5 == 0:
+            # Slots ímpares: livres
+            return 'POST', '/agendamentos', _payload_slot(self.base, 2 * i + 1)
+        dia = self.base + timedelta(days=i % 30)
+        if i % 5 in (1, 2):
+            return 'GET', f"/agendamentos?limite=50&inicio={_iso(dia)}", None
+        return 'GET', f"/disponibilidade?inicio={_iso(dia)}&fim={_iso(dia + timedelta(days=1))}&duracao=30", None
+
+
+class Cancelamentos(Cenario):
+    def preparar(self, alvo):
+        self.ids = _criar_em_lote(alvo, self.base, range((self.args.requisicoes + 1) // 2))
+
+    def operacao(self, i):
+        # Cada agendamento recebe dois cancelamentos: um 200 e um 400
+        return 'POST', f"/agendamentos/{self.ids[(i // 2) % len(self.ids)]}/cancelar", None
+
+
+class HistoricoGrande(Cenario):
+    def preparar(self, alvo):
+        _criar_em_lote(alvo, self.base, range(self.args.historico))
+        self._aleatorio = random.Random(self.args.semente)
+        self._lock = threading.Lock()
+
+    def operacao(self, i):
+        if i % 2 == 0:
+            with self._lock:
+                k = self._aleatorio.randrange(self.args.historico)
+            return 'POST', '/agendamentos', _payload_slot(self.base, k)  # conflito
+        return 'POST', '/agendamentos', _payload_slot(self.base, self.args.historico + i)
+
+
+class Telescopios(Cenario):
+    # Grupos de 'concorrencia' requisições no mesmo slot, em telescópios
+    # alternados: com --telescopios >= --concorrencia nenhuma conflita
+    def preparar(self, alvo):
+        self.telescopios = _garantir_telescopios(alvo, self.args.telescopios)
+
+    def operacao(self, i):
+        corpo = _payload_slot(self.base, i // self.args.concorrencia)
+        corpo["telescopio_id"] = self.telescopios[i % len(self.telescopios)]
+        return 'POST', '/agendamentos', corpo
+
+
+CLASSES_CENARIO = {
+    'mesmo_horario': MesmoHorario,
+    'horarios_disjuntos': HorariosDisjuntos,
+    'misto': Misto,
+    'cancelamentos': Cancelamentos,
+    'historico_grande': HistoricoGrande,
+    'telescopios': Telescopios,
+}
+
+
+# --- EXECUÇÃO ---
+
+def _executar(alvo, cenario, i, agendado_para, latencias, status, lock):
+    metodo, caminho, corpo = cenario.operacao(i)
+    try:
+        codigo = alvo.requisicao(metodo, caminho, corpo)[0]
+    except Exception as e:
+        codigo = f"erro:{type(e).__name__}"
+    # Em malha aberta a latência conta desde o instante agendado (inclui a
+    # espera na fila quando o serviço não acompanha a taxa)
+    latencia = time.perf_counter() - agendado_para
+    with lock:
+        latencias.append(latencia)
+        status[str(codigo)] += 1
+
+
+def rodar_malha_fechada(alvo, cenario, args):
+    """
+    'concorrencia' threads, cada uma envia a próxima requisição assim que
+    recebe a resposta da anterior.
+    """
+    latencias, status, lock = [], Counter(), threading.Lock()
+    proxima = iter(range(args.requisicoes))
+
+    def trabalhador():
+        while True:
+            with lock:
+                i = next(proxima, None)
+            if i is None:
+                return
+            _executar(alvo, cenario, i, time.perf_counter(), latencias, status, lock)
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=trabalhador) for _ in range(args.concorrencia)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencias, status, time.perf_counter() - inicio
+
+
+def rodar_malha_aberta(alvo, cenario, args):
+    """
+    Requisições chegam a 'taxa' por segundo, independentemente das respostas,
+    e são atendidas por até 'concorrencia' threads.
+    """
+    latencias, status, lock = [], Counter(), threading.Lock()
+    intervalo = 1.0 / args.taxa
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concorrencia) as executor:
+        for i in range(args.requisicoes):
+            agendado_para = inicio + i * intervalo
+            espera = agendado_para - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            executor.submit(_executar, alvo, cenario, i, agendado_para, latencias, status, lock)
+    return latencias, status, time.perf_counter() - inicio
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return None
+    # Nearest-rank: o menor valor com pelo menos p% das amostras abaixo ou iguais
+    posicao = max(0, min(len(ordenados), math.ceil(p / 100 * len(ordenados))) - 1)
+    return ordenados[posicao]
+
+
+def resumir(latencias, status, duracao):
+    ordenados = sorted(latencias)
+    ms = lambda valor: round(valor * 1000, 3) if valor is not None else None
+    return {
+        "requisicoes": len(latencias),
+        "duracao_s": round(duracao, 3),
+        "vazao_rps": round(len(latencias) / duracao, 1) if duracao > 0 else None,
+        "latencia_ms": {
+            "p50": ms(percentil(ordenados, 50)),
+            "p95": ms(percentil(ordenados, 95)),
+            "p99": ms(percentil(ordenados, 99)),
+            "max": ms(ordenados[-1] if ordenados else None),
+            "media": ms(sum(ordenados) / len(ordenados) if ordenados else None),
+        },
+        "status": dict(sorted(status.items())),
+    }
+
+
+def comparar(atual, baseline, tolerancia):
+    """
+    Compara vazão e p95/p99 de cada cenário com a baseline. Retorna as
+    linhas do relatório e se houve regressão acima da tolerância (%).
+    """
+    linhas, regressao = [], False
+    diferentes = [
+        chave for chave in ("modo", "concorrencia", "requisicoes", "taxa", "historico", "pool")
+        if atual["parametros"].get(chave) != baseline.get("parametros", {}).get(chave)
+    ]
+    if atual["alvo"] != baseline.get("alvo") and 'em_processo' in (atual["alvo"], baseline.get("alvo")):
+        diferentes.append("alvo")
+    if diferentes:
+        linhas.append(f"  AVISO: parâmetros diferentes da baseline ({', '.join(diferentes)}); a comparação não é direta")
+    for nome, resultado in atual["cenarios"].items():
+        anterior = baseline.get("cenarios", {}).get(nome)
+        if not anterior:
+            linhas.append(f"  {nome:<20} (sem baseline)")
+            continue
+        partes = []
+        for rotulo, novo, velho, maior_melhor in (
+            ("vazão", resultado["vazao_rps"], anterior["vazao_rps"], True),
+            ("p95", resultado["latencia_ms"]["p95"], anterior["latencia_ms"]["p95"], False),
+            ("p99", resultado["latencia_ms"]["p99"], anterior["latencia_ms"]["p99"], False),
+        ):
+            if not velho or novo is None:
+                continue
+            variacao = (novo - velho) / velho * 100
+            piorou = -variacao if maior_melhor else variacao
+            marca = ""
+            if piorou > tolerancia:
+                marca = " REGRESSÃO"
+                regressao = True
+            partes.append(f"{rotulo} {velho}->{novo} ({variacao:+.1f}%){marca}")
+        linhas.append(f"  {nome:<20} " + "; ".join(partes))
+    return linhas, regressao
+
+
+def imprimir(nome, resultado):
+    lat = resultado["latencia_ms"]
+    print(f"  {nome:<20} {resultado['requisicoes']:>6} req  {resultado['vazao_rps']:>8} req/s  "
+          f"p50 {lat['p50']} ms  p95 {lat['p95']} ms  p99 {lat['p99']} ms  status {resultado['status']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga do Serviço de Agendamento")
+    alvo_grupo = parser.add_mutually_exclusive_group(required=True)
+    alvo_grupo.add_argument('--url', help="URL do serviço (ex.: http://127.0.0.1:5000)")
+    alvo_grupo.add_argument('--em-processo', action='store_true', help="Usa o test client do Flask, sem rede")
+    parser.add_argument('--cenarios', default=','.join(CENARIOS), help="Lista separada por vírgulas")
+    parser.add_argument('--modo', choices=('fechado', 'aberto'), default='fechado', help="Malha fechada ou aberta")
+    parser.add_argument('--concorrencia', type=int, default=10, help="Threads clientes")
+    parser.add_argument('--requisicoes', type=int, default=500, help="Requisições por cenário")
+    parser.add_argument('--taxa', type=float, default=100.0, help="Requisições/s no modo aberto")
+    parser.add_argument('--historico', type=int, default=20000, help="Agendamentos gravados antes do cenário historico_grande")
+    parser.add_argument('--telescopios', type=int, default=4, help="Telescópios usados no cenário telescopios")
+    parser.add_argument('--sem-pool', action='store_true', help="Uma conexão nova por requisição (só com --url)")
+    parser.add_argument('--semente', type=int, default=None, help="Semente (horários e escolhas aleatórias)")
+    parser.add_argument('--saida', help="Grava o resultado em JSON")
+    parser.add_argument('--baseline', help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--tolerancia', type=float, default=10.0, help="Piora máxima aceita em %% (vazão, p95, p99)")
+    args = parser.parse_args()
+
+    cenarios = [c.strip() for c in args.cenarios.split(',') if c.strip()]
+    desconhecidos = [c for c in cenarios if c not in CENARIOS]
+    if desconhecidos:
+        parser.error(f"cenário desconhecido: {', '.join(desconhecidos)} (use {', '.join(CENARIOS)})")
+    if args.semente is None:
+        args.semente = int(time.time())
+
+    alvo = AlvoEmProcesso() if args.em_processo else AlvoHTTP(args.url, usar_pool=not args.sem_pool)
+    status, _ = alvo.requisicao('POST', '/setup')
+    if status != 200:
+        print(f"POST /setup respondeu {status}", file=sys.stderr)
+        return 2
+
+    # Horários bem no futuro e diferentes a cada execução, para não colidir
+    # com dados de execuções anteriores no mesmo banco
+    aleatorio = random.Random(args.semente)
+    base_execucao = datetime(2100, 1, 1) + timedelta(days=aleatorio.randrange(0, 2_500_000))
+
+    print(f"Alvo: {alvo.descricao} | modo {args.modo} | concorrência {args.concorrencia} | "
+          f"{args.requisicoes} req/cenário" + (f" | taxa {args.taxa}/s" if args.modo == 'aberto' else ""))
+    resultado = {
+        "data_utc": datetime.now(timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z'),
+        "alvo": 'em_processo' if args.em_processo else args.url,
+        "parametros": {
+            "modo": args.modo, "concorrencia": args.concorrencia, "requisicoes": args.requisicoes,
+            "taxa": args.taxa if args.modo == 'aberto' else None, "historico": args.historico,
+            "telescopios": args.telescopios, "pool": not args.sem_pool, "semente": args.semente,
+        },
+        "cenarios": {},
+    }
+    executar = rodar_malha_aberta if args.modo == 'aberto' else rodar_malha_fechada
+    for posicao, nome in enumerate(cenarios):
+        cenario = CLASSES_CENARIO[nome](base_execucao + timedelta(days=posicao * DIAS_POR_CENARIO), args)
+        cenario.preparar(alvo)
+        resultado["cenarios"][nome] = resumir(*executar(alvo, cenario, args))
+        imprimir(nome, resultado["cenarios"][nome])
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        print(f"Resultado gravado em {args.saida}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as arquivo:
+            baseline = json.load(arquivo)
+        linhas, regressao = comparar(resultado, baseline, args.tolerancia)
+        print(f"Comparação com {args.baseline} (tolerância {args.tolerancia}%):")
+        print("\n".join(linhas))
+        if regressao:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from intervalos import ArvoreIntervalos
+
+# Tamanhos de histórico (número de linhas na tabela agendamento) a comparar
+TAMANHOS = [1_000, 10_000, 100_000, 300_000]
+
+# Quantas verificações de conflito medir em cada cenário
+NUMERO_DE_CONSULTAS = 2_000
+
+# Mesma consulta que o criar_agendamento fazia antes do índice em memória
+CONSULTA_CONFLITO = (
+    "SELECT id FROM agendamento "
+    "WHERE horario_inicio_utc < ? AND horario_fim_utc > ? AND status = 'confirmado' LIMIT 1"
+)
+
+BASE_TIME = datetime(2020, 1, 1, 0, 0, 0)
+
+
+def criar_tabela(conexao, com_indice):
+    conexao.execute("""
+        CREATE TABLE agendamento (
+            id INTEGER PRIMARY KEY,
+            cientista_id INTEGER NOT NULL,
+            horario_inicio_utc DATETIME NOT NULL,
+            horario_fim_utc DATETIME NOT NULL,
+            status VARCHAR(20) NOT NULL
+        )
+    """)
+    if com_indice:
+        conexao.execute(
+            "CREATE INDEX ix_agendamento_status_horario "
+            "ON agendamento (status, horario_inicio_utc, horario_fim_utc)"
+        )
+
+
+def gerar_historico(tamanho):
+    """
+    Gera agendamentos de 30 minutos a cada hora; 1 em cada 5 está cancelado.
+    """
+    linhas = []
+    for i in range(tamanho):
+        inicio = BASE_TIME + timedelta(hours=i)
+        fim = inicio + timedelta(minutes=30)
+        status = 'cancelado' if i % 5 == 0 else 'confirmado'
+        linhas.append((i + 1, 1, inicio, fim, status))
+    return linhas
+
+
+def gerar_consultas(tamanho):
+    """
+    Sorteia janelas de 30 minutos espalhadas por todo o histórico.
+    """
+    rnd = random.Random(42)
+    consultas = []
+    for _ in range(NUMERO_DE_CONSULTAS):
+        inicio = BASE_TIME + timedelta(minutes=5 * rnd.randrange(tamanho * 12))
+        consultas.append((inicio, inicio + timedelta(minutes=30)))
+    return consultas
+
+
+def medir_sqlite(linhas, consultas, com_indice):
+    conexao = sqlite3.connect(":memory:")
+    criar_tabela(conexao, com_indice)
+    conexao.executemany(
+        "INSERT INTO agendamento VALUES (?, ?, ?, ?, ?)",
+        [(i, c, ini.isoformat(' '), fim.isoformat(' '), st) for i, c, ini, fim, st in linhas]
+    )
+    conexao.commit()
+    parametros = [(fim.isoformat(' '), ini.isoformat(' ')) for ini, fim in consultas]
+
+    inicio = time.perf_counter()
+    for p in parametros:
+        conexao.execute(CONSULTA_CONFLITO, p).fetchone()
+    total = time.perf_counter() - inicio
+    conexao.close()
+    return total / len(consultas)
+
+
+def medir_arvore(linhas, consultas):
+    arvore = ArvoreIntervalos()
+    for ag_id, _, ini, fim, status in linhas:
+        if status == 'confirmado':
+            arvore.inserir(ini, fim, ag_id)
+
+    inicio = time.perf_counter()
+    for ini, fim in consultas:
+        arvore.primeiro_conflito(ini, fim)
+    total = time.perf_counter() - inicio
+    return total / len(consultas)
+
+
+if __name__ == "__main__":
+    print("Latência média da verificação de conflito (microssegundos por consulta)\n")
+    print(f"{'linhas':>10} | {'SQLite sem índice':>18} | {'SQLite com índice':>18} | {'árvore':>10}")
+    print("-" * 66)
+
+    for tamanho in TAMANHOS:
+        linhas = gerar_historico(tamanho)
+        consultas = gerar_consultas(tamanho)
+
+        sem_indice = medir_sqlite(linhas, consultas[:200], com_indice=False)
+        com_indice = medir_sqlite(linhas, consultas, com_indice=True)
+        arvore = medir_arvore(linhas, consultas)
+
+        print(f"{tamanho:>10} | {sem_indice * 1e6:>18.1f} | {com_indice * 1e6:>18.1f} | {arvore * 1e6:>10.1f}")
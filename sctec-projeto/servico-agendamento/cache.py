@@ -0,0 +1,128 @@
+# Caches em memória do processo.
+#
+# CacheRespostas: respostas serializadas (LRU limitado por bytes). Cada
+# entrada guarda o corpo já serializado junto com a versão da agenda em que
+# foi gerado; uma entrada de versão anterior conta como falta e é substituída.
+# Quando o total de bytes passa do limite, as entradas usadas há mais tempo
+# são descartadas.
+#
+# CacheTTL: valores pequenos por chave (ex.: dados de cientistas), LRU limitado
+# em número de entradas e com validade, para que mudanças feitas por outros
+# processos apareçam depois de no máximo 'ttl' segundos.
+import threading
+import time
+from collections import OrderedDict
+
+
+class EntradaCache:
+    __slots__ = ('versao', 'corpo', 'etag', 'ultima_modificacao')
+
+    def __init__(self, versao, corpo, etag, ultima_modificacao):
+        self.versao = versao
+        self.corpo = corpo
+        self.etag = etag
+        self.ultima_modificacao = ultima_modificacao
+
+
+class CacheRespostas:
+    """
+    LRU de corpos de resposta (bytes) por chave. Seguro entre threads.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.descartes = 0
+
+    def obter(self, chave, versao):
+        """
+        Entrada gerada na 'versao' indicada, ou None.
+        """
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None or entrada.versao != versao:
+                self.faltas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return entrada
+
+    def guardar(self, chave, entrada):
+        with self._lock:
+            antiga = self._entradas.pop(chave, None)
+            if antiga is not None:
+                self._bytes -= len(antiga.corpo)
+            if len(entrada.corpo) > self.max_bytes:
+                return
+            self._entradas[chave] = entrada
+            self._bytes += len(entrada.corpo)
+            while self._bytes > self.max_bytes:
+                _, descartada = self._entradas.popitem(last=False)
+                self._bytes -= len(descartada.corpo)
+                self.descartes += 1
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "descartes": self.descartes
+            }
+
+
+class CacheTTL:
+    """
+    LRU chave -> valor com no máximo 'capacidade' entradas válidas por 'ttl'
+    segundos. Seguro entre threads.
+    """
+
+    def __init__(self, capacidade, ttl):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._valores = OrderedDict()  # chave -> (valor, guardado_em)
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._valores.get(chave)
+            if item is None or time.monotonic() - item[1] > self.ttl:
+                self.faltas += 1
+                return None
+            self._valores.move_to_end(chave)
+            self.acertos += 1
+            return item[0]
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._valores[chave] = (valor, time.monotonic())
+            self._valores.move_to_end(chave)
+            while len(self._valores) > self.capacidade:
+                self._valores.popitem(last=False)
+
+    def invalidar(self, chave=None):
+        """
+        Remove uma chave, ou todas se 'chave' for None.
+        """
+        with self._lock:
+            if chave is None:
+                self._valores.clear()
+            else:
+                self._valores.pop(chave, None)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._valores),
+                "capacidade": self.capacidade,
+                "acertos": self.acertos,
+                "faltas": self.faltas
+            }
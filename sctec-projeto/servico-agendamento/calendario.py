@@ -0,0 +1,134 @@
+# Calendário de ocupação por dia, mantido incrementalmente.
+#
+# Para cada dia (UTC) guarda a lista ordenada por início dos trechos ocupados
+# naquele dia (um agendamento que atravessa a meia-noite vira dois trechos).
+# A busca de janelas livres faz uma busca binária no primeiro dia e percorre
+# só os trechos dentro do intervalo pedido: O(log n + k), sem consultar o banco.
+import heapq
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+UM_DIA = timedelta(days=1)
+
+
+def _trechos_por_dia(inicio, fim):
+    """
+    Divide [inicio, fim) em trechos que não atravessam a meia-noite.
+    """
+    dia = datetime(inicio.year, inicio.month, inicio.day)
+    while dia < fim:
+        proximo = dia + UM_DIA
+        yield dia.date(), max(inicio, dia), min(fim, proximo)
+        dia = proximo
+
+
+class _Dia:
+    __slots__ = ('trechos', 'maior_trecho')
+
+    def __init__(self):
+        self.trechos = []  # (inicio, fim, id), ordenado
+        self.maior_trecho = timedelta(0)
+
+
+class CalendarioOcupacao:
+    """
+    Ocupação por dia. Datetimes em UTC sem tzinfo. Seguro entre threads.
+    """
+
+    def __init__(self):
+        self._dias = {}
+        self._lock = threading.RLock()
+
+    def adicionar(self, inicio, fim, id):
+        with self._lock:
+            for data, ini, fi in _trechos_por_dia(inicio, fim):
+                dia = self._dias.setdefault(data, _Dia())
+                insort(dia.trechos, (ini, fi, id))
+                if fi - ini > dia.maior_trecho:
+                    dia.maior_trecho = fi - ini
+
+    def remover(self, inicio, fim, id):
+        with self._lock:
+            for data, ini, fi in _trechos_por_dia(inicio, fim):
+                dia = self._dias.get(data)
+                if dia is None:
+                    continue
+                posicao = bisect_left(dia.trechos, (ini, fi, id))
+                if posicao < len(dia.trechos) and dia.trechos[posicao] == (ini, fi, id):
+                    del dia.trechos[posicao]
+                if not dia.trechos:
+                    del self._dias[data]
+
+    def _ocupados(self, inicio, fim):
+        """
+        Trechos ocupados que tocam [inicio, fim), dia a dia, em ordem de início.
+        """
+        for data, ini, fi in _trechos_por_dia(inicio, fim):
+            dia = self._dias.get(data)
+            if dia is None:
+                continue
+            # Nenhum trecho que começa antes de (ini - maior_trecho) alcança ini
+            posicao = bisect_left(dia.trechos, (ini - dia.maior_trecho,))
+            for trecho in dia.trechos[posicao:]:
+                if trecho[0] >= fi:
+                    break
+                if trecho[1] > ini:
+                    yield trecho
+
+    def _ocupados_com(self, inicio, fim, adicionais):
+        """
+        _ocupados mais os 'adicionais' (inicio, fim, id) que tocam [inicio,
+        fim), cortados nos limites, em ordem de início.
+        """
+        ocupados = self._ocupados(inicio, fim)
+        if not adicionais:
+            return ocupados
+        extras = [(max(ini, inicio), min(fi, fim), id) for ini, fi, id in adicionais if ini < fim and fi > inicio]
+        return heapq.merge(ocupados, extras, key=lambda trecho: trecho[0])
+
+    def janelas_livres(self, inicio, fim, duracao, adicionais=()):
+        """
+        Lista de (inicio, fim) livres dentro de [inicio, fim) com pelo menos
+        'duracao' de comprimento. 'adicionais': outros intervalos ocupados
+        (inicio, fim, id), em ordem de início (ex.: ocorrências de séries).
+        """
+        with self._lock:
+            janelas = []
+            cursor = inicio
+            for ini, fi, _ in self._ocupados_com(inicio, fim, adicionais):
+                if ini - cursor >= duracao:
+                    janelas.append((cursor, ini))
+                if fi > cursor:
+                    cursor = fi
+            if fim - cursor >= duracao:
+                janelas.append((cursor, fim))
+            return janelas
+
+    def ocupacao_por_hora(self, inicio, fim, adicionais=()):
+        """
+        Minutos ocupados em cada hora de cada dia entre inicio e fim (datas
+        inteiras): {date: [24 valores]}. Sobreposições contam uma vez só.
+        'adicionais' como em janelas_livres.
+        """
+        with self._lock:
+            mapa = {}
+            dia = datetime(inicio.year, inicio.month, inicio.day)
+            while dia < fim:
+                horas = [0.0] * 24
+                cursor = dia
+                for ini, fi, _ in self._ocupados_com(dia, dia + UM_DIA, adicionais):
+                    ini = max(ini, cursor)
+                    if fi <= ini:
+                        continue
+                    # Distribui o trecho [ini, fi) pelas horas que ele cobre
+                    hora = ini.replace(minute=0, second=0, microsecond=0)
+                    while hora < fi:
+                        proxima = hora + timedelta(hours=1)
+                        sobreposicao = min(fi, proxima) - max(ini, hora)
+                        horas[hora.hour] += sobreposicao.total_seconds() / 60
+                        hora = proxima
+                    cursor = fi
+                mapa[dia.date()] = [round(m, 1) for m in horas]
+                dia += UM_DIA
+            return mapa
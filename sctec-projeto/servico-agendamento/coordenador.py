@@ -0,0 +1,152 @@
+# Cliente HTTP do Serviço Coordenador (Node.js).
+#
+# Usa uma única requests.Session com pool de conexões keep-alive, de modo que
+# os pedidos de /lock e /unlock reaproveitam a conexão TCP (e a resolução de
+# DNS) em vez de abrir uma nova a cada agendamento. O pool do urllib3 é seguro
+# entre threads, então a mesma instância é compartilhada por todas as rotas.
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CoordenadorIndisponivel(Exception):
+    """
+    Não foi possível falar com o coordenador (conexão recusada ou timeout).
+    """
+
+
+class ErroCoordenador(Exception):
+    """
+    O coordenador respondeu com um status inesperado.
+    """
+
+    def __init__(self, status_code):
+        super().__init__(f"Status inesperado do coordenador: {status_code}")
+        self.status_code = status_code
+
+
+class MetricaRTT:
+    """
+    Estatísticas de tempo de ida e volta (em milissegundos) de uma operação.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.quantidade = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.ultimo_ms = 0.0
+
+    def registrar(self, duracao_ms):
+        with self._lock:
+            self.quantidade += 1
+            self.total_ms += duracao_ms
+            self.ultimo_ms = duracao_ms
+            if duracao_ms > self.max_ms:
+                self.max_ms = duracao_ms
+
+    def resumo(self):
+        with self._lock:
+            media = self.total_ms / self.quantidade if self.quantidade else 0.0
+            return {
+                "quantidade": self.quantidade,
+                "media_ms": round(media, 3),
+                "max_ms": round(self.max_ms, 3),
+                "ultimo_ms": round(self.ultimo_ms, 3),
+            }
+
+
+class ClienteCoordenador:
+    """
+    Cliente do coordenador com keep-alive, timeouts configuráveis e nova
+    tentativa (backoff exponencial com jitter) quando o recurso está ocupado.
+    """
+
+    def __init__(self, url_base, timeout_conexao=1.0, timeout_leitura=2.0,
+                 espera_maxima=0.5, backoff_base=0.01, backoff_max=0.1, tamanho_pool=20):
+        self.url_base = url_base.rstrip('/')
+        self.timeout = (timeout_conexao, timeout_leitura)
+        self.espera_maxima = espera_maxima
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=tamanho_pool)
+        self._sessao.mount('http://', adaptador)
+        self._sessao.mount('https://', adaptador)
+
+        self.rtt_lock = MetricaRTT()
+        self.rtt_unlock = MetricaRTT()
+        self._contadores_lock = threading.Lock()
+        self.tentativas_ocupado = 0
+        self.locks_negados = 0
+
+    def _post(self, caminho, corpo, metrica):
+        inicio = time.perf_counter()
+        try:
+            resposta = self._sessao.post(f"{self.url_base}{caminho}", json=corpo, timeout=self.timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise CoordenadorIndisponivel(str(e)) from e
+        finally:
+            metrica.registrar((time.perf_counter() - inicio) * 1000)
+        return resposta
+
+    def adquirir(self, resource_ids, ttl_ms=None, dono=None):
+        """
+        Tenta adquirir, numa única chamada, o lock de todos os recursos (tudo
+        ou nada). Se algum estiver ocupado (409), tenta de novo com jitter até
+        'espera_maxima' segundos. Retorna True se os locks foram concedidos e
+        False se continuaram ocupados.
+        """
+        corpo = {"resource_ids": sorted(resource_ids)}
+        if ttl_ms is not None:
+            corpo["ttl_ms"] = ttl_ms
+        if dono is not None:
+            corpo["owner"] = dono
+        prazo = time.monotonic() + self.espera_maxima
+        tentativa = 0
+        while True:
+            resposta = self._post('/lock', corpo, self.rtt_lock)
+            if resposta.status_code == 200:
+                return True
+            if resposta.status_code != 409:
+                raise ErroCoordenador(resposta.status_code)
+
+            pausa = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** tentativa)))
+            if time.monotonic() + pausa > prazo:
+                with self._contadores_lock:
+                    self.locks_negados += 1
+                return False
+            with self._contadores_lock:
+                self.tentativas_ocupado += 1
+            tentativa += 1
+            time.sleep(pausa)
+
+    def liberar(self, resource_ids, dono=None):
+        """
+        Libera os locks. Retorna False se algum deles não existia mais no
+        coordenador (404) ou pertence a outro dono (409, ex.: o nosso expirou).
+        """
+        corpo = {"resource_ids": sorted(resource_ids)}
+        if dono is not None:
+            corpo["owner"] = dono
+        resposta = self._post('/unlock', corpo, self.rtt_unlock)
+        if resposta.status_code == 200:
+            return resposta.json().get("success", True)
+        if resposta.status_code in (404, 409):
+            return False
+        raise ErroCoordenador(resposta.status_code)
+
+    def metricas(self):
+        with self._contadores_lock:
+            contadores = {
+                "tentativas_recurso_ocupado": self.tentativas_ocupado,
+                "locks_negados": self.locks_negados,
+            }
+        return {"lock": self.rtt_lock.resumo(), "unlock": self.rtt_unlock.resumo(), **contadores}
+
+    def fechar(self):
+        self._sessao.close()
@@ -0,0 +1,55 @@
+# Perfil de produção do Serviço de Agendamento (gunicorn).
+#
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# Vários processos (workers), cada um com várias threads (gthread). Cada
+# worker importa o app depois do fork (sem preload): tem o seu próprio pool de
+# conexões SQLite, fila de logs e índice de conflitos em memória. A sessão do
+# SQLAlchemy é por requisição (Flask-SQLAlchemy a remove no fim do contexto).
+#
+# No SIGTERM o gunicorn para de aceitar conexões e espera as requisições em
+# andamento terminarem (até graceful_timeout); depois worker_exit libera os
+# locks que ainda estiverem em posse e grava os logs pendentes.
+import logging
+import multiprocessing
+import os
+import sys
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count(), 4)))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_class = 'gthread'
+preload_app = False
+
+# Uma requisição de agendamento pode esperar o lock e o busy_timeout do SQLite
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Logs de acesso do gunicorn no console; os logs do app seguem o LOGGING.md
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', None)
+errorlog = '-'
+
+
+def on_starting(server):
+    if workers > 1 and os.environ.get('LOCK_BACKEND') == 'memoria':
+        server.log.warning(
+            "LOCK_BACKEND=memoria só garante exclusão mútua dentro de um processo; "
+            "com %s workers use 'coordenador' ou 'sqlite'", workers
+        )
+
+
+def post_worker_init(worker):
+    from app import app, inicializar_schema
+    with app.app_context():
+        try:
+            inicializar_schema()
+        except Exception as e:
+            # Outro worker pode estar criando as mesmas tabelas/índices agora
+            logging.warning("Worker %s: inicialização do schema falhou (%s)", worker.pid, e)
+
+
+def worker_exit(server, worker):
+    app_modulo = sys.modules.get('app')
+    if app_modulo is not None:
+        app_modulo.encerrar_servico()
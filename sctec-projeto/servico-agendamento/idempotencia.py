@@ -0,0 +1,89 @@
+# Respostas guardadas por Idempotency-Key.
+#
+# O cliente manda o mesmo cabeçalho "Idempotency-Key" ao repetir uma
+# requisição (ex.: depois de um timeout); se a primeira tentativa já tinha
+# dado certo, a resposta original é devolvida sem executar nada de novo.
+#
+# Este armazém é a camada em memória do processo: limitado em número de chaves
+# (as usadas há mais tempo saem primeiro) e com TTL. O app também grava as
+# chaves no banco para que um worker encontre as respostas dos outros.
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def impressao_requisicao(metodo, caminho, corpo):
+    """
+    Hash da requisição, para recusar a mesma chave usada com outro conteúdo.
+    """
+    resumo = hashlib.sha256()
+    resumo.update(f"{metodo} {caminho}\n".encode('utf-8'))
+    resumo.update(corpo or b"")
+    return resumo.hexdigest()
+
+
+class RespostaGuardada:
+    __slots__ = ('impressao', 'status', 'corpo', 'criada_em')
+
+    def __init__(self, impressao, status, corpo, criada_em):
+        self.impressao = impressao
+        self.status = status
+        self.corpo = corpo
+        self.criada_em = criada_em  # time.time()
+
+
+class ArmazemIdempotencia:
+    """
+    Chave -> RespostaGuardada, com no máximo 'capacidade' chaves e validade
+    de 'ttl' segundos. Seguro entre threads.
+    """
+
+    def __init__(self, capacidade, ttl):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._respostas = OrderedDict()
+        self._lock = threading.Lock()
+        self.expiradas = 0
+        self.descartadas = 0
+
+    def obter(self, chave):
+        with self._lock:
+            resposta = self._respostas.get(chave)
+            if resposta is None:
+                return None
+            if time.time() - resposta.criada_em > self.ttl:
+                del self._respostas[chave]
+                self.expiradas += 1
+                return None
+            self._respostas.move_to_end(chave)
+            return resposta
+
+    def guardar(self, chave, resposta):
+        with self._lock:
+            self._respostas[chave] = resposta
+            self._respostas.move_to_end(chave)
+            self._remover_expiradas()
+            while len(self._respostas) > self.capacidade:
+                self._respostas.popitem(last=False)
+                self.descartadas += 1
+
+    def _remover_expiradas(self):
+        # As chaves mais antigas ficam no início (salvo as relidas por obter)
+        limite = time.time() - self.ttl
+        while self._respostas:
+            chave, resposta = next(iter(self._respostas.items()))
+            if resposta.criada_em >= limite:
+                break
+            del self._respostas[chave]
+            self.expiradas += 1
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "chaves": len(self._respostas),
+                "capacidade": self.capacidade,
+                "ttl_segundos": self.ttl,
+                "expiradas": self.expiradas,
+                "descartadas": self.descartadas
+            }
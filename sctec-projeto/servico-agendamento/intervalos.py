@@ -0,0 +1,161 @@
+# Árvore de intervalos em memória usada na verificação de conflito de horários.
+#
+# É uma árvore AVL ordenada por (inicio, id) em que cada nó guarda também o
+# maior 'fim' da sua subárvore. Com isso a busca por sobreposição descarta
+# subárvores inteiras e custa O(log n + k), independente do tamanho da tabela.
+import threading
+
+
+class _No:
+    __slots__ = ('inicio', 'fim', 'id', 'max_fim', 'altura', 'esq', 'dir')
+
+    def __init__(self, inicio, fim, id):
+        self.inicio = inicio
+        self.fim = fim
+        self.id = id
+        self.max_fim = fim
+        self.altura = 1
+        self.esq = None
+        self.dir = None
+
+
+def _altura(no):
+    return no.altura if no else 0
+
+
+def _atualizar(no):
+    no.altura = 1 + max(_altura(no.esq), _altura(no.dir))
+    no.max_fim = no.fim
+    if no.esq and no.esq.max_fim > no.max_fim:
+        no.max_fim = no.esq.max_fim
+    if no.dir and no.dir.max_fim > no.max_fim:
+        no.max_fim = no.dir.max_fim
+
+
+def _rotacionar_direita(no):
+    filho = no.esq
+    no.esq = filho.dir
+    filho.dir = no
+    _atualizar(no)
+    _atualizar(filho)
+    return filho
+
+
+def _rotacionar_esquerda(no):
+    filho = no.dir
+    no.dir = filho.esq
+    filho.esq = no
+    _atualizar(no)
+    _atualizar(filho)
+    return filho
+
+
+def _balancear(no):
+    _atualizar(no)
+    fator = _altura(no.esq) - _altura(no.dir)
+    if fator > 1:
+        if _altura(no.esq.esq) < _altura(no.esq.dir):
+            no.esq = _rotacionar_esquerda(no.esq)
+        return _rotacionar_direita(no)
+    if fator < -1:
+        if _altura(no.dir.dir) < _altura(no.dir.esq):
+            no.dir = _rotacionar_direita(no.dir)
+        return _rotacionar_esquerda(no)
+    return no
+
+
+class ArvoreIntervalos:
+    """
+    Conjunto de intervalos semiabertos [inicio, fim) identificados por id.
+    Todas as operações são protegidas por um lock (seguro entre threads).
+    """
+
+    def __init__(self):
+        self._raiz = None
+        self._tamanho = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._tamanho
+
+    def inserir(self, inicio, fim, id):
+        with self._lock:
+            self._raiz = self._inserir(self._raiz, _No(inicio, fim, id))
+            self._tamanho += 1
+
+    def remover(self, inicio, id):
+        """
+        Remove o intervalo (inicio, id). Retorna False se ele não existir.
+        """
+        with self._lock:
+            removido = []
+            self._raiz = self._remover(self._raiz, (inicio, id), removido)
+            if removido:
+                self._tamanho -= 1
+            return bool(removido)
+
+    def sobrepostos(self, inicio, fim):
+        """
+        Retorna a lista de (inicio, fim, id) que se sobrepõem a [inicio, fim),
+        em ordem de início.
+        """
+        with self._lock:
+            encontrados = []
+            self._buscar(self._raiz, inicio, fim, encontrados, limite=None)
+            return encontrados
+
+    def primeiro_conflito(self, inicio, fim):
+        """
+        Retorna o primeiro (inicio, fim, id) que se sobrepõe a [inicio, fim),
+        ou None. Para na primeira sobreposição encontrada.
+        """
+        with self._lock:
+            encontrados = []
+            self._buscar(self._raiz, inicio, fim, encontrados, limite=1)
+            return encontrados[0] if encontrados else None
+
+    def _inserir(self, no, novo):
+        if no is None:
+            return novo
+        if (novo.inicio, novo.id) < (no.inicio, no.id):
+            no.esq = self._inserir(no.esq, novo)
+        else:
+            no.dir = self._inserir(no.dir, novo)
+        return _balancear(no)
+
+    def _remover(self, no, chave, removido):
+        if no is None:
+            return None
+        chave_no = (no.inicio, no.id)
+        if chave < chave_no:
+            no.esq = self._remover(no.esq, chave, removido)
+        elif chave > chave_no:
+            no.dir = self._remover(no.dir, chave, removido)
+        else:
+            removido.append(no)
+            if no.esq is None:
+                return no.dir
+            if no.dir is None:
+                return no.esq
+            # Substitui pelo sucessor (menor nó da subárvore direita)
+            sucessor = no.dir
+            while sucessor.esq:
+                sucessor = sucessor.esq
+            no.dir = self._remover(no.dir, (sucessor.inicio, sucessor.id), [])
+            no.inicio, no.fim, no.id = sucessor.inicio, sucessor.fim, sucessor.id
+        return _balancear(no)
+
+    def _buscar(self, no, inicio, fim, encontrados, limite):
+        if no is None or no.max_fim <= inicio:
+            return
+        self._buscar(no.esq, inicio, fim, encontrados, limite)
+        if limite is not None and len(encontrados) >= limite:
+            return
+        if no.inicio >= fim:
+            # Todos os nós à direita começam depois do fim da consulta
+            return
+        if no.fim > inicio:
+            encontrados.append((no.inicio, no.fim, no.id))
+            if limite is not None and len(encontrados) >= limite:
+                return
+        self._buscar(no.dir, inicio, fim, encontrados, limite)
@@ -0,0 +1,334 @@
+# Backends de lock (exclusão mútua) do Serviço de Agendamento.
+#
+# - coordenador: o Serviço Coordenador (Node.js) via HTTP, para vários nós.
+# - memoria:     tabela de locks no próprio processo, para implantações de um
+#                único processo (zero saltos de rede).
+# - sqlite:      tabela de locks num arquivo SQLite, adquirida dentro de uma
+#                transação BEGIN IMMEDIATE; vale para vários processos no
+#                mesmo host.
+#                A transação cobre a aquisição das concessões (num arquivo
+#                próprio, locks.db), e não a verificação + INSERT do
+#                agendamento no banco do serviço: assim os três backends têm
+#                o mesmo fluxo (adquirir, verificar, gravar, liberar), só
+#                disputam entre si as requisições que tocam as mesmas fatias,
+#                e a transação de escrita do banco de agendamentos fica curta.
+#
+# Todos os locks são concessões (leases) com TTL: se quem adquiriu não liberar
+# (ex.: falha no /unlock), o lock expira sozinho. Cada aquisição recebe um
+# token de dono, e só o dono consegue liberar. O backend guarda os locks em
+# posse do processo para liberá-los no desligamento (liberar_todos).
+#
+# Um agendamento trava todas as fatias de tempo (ex.: 15 minutos) que o seu
+# intervalo cobre, numa única aquisição tudo-ou-nada e em ordem fixa. Assim
+# intervalos que se sobrepõem sempre disputam ao menos uma chave em comum, e
+# intervalos disjuntos (em fatias diferentes) não disputam nada.
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+
+from coordenador import MetricaRTT
+
+
+def _novo_token():
+    return uuid.uuid4().hex
+
+
+def chaves_lock(inicio, fim, granularidade_min=15, prefixo="Hubble-Acad"):
+    """
+    Chaves de lock das fatias de 'granularidade_min' minutos que o intervalo
+    [inicio, fim) cobre, normalizadas em UTC e em ordem crescente.
+    Ex.: 03:10-03:40 -> Hubble-Acad_...T03:00:00Z, ..._T03:15:00Z, ..._T03:30:00Z
+    """
+    if inicio.tzinfo is not None:
+        inicio = inicio.astimezone(timezone.utc).replace(tzinfo=None)
+    if fim.tzinfo is not None:
+        fim = fim.astimezone(timezone.utc).replace(tzinfo=None)
+    passo = timedelta(minutes=granularidade_min)
+    minutos_do_dia = inicio.hour * 60 + inicio.minute
+    fatia = datetime(inicio.year, inicio.month, inicio.day) + timedelta(
+        minutes=minutos_do_dia - minutos_do_dia % granularidade_min
+    )
+    chaves = []
+    while fatia < fim:
+        chaves.append(f"{prefixo}_{fatia.strftime('%Y-%m-%dT%H:%M:%S')}Z")
+        fatia += passo
+    return chaves
+
+
+class BackendLock(ABC):
+    """
+    Interface comum. adquirir() trava uma lista de recursos (tudo ou nada) e
+    retorna o token do dono, ou None se algum recurso continuou ocupado após
+    a espera máxima; liberar() recebe a mesma lista e esse token.
+    """
+    nome = None
+
+    def __init__(self, ttl, espera_maxima):
+        self.ttl = ttl
+        self.espera_maxima = espera_maxima
+        self.rtt_lock = MetricaRTT()
+        self.rtt_unlock = MetricaRTT()
+        self._contadores_lock = threading.Lock()
+        self.locks_negados = 0
+        self.locks_expirados = 0
+        self._em_posse = {}  # token -> resource_ids
+
+    def adquirir(self, resource_ids):
+        # Ordem determinística: evita deadlock entre aquisições parciais
+        resource_ids = sorted(set(resource_ids))
+        inicio = time.perf_counter()
+        try:
+            token = self._adquirir(resource_ids)
+        finally:
+            self.rtt_lock.registrar((time.perf_counter() - inicio) * 1000)
+        if token is None:
+            self._incrementar('locks_negados')
+        else:
+            with self._contadores_lock:
+                self._em_posse[token] = resource_ids
+        return token
+
+    def liberar(self, resource_ids, token):
+        resource_ids = sorted(set(resource_ids))
+        inicio = time.perf_counter()
+        try:
+            liberado = self._liberar(resource_ids, token)
+        finally:
+            self.rtt_unlock.registrar((time.perf_counter() - inicio) * 1000)
+        # Se a liberação falhou com exceção o lock continua em posse, e
+        # liberar_todos tenta de novo no desligamento
+        with self._contadores_lock:
+            self._em_posse.pop(token, None)
+        return liberado
+
+    def liberar_todos(self):
+        """
+        Libera os locks que este processo ainda tem (ex.: requisições que não
+        terminaram dentro do prazo de desligamento). Retorna quantos eram.
+        """
+        with self._contadores_lock:
+            pendentes = list(self._em_posse.items())
+        for token, resource_ids in pendentes:
+            try:
+                self.liberar(resource_ids, token)
+            except Exception:
+                # Não conseguiu liberar: o TTL do lock resolve
+                pass
+        return len(pendentes)
+
+    def _incrementar(self, contador, valor=1):
+        with self._contadores_lock:
+            setattr(self, contador, getattr(self, contador) + valor)
+
+    def metricas(self):
+        with self._contadores_lock:
+            contadores = {
+                "locks_negados": self.locks_negados,
+                "locks_expirados": self.locks_expirados,
+                "locks_em_posse": len(self._em_posse),
+            }
+        return {
+            "backend": self.nome,
+            "lock": self.rtt_lock.resumo(),
+            "unlock": self.rtt_unlock.resumo(),
+            **contadores,
+        }
+
+    @abstractmethod
+    def _adquirir(self, resource_ids):
+        pass
+
+    @abstractmethod
+    def _liberar(self, resource_ids, token):
+        pass
+
+
+class LockCoordenadorHTTP(BackendLock):
+    """
+    Usa o Serviço Coordenador remoto; o TTL é enviado como 'ttl_ms' e o token
+    como 'owner'. A espera/nova tentativa é feita pelo ClienteCoordenador.
+    """
+    nome = 'coordenador'
+
+    def __init__(self, cliente, ttl):
+        super().__init__(ttl, cliente.espera_maxima)
+        self.cliente = cliente
+
+    def _adquirir(self, resource_ids):
+        token = _novo_token()
+        if self.cliente.adquirir(resource_ids, ttl_ms=int(self.ttl * 1000), dono=token):
+            return token
+        return None
+
+    def _liberar(self, resource_ids, token):
+        return self.cliente.liberar(resource_ids, dono=token)
+
+    def metricas(self):
+        metricas = super().metricas()
+        metricas["coordenador"] = self.cliente.metricas()
+        return metricas
+
+
+class LockMemoria(BackendLock):
+    """
+    Tabela de locks em memória: {resource_id: (token, expira_em)}. Só garante
+    exclusão mútua entre threads do mesmo processo.
+    """
+    nome = 'memoria'
+
+    def __init__(self, ttl, espera_maxima):
+        super().__init__(ttl, espera_maxima)
+        self._locks = {}
+        self._condicao = threading.Condition()
+
+    def _adquirir(self, resource_ids):
+        prazo = time.monotonic() + self.espera_maxima
+        with self._condicao:
+            while True:
+                agora = time.monotonic()
+                ocupados = []
+                for resource_id in resource_ids:
+                    atual = self._locks.get(resource_id)
+                    if atual is not None and atual[1] <= agora:
+                        del self._locks[resource_id]
+                        self._incrementar('locks_expirados')
+                    elif atual is not None:
+                        ocupados.append(atual)
+                if not ocupados:
+                    token = _novo_token()
+                    for resource_id in resource_ids:
+                        self._locks[resource_id] = (token, agora + self.ttl)
+                    return token
+                if agora >= prazo:
+                    return None
+                # Acorda no unlock (notify) ou quando o primeiro lock vencer
+                self._condicao.wait(min(prazo, min(expira for _, expira in ocupados)) - agora)
+
+    def _liberar(self, resource_ids, token):
+        with self._condicao:
+            liberados = 0
+            for resource_id in resource_ids:
+                atual = self._locks.get(resource_id)
+                if atual is not None and atual[0] == token:
+                    del self._locks[resource_id]
+                    liberados += 1
+            if liberados:
+                self._condicao.notify_all()
+            return liberados == len(resource_ids)
+
+
+class LockSQLite(BackendLock):
+    """
+    Tabela lock_recurso num arquivo SQLite. A verificação (expiração + lock
+    existente) e a inserção acontecem numa transação BEGIN IMMEDIATE, que
+    reserva a escrita do arquivo e torna a aquisição atômica entre processos.
+    """
+    nome = 'sqlite'
+
+    def __init__(self, caminho, ttl, espera_maxima, backoff_base=0.005, backoff_max=0.05, espera_liberacao=5.0):
+        super().__init__(ttl, espera_maxima)
+        self.caminho = caminho
+        # A liberação pode esperar mais que a aquisição: desistir dela deixaria
+        # o lock preso até o TTL
+        self.espera_liberacao = espera_liberacao
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._local = threading.local()
+        with self._conexao() as conexao:
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS lock_recurso ("
+                "resource_id TEXT PRIMARY KEY, dono TEXT NOT NULL, expira_em REAL NOT NULL)"
+            )
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            # isolation_level=None: as transações são controladas manualmente
+            conexao = sqlite3.connect(self.caminho, timeout=self.espera_maxima or 0.1, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            # Lock é concessão com TTL: não precisa de fsync a cada commit
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def _tentar(self, resource_ids, token, espera):
+        conexao = self._conexao()
+        # Com vários processos o BEGIN IMMEDIATE pode esperar outro escritor,
+        # mas não além do prazo da aquisição
+        conexao.execute(f"PRAGMA busy_timeout={max(1, int(espera * 1000))}")
+        agora = time.time()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            expirados = 0
+            inseridos = 0
+            for resource_id in resource_ids:
+                expirados += conexao.execute(
+                    "DELETE FROM lock_recurso WHERE resource_id = ? AND expira_em <= ?", (resource_id, agora)
+                ).rowcount
+                inseridos += conexao.execute(
+                    "INSERT OR IGNORE INTO lock_recurso (resource_id, dono, expira_em) VALUES (?, ?, ?)",
+                    (resource_id, token, agora + self.ttl)
+                ).rowcount
+            # Tudo ou nada: se algum recurso estava ocupado, desfaz as inserções
+            conexao.execute("COMMIT" if inseridos == len(resource_ids) else "ROLLBACK")
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+        if expirados and inseridos == len(resource_ids):
+            self._incrementar('locks_expirados', expirados)
+        return inseridos == len(resource_ids)
+
+    def _adquirir(self, resource_ids):
+        token = _novo_token()
+        prazo = time.monotonic() + self.espera_maxima
+        tentativa = 0
+        while True:
+            try:
+                if self._tentar(resource_ids, token, prazo - time.monotonic()):
+                    return token
+            except sqlite3.OperationalError:
+                # Banco ocupado além do timeout: trata como recurso ocupado
+                pass
+            pausa = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** tentativa)))
+            if time.monotonic() + pausa > prazo:
+                return None
+            tentativa += 1
+            time.sleep(pausa)
+
+    def _liberar(self, resource_ids, token):
+        conexao = self._conexao()
+        liberados = 0
+        conexao.execute(f"PRAGMA busy_timeout={int(self.espera_liberacao * 1000)}")
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            for resource_id in resource_ids:
+                liberados += conexao.execute(
+                    "DELETE FROM lock_recurso WHERE resource_id = ? AND dono = ?", (resource_id, token)
+                ).rowcount
+            conexao.execute("COMMIT")
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+        return liberados == len(resource_ids)
+
+
+BACKENDS = ('coordenador', 'memoria', 'sqlite')
+
+
+def criar_backend_lock(nome, ttl, espera_maxima, cliente_coordenador=None, caminho_sqlite=None):
+    """
+    Cria o backend de lock configurado (variável de ambiente LOCK_BACKEND).
+    """
+    if nome == 'coordenador':
+        return LockCoordenadorHTTP(cliente_coordenador, ttl)
+    if nome == 'memoria':
+        return LockMemoria(ttl, espera_maxima)
+    if nome == 'sqlite':
+        os.makedirs(os.path.dirname(caminho_sqlite) or '.', exist_ok=True)
+        return LockSQLite(caminho_sqlite, ttl, espera_maxima)
+    raise ValueError(f"LOCK_BACKEND inválido: {nome!r} (use um de {', '.join(BACKENDS)})")
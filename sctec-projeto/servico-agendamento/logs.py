@@ -0,0 +1,274 @@
+# Pipeline de logging assíncrono do Serviço de Agendamento.
+#
+# As rotas só colocam registros em filas em memória; uma thread escritora por
+# fila drena os registros em lotes, grava em disco (com rotação por tamanho) e
+# faz um único flush/fsync por lote. Os formatos são os do LOGGING.md.
+#
+# Com vários workers (gunicorn) cada processo tem as suas filas e escreve no
+# mesmo arquivo em modo append; a rotação é feita por um processo de cada vez
+# (lock de arquivo) e os demais reabrem o arquivo novo no lote seguinte.
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos (use um único processo)
+    fcntl = None
+
+FORMATO_APP = '%(levelname)s:%(asctime)s.%(msecs)03dZ:servico-agendamento:%(message)s'
+FORMATO_DATA = '%Y-%m-%dT%H:%M:%S'
+
+ARQUIVO_APP = os.environ.get('LOG_ARQUIVO_APP', 'app.log')
+ARQUIVO_AUDITORIA = os.environ.get('LOG_ARQUIVO_AUDITORIA', 'audit.log')
+MAX_BYTES_APP = int(os.environ.get('LOG_MAX_BYTES_APP', 10 * 1024 * 1024))
+BACKUPS_APP = int(os.environ.get('LOG_BACKUPS_APP', 5))
+MAX_BYTES_AUDITORIA = int(os.environ.get('LOG_MAX_BYTES_AUDITORIA', 50 * 1024 * 1024))
+BACKUPS_AUDITORIA = int(os.environ.get('LOG_BACKUPS_AUDITORIA', 100))
+
+# Logs de aplicação podem ser descartados se a fila encher; auditoria nunca.
+TAMANHO_FILA_APP = int(os.environ.get('LOG_TAMANHO_FILA_APP', 10000))
+TAMANHO_LOTE = 256
+INTERVALO_MAXIMO_LOTE = 0.2  # segundos
+
+_SENTINELA = object()
+
+
+class FormatadorAplicacao(logging.Formatter):
+    """
+    NIVEL:TIMESTAMP:SERVICO:MENSAGEM, com timestamp UTC em milissegundos.
+    """
+    converter = time.gmtime
+
+    def __init__(self):
+        super().__init__(FORMATO_APP, datefmt=FORMATO_DATA)
+
+
+class FormatadorAuditoria(logging.Formatter):
+    """
+    Serializa o evento de auditoria (um dict em record.msg) como uma linha JSON,
+    ou uma lista de eventos como várias linhas. A serialização acontece na
+    thread escritora, fora da requisição.
+    """
+
+    def format(self, record):
+        if isinstance(record.msg, dict):
+            return json.dumps(record.msg, ensure_ascii=False)
+        if isinstance(record.msg, list):
+            return "\n".join(json.dumps(evento, ensure_ascii=False) for evento in record.msg)
+        return super().format(record)
+
+
+class ArquivoRotativoEmLote(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler que não faz flush a cada registro. O tamanho do
+    arquivo é contado em memória (o tell() do arquivo forçaria um flush) e o
+    flush/fsync é feito uma vez por lote pelo EscritorEmLote.
+    """
+
+    def __init__(self, arquivo, max_bytes, backups, fsync=False):
+        super().__init__(arquivo, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        self.fsync = fsync
+        self._bytes = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+
+    def shouldRollover(self, record):
+        return self.maxBytes > 0 and self._bytes >= self.maxBytes
+
+    def doRollover(self):
+        if fcntl is None:
+            super().doRollover()
+            self._bytes = 0
+            return
+        with open(self.baseFilename + '.lock', 'a') as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            # Outro processo pode ter rotacionado enquanto esperávamos o lock
+            self.reabrir_se_rotacionado()
+            if self._bytes >= self.maxBytes:
+                super().doRollover()
+                self._bytes = 0
+
+    def reabrir_se_rotacionado(self):
+        """
+        Se outro processo rotacionou o arquivo (o inode mudou), passa a
+        escrever no arquivo novo. Chamado uma vez por lote.
+        """
+        if self.stream is None:
+            return
+        try:
+            atual = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            atual = None
+        aberto = os.fstat(self.stream.fileno())
+        if atual is None or atual.st_ino != aberto.st_ino:
+            self.stream.close()
+            self.stream = self._open()
+            aberto = os.fstat(self.stream.fileno())
+        # O tamanho inclui o que os outros processos escreveram
+        self._bytes = aberto.st_size
+
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            linha = self.format(record) + self.terminator
+            self.stream.write(linha)
+            self._bytes += len(linha.encode('utf-8'))
+        except Exception:
+            self.handleError(record)
+
+    def descarregar(self):
+        with self.lock:
+            if self.stream:
+                self.stream.flush()
+                if self.fsync:
+                    os.fsync(self.stream.fileno())
+
+
+class ManipuladorFila(logging.handlers.QueueHandler):
+    """
+    Enfileira o registro sem bloquear. Se a fila for limitada e estiver cheia,
+    o registro é descartado e contabilizado em 'descartados'.
+    """
+
+    def __init__(self, fila, preservar_msg=False):
+        super().__init__(fila)
+        self.preservar_msg = preservar_msg
+        self.descartados = 0
+
+    def prepare(self, record):
+        if self.preservar_msg:
+            # Auditoria: mantém o dict para ser serializado na thread escritora
+            return record
+        return super().prepare(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+class EscritorEmLote(threading.Thread):
+    """
+    Thread que drena uma fila de registros e os entrega aos handlers em lotes.
+    """
+
+    def __init__(self, nome, fila, handlers):
+        super().__init__(name=nome, daemon=True)
+        self.fila = fila
+        self.handlers = handlers
+
+    def run(self):
+        encerrar = False
+        while not encerrar:
+            registro = self.fila.get()
+            lote = []
+            if registro is _SENTINELA:
+                encerrar = True
+            else:
+                lote.append(registro)
+            limite = time.monotonic() + INTERVALO_MAXIMO_LOTE
+            while not encerrar and len(lote) < TAMANHO_LOTE and time.monotonic() < limite:
+                try:
+                    registro = self.fila.get_nowait()
+                except queue.Empty:
+                    break
+                if registro is _SENTINELA:
+                    encerrar = True
+                else:
+                    lote.append(registro)
+            self._escrever(lote)
+
+    def _escrever(self, lote):
+        for handler in self.handlers:
+            if isinstance(handler, ArquivoRotativoEmLote):
+                with handler.lock:
+                    handler.reabrir_se_rotacionado()
+        for registro in lote:
+            for handler in self.handlers:
+                if registro.levelno >= handler.level:
+                    handler.handle(registro)
+        for handler in self.handlers:
+            if isinstance(handler, ArquivoRotativoEmLote):
+                handler.descarregar()
+            else:
+                handler.flush()
+
+
+_escritores = []
+_manipuladores_fila = {}
+
+
+def configurar_logging():
+    """
+    Liga o logger raiz (logs de aplicação) e o logger 'audit' às filas e
+    inicia as threads escritoras. Retorna o logger de auditoria.
+    """
+    if _escritores:
+        return logging.getLogger('audit')
+
+    formatador_app = FormatadorAplicacao()
+    arquivo_app = ArquivoRotativoEmLote(ARQUIVO_APP, MAX_BYTES_APP, BACKUPS_APP)
+    arquivo_app.setFormatter(formatador_app)
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(formatador_app)
+
+    fila_app = queue.Queue(maxsize=TAMANHO_FILA_APP)
+    manipulador_app = ManipuladorFila(fila_app)
+    raiz = logging.getLogger()
+    raiz.setLevel(logging.INFO)
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(manipulador_app)
+
+    arquivo_auditoria = ArquivoRotativoEmLote(ARQUIVO_AUDITORIA, MAX_BYTES_AUDITORIA, BACKUPS_AUDITORIA, fsync=True)
+    arquivo_auditoria.setFormatter(FormatadorAuditoria())
+
+    # Fila sem limite: nenhum evento de auditoria (ex.: AGENDAMENTO_CRIADO) é descartado
+    fila_auditoria = queue.Queue()
+    manipulador_auditoria = ManipuladorFila(fila_auditoria, preservar_msg=True)
+    audit_logger = logging.getLogger('audit')
+    audit_logger.setLevel(logging.INFO)
+    audit_logger.addHandler(manipulador_auditoria)
+    audit_logger.propagate = False  # Evita que logs de auditoria apareçam no app.log
+
+    _manipuladores_fila['app'] = manipulador_app
+    _manipuladores_fila['audit'] = manipulador_auditoria
+    _escritores.append(EscritorEmLote('log-app', fila_app, [arquivo_app, console]))
+    _escritores.append(EscritorEmLote('log-auditoria', fila_auditoria, [arquivo_auditoria]))
+    for escritor in _escritores:
+        escritor.start()
+    atexit.register(encerrar_logging)
+    return audit_logger
+
+
+def encerrar_logging():
+    """
+    Drena as filas, grava tudo em disco e fecha os arquivos. Chamado no
+    desligamento do processo (atexit) e pode ser chamado explicitamente.
+    """
+    while _escritores:
+        escritor = _escritores.pop()
+        # put bloqueante: a sentinela precisa entrar mesmo com a fila cheia
+        escritor.fila.put(_SENTINELA)
+        escritor.join()
+        for handler in escritor.handlers:
+            handler.close()
+
+
+def estatisticas_logging():
+    """
+    Tamanho atual das filas e registros de aplicação descartados.
+    """
+    return {
+        nome: {"fila": m.queue.qsize(), "descartados": m.descartados}
+        for nome, m in _manipuladores_fila.items()
+    }
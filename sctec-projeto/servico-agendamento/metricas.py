@@ -0,0 +1,175 @@
+# Métricas em memória do Serviço de Agendamento, exportadas no formato texto
+# do Prometheus (GET /metrics).
+#
+# - Histogramas de duração por rota/método/status e por etapa do agendamento
+#   (lock, verificação de conflito, commit, auditoria, unlock).
+# - Contadores (ex.: 409 por lock ocupado x 409 por conflito no banco).
+#
+# Os valores são por processo: com vários workers cada um tem os seus.
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LIMITES_PADRAO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(nomes, valores, extra=None):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor):
+    if valor == int(valor):
+        return str(int(valor))
+    return repr(valor)
+
+
+class Histograma:
+    """
+    Histograma com limites fixos (em segundos), uma série por combinação de
+    rótulos.
+    """
+    tipo = 'histogram'
+
+    def __init__(self, nome, descricao, rotulos, limites=LIMITES_PADRAO):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.limites = tuple(limites)
+        self._series = {}  # valores dos rótulos -> [contagens por limite..., soma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores_rotulos):
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                serie = self._series[valores_rotulos] = [0] * (len(self.limites) + 2)
+            # Conta só no primeiro limite >= valor; a exportação acumula.
+            # Acima do último limite o valor entra apenas no total (+Inf)
+            posicao = bisect_left(self.limites, valor)
+            if posicao < len(self.limites):
+                serie[posicao] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def exportar(self):
+        with self._lock:
+            series = {rotulos: list(serie) for rotulos, serie in self._series.items()}
+        linhas = []
+        for valores, serie in sorted(series.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.limites, serie):
+                acumulado += contagem
+                le = 'le="%s"' % limite
+                linhas.append(f"{self.nome}_bucket{_rotulos(self.rotulos, valores, le)} {acumulado}")
+            le = 'le="+Inf"'
+            linhas.append(f"{self.nome}_bucket{_rotulos(self.rotulos, valores, le)} {serie[-1]}")
+            linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, valores)} {repr(serie[-2])}")
+            linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, valores)} {serie[-1]}")
+        return linhas
+
+
+class Contador:
+    """
+    Contador monotônico, uma série por combinação de rótulos.
+    """
+    tipo = 'counter'
+
+    def __init__(self, nome, descricao, rotulos):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *valores_rotulos, valor=1):
+        with self._lock:
+            self._series[valores_rotulos] = self._series.get(valores_rotulos, 0) + valor
+
+    def exportar(self):
+        with self._lock:
+            series = dict(self._series)
+        return [f"{self.nome}{_rotulos(self.rotulos, valores)} {_numero(total)}" for valores, total in sorted(series.items())]
+
+
+class RegistroMetricas:
+    """
+    Conjunto das métricas do processo. Coletores registrados com
+    adicionar_coletor() devolvem valores lidos na hora da exportação (ex.:
+    tamanho de fila, contadores mantidos por outros módulos).
+    """
+
+    def __init__(self):
+        self._metricas = []
+        self._coletores = []
+
+    def histograma(self, nome, descricao, rotulos=(), limites=LIMITES_PADRAO):
+        metrica = Histograma(nome, descricao, rotulos, limites)
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nome, descricao, rotulos=()):
+        metrica = Contador(nome, descricao, rotulos)
+        self._metricas.append(metrica)
+        return metrica
+
+    def adicionar_coletor(self, coletor):
+        """
+        'coletor' é uma função sem argumentos que retorna uma lista de
+        (nome, descricao, tipo, {rotulo: valor}, valor), com tipo 'gauge' ou
+        'counter'. Séries do mesmo nome devem vir em sequência.
+        """
+        self._coletores.append(coletor)
+
+    def exportar_prometheus(self):
+        linhas = []
+        for metrica in self._metricas:
+            linhas.append(f"# HELP {metrica.nome} {metrica.descricao}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(metrica.exportar())
+        vistos = set()
+        for coletor in self._coletores:
+            for nome, descricao, tipo, rotulos, valor in coletor():
+                if nome not in vistos:
+                    vistos.add(nome)
+                    linhas.append(f"# HELP {nome} {descricao}")
+                    linhas.append(f"# TYPE {nome} {tipo}")
+                linhas.append(f"{nome}{_rotulos(rotulos.keys(), rotulos.values())} {_numero(valor)}")
+        return "\n".join(linhas) + "\n"
+
+
+class PerfilRequisicao:
+    """
+    Durações das etapas de uma requisição, para o cabeçalho Server-Timing.
+    """
+
+    def __init__(self):
+        self.etapas = []
+
+    def registrar(self, etapa, segundos):
+        self.etapas.append((etapa, segundos))
+
+    def server_timing(self):
+        return ", ".join(f"{etapa};dur={segundos * 1000:.3f}" for etapa, segundos in self.etapas)
+
+
+@contextmanager
+def cronometro(histograma, *valores_rotulos, perfil=None, etapa=None):
+    """
+    Mede o bloco e registra a duração no histograma (e no perfil, se houver).
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        histograma.observar(duracao, *valores_rotulos)
+        if perfil is not None:
+            perfil.registrar(etapa, duracao)
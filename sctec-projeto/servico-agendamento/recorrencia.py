@@ -0,0 +1,83 @@
+# Séries de observação recorrentes ("toda noite 03:00-03:30 UTC por 30 noites").
+#
+# Uma série é guardada uma vez só: a primeira ocorrência, o período entre
+# ocorrências e quantas são. As ocorrências não são geradas de antemão; são
+# calculadas quando alguém pergunta por uma janela de tempo, e só as que caem
+# nela: a primeira sai de uma divisão, sem percorrer as anteriores. A
+# verificação de conflito de uma série nova cruza as suas ocorrências com a
+# agenda ocupada numa única varredura, as duas sequências em ordem de início.
+import heapq
+from datetime import timedelta
+
+# frequencia -> período de 'intervalo' = 1 (estilo RRULE: FREQ e INTERVAL)
+FREQUENCIAS = {'diaria': timedelta(days=1), 'semanal': timedelta(weeks=1)}
+
+
+class Recorrencia:
+    """
+    Ocorrências [inicio + k * periodo, fim + k * periodo) para k em
+    0..ocorrencias-1. Datetimes em UTC sem tzinfo.
+    """
+    __slots__ = ('inicio', 'duracao', 'periodo', 'ocorrencias')
+
+    def __init__(self, inicio, fim, periodo, ocorrencias):
+        self.inicio = inicio
+        self.duracao = fim - inicio
+        self.periodo = periodo
+        self.ocorrencias = ocorrencias
+
+    @classmethod
+    def por_regra(cls, inicio, fim, frequencia, intervalo, ocorrencias):
+        return cls(inicio, fim, FREQUENCIAS[frequencia] * intervalo, ocorrencias)
+
+    @property
+    def fim_total(self):
+        """
+        Fim da última ocorrência.
+        """
+        return self.inicio + (self.ocorrencias - 1) * self.periodo + self.duracao
+
+    def ocorrencia(self, k):
+        inicio = self.inicio + k * self.periodo
+        return inicio, inicio + self.duracao
+
+    def na_janela(self, inicio=None, fim=None):
+        """
+        Gera (k, inicio, fim) das ocorrências que se sobrepõem a [inicio, fim),
+        em ordem. Sem janela, todas.
+        """
+        primeira, ultima = 0, self.ocorrencias
+        if inicio is not None:
+            # A ocorrência k alcança 'inicio' se inicio_k + duracao > inicio
+            primeira = max(primeira, (inicio - self.inicio - self.duracao) // self.periodo + 1)
+        if fim is not None:
+            # ... e começa antes de 'fim' se inicio_k < fim
+            ultima = min(ultima, -((self.inicio - fim) // self.periodo))
+        for k in range(primeira, ultima):
+            ocorrencia_inicio = self.inicio + k * self.periodo
+            yield k, ocorrencia_inicio, ocorrencia_inicio + self.duracao
+
+
+def mesclar(*sequencias):
+    """
+    Une sequências já ordenadas por início (o primeiro elemento de cada tupla).
+    """
+    return heapq.merge(*sequencias, key=lambda intervalo: intervalo[0])
+
+
+def varrer_conflitos(novos, ocupados):
+    """
+    Cruza numa só passada os intervalos novos com os ocupados, as duas
+    sequências em ordem de início (e os novos sem sobreposição entre si).
+    Gera (novo, ocupado) para cada novo que se sobrepõe a algum ocupado.
+    """
+    ocupados = iter(ocupados)
+    proximo = next(ocupados, None)
+    maior = None  # entre os ocupados que começam antes do fim do novo, o que termina por último
+    for novo in novos:
+        while proximo is not None and proximo[0] < novo[1]:
+            if maior is None or proximo[1] > maior[1]:
+                maior = proximo
+            proximo = next(ocupados, None)
+        if maior is not None and maior[1] > novo[0]:
+            yield novo, maior
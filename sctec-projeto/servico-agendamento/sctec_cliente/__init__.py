@@ -0,0 +1,21 @@
+# Cliente Python do serviço de agendamento.
+#
+#   from sctec_cliente import ClienteAgendamento, ClienteAgendamentoAsync
+#
+#   with ClienteAgendamento("http://127.0.0.1:5000") as cliente:
+#       cliente.setup()
+#       novo = cliente.criar_agendamento({...})
+#       for agendamento in cliente.listar_agendamentos(cientista_id=7):
+#           ...
+#
+#   async with ClienteAgendamentoAsync(concorrencia=20, taxa_maxima=200) as cliente:
+#       async for indice, resultado in cliente.criar_agendamentos(payloads):
+#           ...
+#
+# Conexões keep-alive reaproveitadas, novas tentativas com espera
+# exponencial para 503, 409 de recurso em uso e tempo de resposta esgotado
+# (com Idempotency-Key nas criações e cancelamentos) e paginação pelo cursor.
+from .cliente import (
+    ClienteAgendamento, ConflitoAgendamento, ErroAPI, PoliticaRepeticao, ServicoIndisponivel
+)
+from .assincrono import ClienteAgendamentoAsync
@@ -0,0 +1,153 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .cliente import ClienteAgendamento, ErroAPI, _erro_da_resposta
+
+
+class ClienteAgendamentoAsync:
+    """
+    Cliente asyncio do serviço de agendamento. As requisições rodam num pool
+    de 'concorrencia' threads, cada uma com a sua conexão keep-alive; no
+    máximo 'concorrencia' ficam em andamento ao mesmo tempo e, com
+    'taxa_maxima', no máximo essa quantidade começa por segundo. As esperas
+    entre tentativas não ocupam thread.
+    """
+
+    def __init__(self, url_base="http://127.0.0.1:5000", concorrencia=10, taxa_maxima=None, **opcoes):
+        self._cliente = ClienteAgendamento(url_base, **opcoes)
+        self.politica = self._cliente.politica
+        self.concorrencia = concorrencia
+        self.taxa_maxima = taxa_maxima
+        self._executor = ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix='sctec-cliente')
+        # Criados no loop em execução (no Python 3.9 ficam presos ao loop da criação)
+        self._semaforo = None
+        self._trava_taxa = None
+        self._proximo_inicio = 0.0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *excecao):
+        await self.fechar()
+
+    async def fechar(self):
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+        self._cliente.fechar()
+
+    async def _aguardar_vez(self):
+        """
+        Espaça o início das requisições em 1/taxa_maxima segundos.
+        """
+        if not self.taxa_maxima:
+            return
+        if self._trava_taxa is None:
+            self._trava_taxa = asyncio.Lock()
+        async with self._trava_taxa:
+            agora = time.monotonic()
+            inicio = max(agora, self._proximo_inicio)
+            self._proximo_inicio = inicio + 1 / self.taxa_maxima
+        if inicio > agora:
+            await asyncio.sleep(inicio - agora)
+
+    async def _em_thread(self, funcao, *args):
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.concorrencia)
+        await self._aguardar_vez()
+        async with self._semaforo:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, funcao, *args)
+
+    async def _enviar(self, *args):
+        return await self._em_thread(self._cliente._enviar, *args)
+
+    async def requisicao(self, metodo, caminho, corpo=None, params=None, cabecalhos=None):
+        """
+        Como ClienteAgendamento.requisicao, com as esperas em asyncio.sleep.
+        """
+        tentativa = 0
+        while True:
+            tentativa += 1
+            status, dados, retry_after = await self._enviar(metodo, caminho, corpo, params, cabecalhos)
+            if status is not None and status < 400:
+                return dados
+            if not self.politica.repetir(tentativa, status, dados):
+                if status is None:
+                    raise dados
+                raise _erro_da_resposta(status, dados)
+            await asyncio.sleep(self.politica.espera(tentativa, retry_after))
+
+    # --- Endpoints ---
+
+    async def time(self):
+        return await self.requisicao('GET', '/time')
+
+    async def setup(self):
+        return await self.requisicao('POST', '/setup')
+
+    async def criar_agendamento(self, dados, chave_idempotencia=None):
+        return await self.requisicao(
+            'POST', '/agendamentos', dados, cabecalhos={"Idempotency-Key": chave_idempotencia or str(uuid.uuid4())}
+        )
+
+    async def criar_lote(self, agendamentos, modo='tudo_ou_nada'):
+        return await self._em_thread(self._cliente.criar_lote, agendamentos, modo)
+
+    async def obter_agendamento(self, agendamento_id):
+        return await self.requisicao('GET', f'/agendamentos/{agendamento_id}')
+
+    async def cancelar_agendamento(self, agendamento_id, chave_idempotencia=None):
+        return await self.requisicao(
+            'POST', f'/agendamentos/{agendamento_id}/cancelar',
+            cabecalhos={"Idempotency-Key": chave_idempotencia or str(uuid.uuid4())}
+        )
+
+    async def criar_serie(self, dados, chave_idempotencia=None):
+        return await self.requisicao(
+            'POST', '/series', dados, cabecalhos={"Idempotency-Key": chave_idempotencia or str(uuid.uuid4())}
+        )
+
+    async def obter_serie(self, serie_id):
+        return await self.requisicao('GET', f'/series/{serie_id}')
+
+    async def cancelar_serie(self, serie_id, chave_idempotencia=None):
+        return await self.requisicao(
+            'POST', f'/series/{serie_id}/cancelar',
+            cabecalhos={"Idempotency-Key": chave_idempotencia or str(uuid.uuid4())}
+        )
+
+    async def criar_agendamentos(self, agendamentos):
+        """
+        Cria vários agendamentos em paralelo (limitado por 'concorrencia' e
+        'taxa_maxima'). Gera (indice, resultado) na ordem em que terminam;
+        o resultado é o corpo do 201 ou a exceção da falha (ErroAPI,
+        requests.ConnectionError ou requests.Timeout).
+        """
+        async def criar(indice, dados):
+            try:
+                return indice, await self.criar_agendamento(dados)
+            except (ErroAPI, requests.ConnectionError, requests.Timeout) as e:
+                return indice, e
+
+        tarefas = [asyncio.ensure_future(criar(indice, dados)) for indice, dados in enumerate(agendamentos)]
+        try:
+            for proxima in asyncio.as_completed(tarefas):
+                yield await proxima
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+
+    async def listar_agendamentos(self, tamanho_pagina=500, **filtros):
+        """
+        Iterador assíncrono sobre GET /agendamentos, seguindo o cursor.
+        """
+        params = dict(filtros, limite=tamanho_pagina)
+        while True:
+            pagina = await self.requisicao('GET', '/agendamentos', params=params)
+            for agendamento in pagina["agendamentos"]:
+                yield agendamento
+            if not pagina.get("proximo_cursor"):
+                return
+            params["cursor"] = pagina["proximo_cursor"]
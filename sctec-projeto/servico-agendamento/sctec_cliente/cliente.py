@@ -0,0 +1,236 @@
+import random
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 409 que vale repetir: o lock do horário está com outra requisição. Os
+# demais 409 ("Horário não disponível") são definitivos.
+ERRO_RECURSO_EM_USO = "Recurso em uso"
+# Métodos que podem ser repetidos mesmo sem Idempotency-Key
+METODOS_SEGUROS = ('GET', 'HEAD')
+
+
+def _pode_repetir(metodo, cabecalhos):
+    """
+    Se a requisição pode ser enviada de novo depois de esgotar o tempo de
+    resposta (o servidor pode tê-la processado): leituras e requisições com
+    Idempotency-Key, que o serviço não executa duas vezes.
+    """
+    return metodo in METODOS_SEGUROS or bool(cabecalhos and cabecalhos.get("Idempotency-Key"))
+
+
+class ErroAPI(Exception):
+    """
+    Resposta de erro do serviço (status HTTP e corpo JSON, se houver).
+    """
+
+    def __init__(self, status, corpo=None):
+        self.status = status
+        self.corpo = corpo
+        mensagem = corpo.get('error') if isinstance(corpo, dict) else None
+        super().__init__(f"HTTP {status}: {mensagem or 'erro sem corpo JSON'}")
+
+
+class ConflitoAgendamento(ErroAPI):
+    """
+    409: horário já ocupado ou recurso em uso depois de todas as tentativas.
+    """
+
+
+class ServicoIndisponivel(ErroAPI):
+    """
+    503: coordenador fora do ar depois de todas as tentativas.
+    """
+
+
+def _erro_da_resposta(status, corpo):
+    if status == 409:
+        return ConflitoAgendamento(status, corpo)
+    if status == 503:
+        return ServicoIndisponivel(status, corpo)
+    return ErroAPI(status, corpo)
+
+
+class PoliticaRepeticao:
+    """
+    Quando e quanto esperar antes de repetir uma requisição: 503, falha de
+    conexão, tempo de resposta esgotado (ver _pode_repetir) e 409 de recurso
+    em uso, com espera exponencial e jitter (ou o Retry-After da resposta).
+    """
+
+    def __init__(self, max_tentativas=5, espera_inicial=0.1, espera_maxima=5.0):
+        self.max_tentativas = max_tentativas
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+
+    def repetir(self, tentativa, status, corpo):
+        if tentativa >= self.max_tentativas:
+            return False
+        if status is None or status == 503:
+            return True
+        return status == 409 and isinstance(corpo, dict) and corpo.get('error') == ERRO_RECURSO_EM_USO
+
+    def espera(self, tentativa, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.espera_maxima)
+        teto = min(self.espera_maxima, self.espera_inicial * 2 ** (tentativa - 1))
+        return random.uniform(teto / 2, teto)
+
+
+class ClienteAgendamento:
+    """
+    Cliente síncrono do serviço de agendamento. Cada thread usa a sua
+    sessão do requests (conexões keep-alive reaproveitadas), então a mesma
+    instância pode ser usada por várias threads.
+    """
+
+    def __init__(self, url_base="http://127.0.0.1:5000", max_tentativas=5, espera_inicial=0.1,
+                 espera_maxima=5.0, timeout=30):
+        self.url_base = url_base.rstrip('/')
+        self.politica = PoliticaRepeticao(max_tentativas, espera_inicial, espera_maxima)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._sessoes = []
+        self._trava_sessoes = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+    def fechar(self):
+        with self._trava_sessoes:
+            for sessao in self._sessoes:
+                sessao.close()
+            self._sessoes.clear()
+        self._local = threading.local()
+
+    def _sessao(self):
+        sessao = getattr(self._local, 'sessao', None)
+        if sessao is None:
+            sessao = self._local.sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            sessao.mount('http://', adaptador)
+            sessao.mount('https://', adaptador)
+            with self._trava_sessoes:
+                self._sessoes.append(sessao)
+        return sessao
+
+    def _enviar(self, metodo, caminho, corpo=None, params=None, cabecalhos=None):
+        """
+        Uma tentativa. Retorna (status, corpo, retry_after). Quando a conexão
+        falhou ou, numa requisição que pode ser repetida, o tempo de resposta
+        esgotou, o status é None e o corpo é a exceção.
+        """
+        try:
+            resposta = self._sessao().request(
+                metodo, self.url_base + caminho, json=corpo, params=params, headers=cabecalhos, timeout=self.timeout
+            )
+        except requests.ConnectionError as e:
+            return None, e, None
+        except requests.Timeout as e:
+            if not _pode_repetir(metodo, cabecalhos):
+                raise
+            return None, e, None
+        dados = None
+        if resposta.headers.get('Content-Type', '').startswith('application/json'):
+            dados = resposta.json()
+        retry_after = resposta.headers.get('Retry-After')
+        return resposta.status_code, dados, float(retry_after) if retry_after and retry_after.isdigit() else None
+
+    def requisicao(self, metodo, caminho, corpo=None, params=None, cabecalhos=None):
+        """
+        Envia a requisição, repetindo conforme a política (com os mesmos
+        cabeçalhos, inclusive a Idempotency-Key). Retorna o corpo JSON de uma
+        resposta 2xx; levanta ErroAPI, ou requests.ConnectionError /
+        requests.Timeout depois da última tentativa.
+        """
+        tentativa = 0
+        while True:
+            tentativa += 1
+            status, dados, retry_after = self._enviar(metodo, caminho, corpo, params, cabecalhos)
+            if status is not None and status < 400:
+                return dados
+            if not self.politica.repetir(tentativa, status, dados):
+                if status is None:
+                    raise dados
+                raise _erro_da_resposta(status, dados)
+            time.sleep(self.politica.espera(tentativa, retry_after))
+
+    # --- Endpoints ---
+
+    def time(self):
+        return self.requisicao('GET', '/time')
+
+    def setup(self):
+        return self.requisicao('POST', '/setup')
+
+    def criar_agendamento(self, dados, chave_idempotencia=None):
+        """
+        POST /agendamentos. A Idempotency-Key (gerada se não for informada)
+        torna as novas tentativas seguras: o serviço não cria duas vezes.
+        """
+        return self.requisicao(
+            'POST', '/agendamentos', dados, cabecalhos={"Idempotency-Key": chave_idempotencia or str(uuid.uuid4())}
+        )
+
+    def criar_lote(self, agendamentos, modo='tudo_ou_nada'):
+        """
+        POST /agendamentos/lote. Retorna o corpo da resposta também quando
+        há conflitos (207/409), com o resultado de cada item.
+        """
+        status, dados, _ = self._enviar('POST', '/agendamentos/lote', {"agendamentos": agendamentos, "modo": modo})
+        if status is None:
+            raise dados
+        if status in (201, 207, 409) and isinstance(dados, dict) and 'resultados' in dados:
+            return dados
+        raise _erro_da_resposta(status, dados)
+
+    def obter_agendamento(self, agendamento_id):
+        return self.requisicao('GET', f'/agendamentos/{agendamento_id}')
+
+    def cancelar_agendamento(self, agendamento_id, chave_idempotencia=None):
+        return self.requisicao(
+            'POST', f'/agendamentos/{agendamento_id}/cancelar',
+            cabecalhos={"Idempotency-Key": chave_idempotencia or str(uuid.uuid4())}
+        )
+
+    def criar_serie(self, dados, chave_idempotencia=None):
+        """
+        POST /series. Um 409 (ConflitoAgendamento) traz em corpo['conflitos']
+        as ocorrências que colidiram.
+        """
+        return self.requisicao(
+            'POST', '/series', dados, cabecalhos={"Idempotency-Key": chave_idempotencia or str(uuid.uuid4())}
+        )
+
+    def obter_serie(self, serie_id):
+        return self.requisicao('GET', f'/series/{serie_id}')
+
+    def ocorrencias_da_serie(self, serie_id, inicio=None, fim=None):
+        params = {chave: valor for chave, valor in (('inicio', inicio), ('fim', fim)) if valor}
+        return self.requisicao('GET', f'/series/{serie_id}/ocorrencias', params=params)
+
+    def cancelar_serie(self, serie_id, chave_idempotencia=None):
+        return self.requisicao(
+            'POST', f'/series/{serie_id}/cancelar',
+            cabecalhos={"Idempotency-Key": chave_idempotencia or str(uuid.uuid4())}
+        )
+
+    def listar_agendamentos(self, tamanho_pagina=500, **filtros):
+        """
+        Gera os agendamentos de GET /agendamentos, página a página pelo
+        cursor. Os filtros são os da query string (status, inicio, fim,
+        cientista_id, telescopio_id, objeto_observacao, fields, links).
+        """
+        params = dict(filtros, limite=tamanho_pagina)
+        while True:
+            pagina = self.requisicao('GET', '/agendamentos', params=params)
+            yield from pagina["agendamentos"]
+            if not pagina.get("proximo_cursor"):
+                return
+            params["cursor"] = pagina["proximo_cursor"]
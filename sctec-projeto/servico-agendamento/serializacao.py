@@ -0,0 +1,260 @@
+# Serialização das respostas JSON.
+#
+# - Serializador: converte um objeto (modelo ou linha de consulta) num dict
+#   com os campos pedidos. Para cada combinação de campos (?fields=) e links
+#   (?links=false) o plano é montado uma vez e reaproveitado: um attrgetter
+#   para todos os campos, as posições das datas e a função de _links.
+# - formatar_utc: datetime -> "AAAA-MM-DDTHH:MM:SS[.ffffff]Z".
+# - ProvedorJSON: provedor de JSON do Flask (jsonify, request.get_json) que
+#   usa o orjson quando ele está instalado e o json da biblioteca padrão
+#   quando não está (JSON_BACKEND=json força o segundo). O orjson é
+#   opcional (fora do requirements.txt): pip install orjson.
+import json
+import os
+import threading
+from datetime import timezone
+from operator import attrgetter
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND_JSON = 'orjson' if orjson is not None and os.environ.get('JSON_BACKEND', 'orjson') != 'json' else 'json'
+
+
+def formatar_utc(dt):
+    """
+    ISO 8601 em UTC com sufixo Z. Datetimes sem tzinfo (como o SQLite
+    devolve) já estão em UTC.
+    """
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.isoformat() + 'Z'
+
+
+def ler_campos(valor):
+    """
+    Lista de ?fields= ("a,b,c") como tupla, ou None se não foi informada.
+    """
+    if valor is None:
+        return None
+    campos = tuple(campo.strip() for campo in valor.split(',') if campo.strip())
+    if not campos:
+        raise ValueError("O parâmetro 'fields' deve listar pelo menos um campo")
+    return campos
+
+
+def ler_links(valor):
+    """
+    ?links=false desliga os _links de cada item (padrão: ligados).
+    """
+    if valor is None:
+        return True
+    if valor.lower() in ('true', '1'):
+        return True
+    if valor.lower() in ('false', '0'):
+        return False
+    raise ValueError("O parâmetro 'links' deve ser true ou false")
+
+
+class Serializador:
+    """
+    Campos serializáveis de uma entidade. 'datas' são formatados com
+    formatar_utc; 'links' recebe o objeto e devolve o dict de _links.
+
+    Os planos compilados ficam guardados pela combinação canônica de campos
+    (sem repetição, na ordem declarada), até MAXIMO_PLANOS por serializador:
+    variações do mesmo ?fields= não criam planos novos, e além do limite o
+    plano é montado a cada uso, sem crescer a memória do processo.
+    """
+    MAXIMO_PLANOS = 256
+
+    def __init__(self, campos, padrao, datas, links):
+        self.campos = tuple(campos)
+        self.padrao = tuple(padrao)
+        self.datas = frozenset(datas)
+        self.links = links
+        self._planos = {}
+        self._lock = threading.Lock()
+
+    def validar(self, campos):
+        """
+        Levanta ValueError se algum campo pedido não existir.
+        """
+        desconhecidos = [c for c in campos if c not in self.campos]
+        if desconhecidos:
+            raise ValueError(f"Campos desconhecidos em 'fields': {', '.join(desconhecidos)}. Disponíveis: {', '.join(self.campos)}")
+
+    def canonicos(self, campos):
+        """
+        Campos pedidos sem repetição e na ordem declarada. Levanta ValueError
+        se algum não existir.
+        """
+        self.validar(campos)
+        pedidos = frozenset(campos)
+        return tuple(campo for campo in self.campos if campo in pedidos)
+
+    def compilar(self, campos=None, links=True):
+        """
+        Função objeto -> dict para os campos pedidos (ou os padrão).
+        """
+        campos = self.canonicos(campos) if campos else self.padrao
+        chave = (campos, links)
+        plano = self._planos.get(chave)
+        if plano is None:
+            plano = self._montar(campos, links)
+            with self._lock:
+                if len(self._planos) < self.MAXIMO_PLANOS:
+                    self._planos[chave] = plano
+        return plano
+
+    def _montar(self, campos, links):
+        extrair = attrgetter(*campos)
+        if len(campos) == 1:
+            unico = extrair
+            extrair = lambda obj: (unico(obj),)
+        posicoes_datas = [i for i, campo in enumerate(campos) if campo in self.datas]
+        gerar_links = self.links if links else None
+
+        def serializar(obj):
+            valores = extrair(obj)
+            if posicoes_datas:
+                valores = list(valores)
+                for i in posicoes_datas:
+                    if valores[i] is not None:
+                        valores[i] = formatar_utc(valores[i])
+            dados = dict(zip(campos, valores))
+            if gerar_links is not None:
+                dados["_links"] = gerar_links(obj)
+            return dados
+        return serializar
+
+
+def _links_agendamento(ag):
+    links = {
+        "self": {"href": f"/agendamentos/{ag.id}"},
+        "cientista": {"href": f"/cientistas/{ag.cientista_id}"},
+        "telescopio": {"href": f"/telescopios/{ag.telescopio_id}"},
+    }
+    if ag.status == 'confirmado':
+        links["cancelar"] = {
+            "href": f"/agendamentos/{ag.id}/cancelar",
+            "method": "POST",
+            "description": "Cancelar este agendamento"
+        }
+    return links
+
+
+def _links_cientista(c):
+    return {
+        "self": {"href": f"/cientistas/{c.id}"},
+        "agendamentos": {
+            "href": f"/agendamentos?cientista_id={c.id}",
+            "method": "GET",
+            "description": "Ver os agendamentos deste cientista"
+        }
+    }
+
+
+SERIALIZADOR_AGENDAMENTO = Serializador(
+    campos=('id', 'cientista_id', 'telescopio_id', 'horario_inicio_utc', 'horario_fim_utc', 'status',
+            'objeto_observacao', 'descricao', 'data_criacao', 'data_atualizacao'),
+    padrao=('id', 'cientista_id', 'telescopio_id', 'horario_inicio_utc', 'status', 'objeto_observacao'),
+    datas=('horario_inicio_utc', 'horario_fim_utc', 'data_criacao', 'data_atualizacao'),
+    links=_links_agendamento,
+)
+# Colunas que os _links do agendamento leem
+CAMPOS_LINKS_AGENDAMENTO = ('id', 'cientista_id', 'telescopio_id', 'status')
+
+def _links_telescopio(t):
+    return {
+        "self": {"href": f"/telescopios/{t.id}"},
+        "agendamentos": {
+            "href": f"/agendamentos?telescopio_id={t.id}",
+            "method": "GET",
+            "description": "Ver os agendamentos deste telescópio"
+        },
+        "disponibilidade": {"href": f"/disponibilidade?telescopio_id={t.id}", "method": "GET"}
+    }
+
+
+SERIALIZADOR_CIENTISTA = Serializador(
+    campos=('id', 'nome', 'email', 'instituicao', 'pais', 'data_cadastro'),
+    padrao=('id', 'nome', 'email', 'instituicao', 'pais', 'data_cadastro'),
+    datas=('data_cadastro',),
+    links=_links_cientista,
+)
+
+SERIALIZADOR_TELESCOPIO = Serializador(
+    campos=('id', 'nome', 'codigo', 'data_cadastro'),
+    padrao=('id', 'nome', 'codigo', 'data_cadastro'),
+    datas=('data_cadastro',),
+    links=_links_telescopio,
+)
+
+
+def _links_serie(serie):
+    links = {
+        "self": {"href": f"/series/{serie.id}"},
+        "ocorrencias": {"href": f"/series/{serie.id}/ocorrencias", "method": "GET"},
+        "cientista": {"href": f"/cientistas/{serie.cientista_id}"},
+        "telescopio": {"href": f"/telescopios/{serie.telescopio_id}"},
+    }
+    if serie.status == 'confirmado':
+        links["cancelar"] = {
+            "href": f"/series/{serie.id}/cancelar",
+            "method": "POST",
+            "description": "Cancelar todas as ocorrências desta série"
+        }
+    return links
+
+
+SERIALIZADOR_SERIE = Serializador(
+    campos=('id', 'cientista_id', 'telescopio_id', 'horario_inicio_utc', 'horario_fim_utc', 'frequencia', 'intervalo',
+            'ocorrencias', 'horario_fim_serie_utc', 'status', 'objeto_observacao', 'descricao', 'data_criacao',
+            'data_atualizacao'),
+    padrao=('id', 'cientista_id', 'telescopio_id', 'horario_inicio_utc', 'horario_fim_utc', 'frequencia', 'intervalo',
+            'ocorrencias', 'horario_fim_serie_utc', 'status', 'objeto_observacao'),
+    datas=('horario_inicio_utc', 'horario_fim_utc', 'horario_fim_serie_utc', 'data_criacao', 'data_atualizacao'),
+    links=_links_serie,
+)
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """
+    JSON compacto, em UTF-8 e com as chaves na ordem em que foram montadas.
+    """
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        if BACKEND_JSON == 'orjson' and not kwargs.get('indent'):
+            return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if BACKEND_JSON == 'orjson':
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if BACKEND_JSON == 'orjson' and not self._app.debug:
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(
+                orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE),
+                mimetype=self.mimetype
+            )
+        return super().response(*args, **kwargs)
+
+
+def serializar_json(obj):
+    """
+    Corpo JSON em bytes (para respostas montadas fora do jsonify, como o
+    cache do GET /agendamentos e o NDJSON).
+    """
+    if BACKEND_JSON == 'orjson':
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
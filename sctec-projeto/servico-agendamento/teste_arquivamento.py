@@ -0,0 +1,66 @@
+import requests
+
+from sctec_cliente import ClienteAgendamento, ErroAPI
+
+# --- IMPORTANTE ---
+# Defina a URL base do seu servidor Flask
+# Se estiver no Codespaces, use a URL da porta 5000
+# Ex: "https://seu-workspace-url.app.github.dev"
+BASE_URL = "http://127.0.0.1:5000"
+
+
+def executar_teste_completo():
+    """
+    Verifica que o id de um agendamento arquivado não é reaproveitado:
+    1. Cria um agendamento no passado (o de maior id).
+    2. Arquiva com horizonte de 0 dias, o que o move para o arquivo.
+    3. Cria um agendamento novo e confere que o id dele é maior.
+    """
+    with ClienteAgendamento(BASE_URL, max_tentativas=1) as cliente:
+        try:
+            cliente.setup()
+        except requests.exceptions.ConnectionError:
+            print(f"ERRO DE CONEXÃO: Não foi possível conectar ao Flask em {BASE_URL}.")
+            return False
+
+        print("--- PASSO 1: Criando um agendamento já terminado ---")
+        try:
+            antigo = cliente.criar_agendamento({
+                "cientista_id": 1,
+                "horario_inicio_utc": "2020-01-01T03:00:00Z",
+                "horario_fim_utc": "2020-01-01T03:30:00Z",
+                "descricao": "Teste de arquivamento"
+            })
+        except ErroAPI as e:
+            # Com um período já arquivado o serviço recusa agendamentos nele
+            print(f"FALHA ({e.status}): {e.corpo}. (Você limpou o database.db antes de rodar?)")
+            return False
+        print(f"  -> ID {antigo['id']}")
+
+        print("\n--- PASSO 2: Arquivando (POST /arquivamento, horizonte_dias=0) ---")
+        resultado = cliente.requisicao('POST', '/arquivamento', {"horizonte_dias": 0})
+        print(f"  -> {resultado['arquivados']} agendamento(s) arquivado(s)")
+
+        print("\n--- PASSO 3: Criando um agendamento novo ---")
+        novo = cliente.criar_agendamento({
+            "cientista_id": 1,
+            "horario_inicio_utc": "2099-01-01T03:00:00Z",
+            "horario_fim_utc": "2099-01-01T03:30:00Z",
+            "descricao": "Teste de arquivamento"
+        })
+        print(f"  -> ID {novo['id']}")
+
+    if novo['id'] <= antigo['id']:
+        print(f"\nFALHA: o id {novo['id']} foi reaproveitado (arquivado: {antigo['id']})")
+        return False
+    print(f"\nOK: o id novo ({novo['id']}) é maior que o do arquivado ({antigo['id']})")
+    return True
+
+if __name__ == "__main__":
+    print("Iniciando teste...")
+    print("ATENÇÃO: o arquivamento com horizonte de 0 dias move para o arquivo todos os agendamentos já terminados.")
+    print("Use um banco de teste (delete o arquivo 'database.db' antes de começar).")
+    input("Pressione Enter para começar o teste...")
+
+    if not executar_teste_completo():
+        raise SystemExit(1)
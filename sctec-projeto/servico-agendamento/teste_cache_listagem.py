@@ -0,0 +1,84 @@
+# Verifica que o cache do GET /agendamentos (ETag/304) enxerga o que outros
+# processos gravam no banco, inclusive agendamentos criados e cancelados
+# entre duas sincronizações do índice (chegam aqui já cancelados).
+#
+# Roda o app neste processo (test client do Flask) num banco temporário; o
+# "outro worker" é simulado com escritas diretas no SQLite.
+#
+#   python teste_cache_listagem.py
+import os
+import sqlite3
+import sys
+import tempfile
+
+URL_CANCELADOS = '/agendamentos?status=cancelado&inicio=2040-01-01T00:00:00Z'
+
+
+def preparar_app():
+    pasta = tempfile.mkdtemp(prefix='teste_cache_')
+    os.environ['LOCK_BACKEND'] = 'memoria'
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(pasta, 'database.db')}"
+    os.environ['LOG_ARQUIVO_APP'] = os.path.join(pasta, 'app.log')
+    os.environ['LOG_ARQUIVO_AUDITORIA'] = os.path.join(pasta, 'audit.log')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import logging
+    import app as modulo_app
+    logging.getLogger().setLevel(logging.ERROR)
+    with modulo_app.app.app_context():
+        modulo_app.inicializar_schema()
+    return modulo_app.app, os.path.join(pasta, 'database.db')
+
+
+def inserir_como_outro_worker(caminho_banco, status, horario):
+    """
+    Grava um agendamento direto no SQLite, como faria outro processo.
+    """
+    conexao = sqlite3.connect(caminho_banco)
+    with conexao:
+        cursor = conexao.execute(
+            "INSERT INTO agendamento (cientista_id, telescopio_id, horario_inicio_utc, horario_fim_utc, status, "
+            "data_criacao, data_atualizacao) VALUES (1, 1, ?, ?, ?, datetime('now'), datetime('now'))",
+            (f"2040-01-01 {horario}:00.000000", f"2040-01-01 {horario}:30.000000", status)
+        )
+    conexao.close()
+    return cursor.lastrowid
+
+
+def _ids(resposta):
+    """
+    Ids da página; vazio num 304 (sem corpo).
+    """
+    if resposta.status_code != 200:
+        return []
+    return [agendamento['id'] for agendamento in resposta.get_json()['agendamentos']]
+
+
+def executar_teste_completo():
+    app, caminho_banco = preparar_app()
+    cliente = app.test_client()
+    cliente.post('/setup')
+    falhas = 0
+
+    def conferir(descricao, condicao):
+        nonlocal falhas
+        print(f"  -> {'OK' if condicao else 'FALHA'}: {descricao}")
+        falhas += not condicao
+
+    print("--- PASSO 1: Listagem inicial (guarda o ETag) ---")
+    resposta = cliente.get(URL_CANCELADOS)
+    etag = resposta.headers['ETag']
+    conferir("nenhum cancelado", resposta.get_json()['total'] == 0)
+
+    print("\n--- PASSO 2: Outro worker cria e cancela um agendamento ---")
+    ag_id = inserir_como_outro_worker(caminho_banco, 'cancelado', '03:00')
+    resposta = cliente.get(URL_CANCELADOS, headers={'If-None-Match': etag})
+    conferir("a revalidação devolve 200 (não 304)", resposta.status_code == 200)
+    conferir(f"a página traz o agendamento {ag_id}", _ids(resposta) == [ag_id])
+    conferir("o ETag mudou", resposta.headers.get('ETag') != etag)
+
+    print(f"\n--- TESTE CONCLUÍDO: {falhas} falha(s) ---")
+    return falhas == 0
+
+if __name__ == "__main__":
+    if not executar_teste_completo():
+        raise SystemExit(1)
@@ -1,9 +1,13 @@
-import requests
-import threading
+import asyncio
 import time
 
+import requests
+
+from sctec_cliente import ClienteAgendamentoAsync, ErroAPI
+
 # A URL do Serviço de Agendamento (Flask) [cite: 328]
-URL_AGENDAMENTO = "http://127.0.0.1:5000/agendamentos"
+URL_BASE = "http://127.0.0.1:5000"
+URL_AGENDAMENTO = f"{URL_BASE}/agendamentos"
 
 # Número de requisições simultâneas [cite: 330]
 NUMERO_DE_REQUISICOES = 10
@@ -18,46 +22,36 @@ PAYLOAD_CONFLITANTE = {
   "descricao": "Teste de condição de corrida"
 }
 
-# Lista para armazenar os códigos de status
-resultados = []
-
-def fazer_requisicao_agendamento(thread_num):
+async def disparar_requisicoes():
     """
-    Função que será executada por cada thread.
-    Envia uma única requisição POST.
+    Envia as NUMERO_DE_REQUISICOES criações ao mesmo tempo (uma conexão por
+    requisição em andamento) e retorna os códigos de status.
+    Sem novas tentativas: o teste mede justamente a disputa pelo horário.
     """
-    print(f"[Thread {thread_num}]: Iniciando requisição...")
-    try:
-        response = requests.post(URL_AGENDAMENTO, json=PAYLOAD_CONFLITANTE)
-        
-        print(f"[Thread {thread_num}]: Resposta recebida! "
-              f"Status Code: {response.status_code}, "
-              f"Body: {response.text[:100]}...") # [cite: 344-346]
-        
-        resultados.append(response.status_code)
-
-    except requests.exceptions.ConnectionError as e:
-        print(f"[Thread {thread_num}]: Erro de conexão. O servidor Flask está rodando? Erro: {e}")
-        resultados.append(None)
-    except Exception as e:
-        print(f"[Thread {thread_num}]: Erro inesperado: {e}")
-        resultados.append(None)
+    resultados = []
+    async with ClienteAgendamentoAsync(URL_BASE, concorrencia=NUMERO_DE_REQUISICOES, max_tentativas=1) as cliente:
+        async for indice, resultado in cliente.criar_agendamentos([PAYLOAD_CONFLITANTE] * NUMERO_DE_REQUISICOES):
+            if isinstance(resultado, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+                print(f"[Requisição {indice + 1}]: Erro de conexão. O servidor Flask está rodando? Erro: {resultado}")
+                resultados.append(None)
+            elif isinstance(resultado, ErroAPI):
+                print(f"[Requisição {indice + 1}]: Resposta recebida! "
+                      f"Status Code: {resultado.status}, "
+                      f"Body: {str(resultado.corpo)[:100]}...") # [cite: 344-346]
+                resultados.append(resultado.status)
+            else:
+                print(f"[Requisição {indice + 1}]: Resposta recebida! "
+                      f"Status Code: 201, "
+                      f"Body: {str(resultado)[:100]}...")
+                resultados.append(201)
+    return resultados
 
 if __name__ == "__main__":
     print(f"Disparando {NUMERO_DE_REQUISICOES} requisições simultâneas para {URL_AGENDAMENTO}")
     print(f"Payload: {PAYLOAD_CONFLITANTE}\n")
     
-    threads = []
     start_time = time.time()
-
-    for i in range(NUMERO_DE_REQUISICOES):
-        t = threading.Thread(target=fazer_requisicao_agendamento, args=(i+1,))
-        threads.append(t)
-        t.start() # [cite: 360]
-
-    for t in threads:
-        t.join() # [cite: 362]
-
+    resultados = asyncio.run(disparar_requisicoes())
     end_time = time.time()
     
     print("\n--- TESTE CONCLUÍDO ---")
@@ -2,11 +2,17 @@ const express = require('express');
 const app = express();
 const port = 3000; // Conforme API.md
 
-app.use(express.json()); // Middleware para parsear JSON
+app.use(express.json({ limit: '5mb' })); // Middleware para parsear JSON (lotes trazem muitas chaves)
 
 // Estrutura de dados em memória para manter os locks (conforme MODELOS.md)
 const locks = {};
 
+// Todo lock é uma concessão (lease) com TTL: se o dono não chamar /unlock
+// (ex.: o Flask caiu no meio do agendamento), o lock expira sozinho.
+const TTL_PADRAO_MS = parseInt(process.env.LOCK_TTL_MS || '30000', 10);
+const TTL_MAXIMO_MS = 10 * 60 * 1000;
+const INTERVALO_LIMPEZA_MS = 1000;
+
 /**
  * Função de logging estruturado (baseado no seu LOGGING.md)
  */
@@ -16,42 +22,70 @@ function log(level, message) {
     console.log(`${level}:${timestamp}:servico-coordenador:${message}`);
 }
 
+/**
+ * Lê a lista de recursos do corpo: "resource_ids" (vários, adquiridos de uma
+ * vez) ou "resource_id" (um só, formato original). Retorna null se inválido.
+ */
+function lerRecursos(body) {
+    if (Array.isArray(body.resource_ids)) {
+        if (body.resource_ids.length === 0 || !body.resource_ids.every(id => typeof id === 'string' && id)) {
+            return null;
+        }
+        // Ordem determinística e sem repetições
+        return [...new Set(body.resource_ids)].sort();
+    }
+    return body.resource_id ? [body.resource_id] : null;
+}
+
 /**
  * Endpoint para adquirir um lock
- * 
+ * Com "resource_ids" a aquisição é tudo-ou-nada: ou todos os recursos são
+ * travados nesta chamada, ou nenhum é.
  */
 app.post('/lock', (req, res) => {
-    const { resource_id } = req.body;
+    const recursos = lerRecursos(req.body);
 
-    if (!resource_id) {
+    if (!recursos) {
         return res.status(400).json({ success: false, error: "resource_id é obrigatório" });
     }
+    const descricao = recursos.join(', ');
+
+    log('INFO', `Recebido pedido de lock para recurso ${descricao}`); // [cite: 275]
 
-    log('INFO', `Recebido pedido de lock para recurso ${resource_id}`); // [cite: 275]
+    // Lock expirado conta como livre
+    const agora = Date.now();
+    recursos.forEach(resource_id => expirarSeVencido(resource_id, agora));
 
-    // Verifica se o recurso já está travado
-    if (locks[resource_id]) {
-        log('WARNING', `Recurso ${resource_id} já em uso, negando lock`); // [cite: 276]
+    // Verifica se algum dos recursos já está travado
+    const ocupados = recursos.filter(resource_id => locks[resource_id]);
+    if (ocupados.length > 0) {
+        log('WARNING', `Recurso ${ocupados.join(', ')} já em uso, negando lock`); // [cite: 276]
         // Resposta 409 Conflict (conforme API.md)
         return res.status(409).json({
             success: false,
-            resource_id: resource_id,
+            resource_id: ocupados[0],
+            resource_ids: ocupados,
             message: "Recurso já está em uso",
-            locked_since: locks[resource_id].locked_at
+            locked_since: locks[ocupados[0]].locked_at
         });
     }
 
-    // Adquire o lock
-    const locked_at = new Date().toISOString();
-    locks[resource_id] = { locked: true, locked_at: locked_at };
+    // Adquire o lock de todos os recursos
+    const ttl_ms = Math.min(parseInt(req.body.ttl_ms, 10) || TTL_PADRAO_MS, TTL_MAXIMO_MS);
+    const locked_at = new Date(agora).toISOString();
+    recursos.forEach(resource_id => {
+        locks[resource_id] = { locked: true, locked_at: locked_at, expires_at: agora + ttl_ms, owner: req.body.owner || null };
+    });
 
-    log('INFO', `Lock concedido para recurso ${resource_id}`); // [cite: 275]
+    log('INFO', `Lock concedido para recurso ${descricao}`); // [cite: 275]
     
     // Resposta 200 OK (conforme API.md)
     res.status(200).json({
         success: true,
-        resource_id: resource_id,
+        resource_id: recursos[0],
+        resource_ids: recursos,
         locked_at: locked_at,
+        expires_at: new Date(agora + ttl_ms).toISOString(),
         message: "Lock adquirido com sucesso"
     });
 });
@@ -61,32 +95,75 @@ app.post('/lock', (req, res) => {
  * 
  */
 app.post('/unlock', (req, res) => {
-    const { resource_id } = req.body;
+    const recursos = lerRecursos(req.body);
 
-    if (!resource_id) {
+    if (!recursos) {
         return res.status(400).json({ success: false, error: "resource_id é obrigatório" });
     }
+    const descricao = recursos.join(', ');
+
+    log('INFO', `Recebido pedido de unlock para recurso ${descricao}`);
+
+    const agora = Date.now();
+    recursos.forEach(resource_id => expirarSeVencido(resource_id, agora));
 
-    log('INFO', `Recebido pedido de unlock para recurso ${resource_id}`);
+    // Só o dono pode liberar (evita liberar o lock de outro depois de expirar o seu)
+    const { owner } = req.body;
+    const deOutroDono = recursos.filter(resource_id =>
+        locks[resource_id] && owner && locks[resource_id].owner && locks[resource_id].owner !== owner);
+    const liberados = recursos.filter(resource_id => locks[resource_id] && !deOutroDono.includes(resource_id));
+    const naoEncontrados = recursos.filter(resource_id => !locks[resource_id]);
 
-    if (locks[resource_id]) {
-        delete locks[resource_id]; // Libera o lock
-        log('INFO', `Lock liberado para recurso ${resource_id}`); // [cite: 276]
+    if (deOutroDono.length > 0) {
+        log('WARNING', `Pedido de unlock para recurso ${deOutroDono.join(', ')} de quem não é o dono, negando`);
+    }
+    liberados.forEach(resource_id => delete locks[resource_id]); // Libera o lock
+
+    if (liberados.length > 0) {
+        log('INFO', `Lock liberado para recurso ${liberados.join(', ')}`); // [cite: 276]
         return res.status(200).json({
-            success: true,
-            resource_id: resource_id,
+            success: deOutroDono.length === 0 && naoEncontrados.length === 0,
+            resource_id: liberados[0],
+            resource_ids: liberados,
+            nao_encontrados: naoEncontrados,
+            de_outro_dono: deOutroDono,
             message: "Lock liberado com sucesso"
         });
+    } else if (deOutroDono.length > 0) {
+        return res.status(409).json({
+            success: false,
+            resource_id: deOutroDono[0],
+            resource_ids: deOutroDono,
+            message: "Lock pertence a outro dono"
+        });
     } else {
         // Resposta 404 (conforme API.md)
         return res.status(404).json({
             success: false,
-            resource_id: resource_id,
+            resource_id: recursos[0],
+            resource_ids: recursos,
             message: "Nenhum lock encontrado para este recurso"
         });
     }
 });
 
+/**
+ * Remove o lock do recurso se o TTL já venceu
+ */
+function expirarSeVencido(resource_id, agora) {
+    const lock = locks[resource_id];
+    if (lock && lock.expires_at <= agora) {
+        delete locks[resource_id];
+        log('WARNING', `Lock para recurso ${resource_id} expirou sem unlock (adquirido em ${lock.locked_at})`);
+    }
+}
+
+// Varredura periódica para não acumular locks abandonados
+setInterval(() => {
+    const agora = Date.now();
+    Object.keys(locks).forEach(resource_id => expirarSeVencido(resource_id, agora));
+}, INTERVALO_LIMPEZA_MS).unref();
+
 app.listen(port, () => {
     log('INFO', `Serviço Coordenador (Porteiro) rodando na porta ${port}`);
 });
\ No newline at end of file